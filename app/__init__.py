@@ -1,20 +1,45 @@
 import os
+import time
 from pathlib import Path
 
+_IMPORT_STARTED = time.perf_counter()
+
 from dotenv import load_dotenv
-from flask import Flask, flash, g, redirect, render_template, url_for
+from flask import Flask, flash, g, redirect, render_template, request, url_for
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Load .env deterministically before app config resolution.
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 load_dotenv(PROJECT_ROOT / ".env")
 
+from app.availability import init_availability
+from app.cli import register_commands
+from app.cache import init_fragment_cache
 from app.config import BaseConfig, config_by_name
-from app.extensions import csrf, db, jwt, migrate
+from app.database import configure_engine_options, init_replica_engine, register_pool_metrics, warm_db_pool
+from app.db_routing import init_replica_routing
+from app.extensions import csrf, db, init_migrations, jwt
+from app.http_cache import init_http_cache
+from app.load_shedding import init_load_shedding
 from app.models import utcnow
+from app.observability.metrics import init_metrics
+from app.observability.profiler import init_query_profiler
+from app.observability.logs import init_logging
+from app.observability.startup import StartupTimer
+from app.observability.tracing import init_tracing
 from app.security.authz import attach_current_user, is_authenticated
+from app.security.captcha import init_captcha
+from app.security.permissions import compile_on_startup, init_permissions
+from app.security.risk import init_risk
+from app.storage import get_avatar_storage, init_avatar_storage
+from app.templating import init_template_cache, prime_url_routing, warm_templates
+
+_IMPORT_MS = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 3)
 
 
 def create_app(config_object=None, config_overrides: dict | None = None) -> Flask:
+    timer = StartupTimer()
+    timer.phases["app_package_import"] = _IMPORT_MS
     app = Flask(__name__)
     app.config.from_object(BaseConfig)
 
@@ -29,9 +54,27 @@ def create_app(config_object=None, config_overrides: dict | None = None) -> Flas
     if config_overrides:
         app.config.from_mapping(config_overrides)
 
-    register_extensions(app)
-    register_blueprints(app)
+    if app.config.get("PROXY_FIX_X_FOR") or app.config.get("PROXY_FIX_X_PROTO"):
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app,
+            x_for=app.config.get("PROXY_FIX_X_FOR", 0),
+            x_proto=app.config.get("PROXY_FIX_X_PROTO", 0),
+        )
+
+    with timer.phase("extensions"):
+        register_extensions(app)
+    with timer.phase("blueprints"):
+        register_blueprints(app)
     register_handlers(app)
+    register_commands(app)
+
+    if app.config.get("DB_POOL_WARM_ON_STARTUP"):
+        with timer.phase("db_pool_warmup"):
+            warm_db_pool(app)
+
+    if app.config.get("PERMISSIONS_COMPILE_ON_STARTUP"):
+        with timer.phase("permissions_compile"):
+            compile_on_startup(app)
 
     @app.before_request
     def _load_current_user():
@@ -41,8 +84,7 @@ def create_app(config_object=None, config_overrides: dict | None = None) -> Flas
     def inject_helpers():
         def avatar_url(user) -> str:
             if user and user.avatar_filename:
-                subdir = app.config.get("AVATAR_UPLOAD_SUBDIR", "uploads/avatars").strip("/")
-                return url_for("static", filename=f"{subdir}/{user.avatar_filename}")
+                return get_avatar_storage().url(user.avatar_filename)
             return url_for("static", filename="img/avatar-default.svg")
 
         return {
@@ -56,14 +98,54 @@ def create_app(config_object=None, config_overrides: dict | None = None) -> Flas
             return redirect(url_for("user.home"))
         return render_template("landing.html")
 
+    # With Gunicorn's preload_app this runs once in the master and workers inherit the
+    # compiled templates and routing tables.
+    if app.config.get("TEMPLATE_WARMUP_ON_STARTUP"):
+        with timer.phase("template_warmup"):
+            warm_templates(app)
+            prime_url_routing(app)
+
+    app.extensions["startup_timings"] = timer.phases
     return app
 
 
 def register_extensions(app: Flask) -> None:
+    init_logging(app)
+    configure_engine_options(app)
     db.init_app(app)
-    migrate.init_app(app, db)
+    init_migrations(app)
     jwt.init_app(app)
+    register_upload_limits(app)
+    # Before CSRF so the request span covers form parsing too.
+    init_tracing(app)
     csrf.init_app(app)
+    init_avatar_storage(app)
+    init_captcha(app)
+    init_risk(app)
+    init_availability(app)
+    init_permissions(app)
+    init_fragment_cache(app)
+    init_http_cache(app)
+    init_template_cache(app)
+    init_replica_engine(app)
+    init_replica_routing(app)
+    init_metrics(app)
+    init_load_shedding(app)
+    if app.config.get("METRICS_ENABLED", True):
+        register_pool_metrics(app)
+    init_query_profiler(app)
+
+
+def register_upload_limits(app: Flask) -> None:
+    # MAX_CONTENT_LENGTH is sized for avatars. Raise it per endpoint before CSRF protection
+    # reads the form body.
+    limits = {"admin.import_users": "BULK_IMPORT_MAX_MB"}
+
+    @app.before_request
+    def _apply_upload_limit():
+        config_key = limits.get(request.endpoint)
+        if config_key:
+            request.max_content_length = app.config[config_key] * 1024 * 1024
 
 
 def register_blueprints(app: Flask) -> None:
@@ -1,8 +1,10 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField, FileRequired
 from wtforms import PasswordField, SelectField, StringField
 from wtforms.validators import DataRequired, Email, Length, Regexp, ValidationError
 
-from app.auth.forms import USERNAME_PATTERN, password_strength_errors
+from app.auth.forms import BREACHED_PASSWORD_MESSAGE, USERNAME_PATTERN, password_strength_errors
+from app.security.breached import is_breached_password
 
 
 class AdminCreateUserForm(FlaskForm):
@@ -32,3 +34,15 @@ class AdminCreateUserForm(FlaskForm):
         if failures:
             requirement_text = ", ".join(failures)
             raise ValidationError(f"Password must include {requirement_text}.")
+        if is_breached_password(field.data):
+            raise ValidationError(BREACHED_PASSWORD_MESSAGE)
+
+
+class BulkImportForm(FlaskForm):
+    source = FileField(
+        "Import file",
+        validators=[
+            FileRequired(message="Choose a CSV or NDJSON file."),
+            FileAllowed(["csv", "ndjson", "jsonl"], message="Import files must be .csv, .ndjson or .jsonl."),
+        ],
+    )
@@ -1,16 +1,31 @@
-from flask import Blueprint, abort, flash, g, redirect, render_template, request, url_for
+import io
+
+from flask import Blueprint, abort, current_app, flash, g, redirect, render_template, request, url_for
 from flask_jwt_extended import unset_jwt_cookies
 from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 
-from app.admin.forms import AdminCreateUserForm
+from app.admin.forms import AdminCreateUserForm, BulkImportForm
+from app.bulk_admin import BulkActionError, apply_bulk_action
+from app.bulk_import import detect_format, import_users as run_user_import
+from app.cache import CSRF_PLACEHOLDER, fragment_ttl, get_fragment_cache, render_user_row, users_version, with_csrf_token
+from app.db_routing import use_read_replica
 from app.extensions import db
-from app.models import AuditLog, User, UserRole, utcnow
-from app.security.audit import record_audit_event
-from app.security.authz import role_required
+from app.http_cache import conditional_view
+from app.models import User, UserRole, utcnow
+from app.security.audit import detach_user_audit_rows, record_audit_event
+from app.security.permissions import can_grant_role, has_permission, permission_required
+from app.storage import get_avatar_storage
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
+BULK_ACTION_PERMISSIONS = {
+    "role": "users.role",
+    "status": "users.status",
+    "unlock": "users.unlock",
+    "delete": "users.delete",
+}
+
 
 def _admin_count() -> int:
     return User.query.filter(User.role == UserRole.ADMIN).count()
@@ -36,27 +51,49 @@ def _render_add_users_page(form: AdminCreateUserForm, status_code: int = 200):
 
 
 @admin_bp.get("/dashboard")
-@role_required("admin")
+@permission_required("admin.dashboard")
+@use_read_replica
+@conditional_view(include_locks=True)
 def dashboard():
-    users = User.query.order_by(User.created_at.desc()).all()
-
-    total_users = User.query.count()
-    admin_count = _admin_count()
-    active_count = User.query.filter(User.is_active.is_(True)).count()
-    locked_count = User.query.filter(User.locked_until.isnot(None), User.locked_until > utcnow()).count()
-
-    return render_template(
-        "admin/dashboard.html",
-        users=users,
-        admin_count=admin_count,
-        total_users=total_users,
-        active_count=active_count,
-        locked_count=locked_count,
-    )
+    actor = g.current_user
+    cache = get_fragment_cache()
+
+    # Keyed per viewer because the body marks the viewer's own row.
+    key = f"admin.dashboard:v{users_version()}:u{actor.id}"
+    body = cache.get(key)
+    if body is None:
+        users = User.query.order_by(User.created_at.desc()).all()
+        now = utcnow()
+        admin_count = _admin_count()
+        ttl = fragment_ttl(users)
+
+        rows = [
+            render_user_row(
+                "admin/_user_row.html",
+                user,
+                ttl,
+                is_current_user=user.id == actor.id,
+                is_last_admin=user.role == UserRole.ADMIN and admin_count <= 1,
+                currently_locked=bool(user.locked_until and user.locked_until > now),
+            )
+            for user in users
+        ]
+        body = render_template(
+            "admin/_dashboard_body.html",
+            rows=rows,
+            csrf_placeholder=CSRF_PLACEHOLDER,
+            admin_count=admin_count,
+            total_users=len(users),
+            active_count=sum(1 for user in users if user.is_active),
+            locked_count=sum(1 for user in users if user.locked_until and user.locked_until > now),
+        )
+        cache.set(key, body, ttl)
+
+    return render_template("admin/dashboard.html", dashboard_body=with_csrf_token(body))
 
 
 @admin_bp.route("/users/add", methods=["GET", "POST"])
-@role_required("admin")
+@permission_required("users.create")
 def add_users():
     actor = g.current_user
     form = AdminCreateUserForm()
@@ -104,8 +141,73 @@ def add_users():
     return redirect(url_for("admin.add_users"))
 
 
+@admin_bp.route("/users/import", methods=["GET", "POST"])
+@permission_required("users.import")
+def import_users():
+    config = current_app.config
+    max_rows = config.get("BULK_IMPORT_WEB_MAX_ROWS", 100)
+    max_mb = config.get("BULK_IMPORT_MAX_MB", 20)
+
+    form = BulkImportForm()
+    context = {"form": form, "max_rows": max_rows, "max_mb": max_mb, "report": None}
+    if request.method == "GET":
+        return render_template("admin/import_users.html", **context)
+
+    if not form.validate_on_submit():
+        return render_template("admin/import_users.html", **context), 400
+
+    upload = form.source.data
+    stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+    try:
+        report = run_user_import(
+            stream,
+            detect_format(upload.filename),
+            actor_id=g.current_user.id,
+            chunk_size=config.get("BULK_IMPORT_CHUNK_SIZE", 1000),
+            max_rows=max_rows,
+        )
+    except (UnicodeDecodeError, ValueError) as exc:
+        form.source.errors.append(str(exc))
+        return render_template("admin/import_users.html", **context), 400
+
+    status_code = 200 if not report.aborted else 500
+    return render_template("admin/import_users.html", **{**context, "report": report}), status_code
+
+
+@admin_bp.post("/users/bulk")
+@permission_required("admin.dashboard")
+def bulk_action():
+    action = request.form.get("action", "").strip().lower()
+    if action in BULK_ACTION_PERMISSIONS and not has_permission(BULK_ACTION_PERMISSIONS[action]):
+        abort(403)
+    filter_name = request.form.get("filter", "").strip().lower() or None
+    try:
+        user_ids = [int(user_id) for user_id in request.form.getlist("user_ids")]
+    except ValueError:
+        flash("Invalid user selection.", "danger")
+        return redirect(url_for("admin.dashboard"))
+
+    try:
+        result = apply_bulk_action(
+            action,
+            actor_id=g.current_user.id,
+            user_ids=user_ids,
+            filter_name=filter_name,
+            value=request.form.get("value"),
+        )
+    except BulkActionError as exc:
+        flash(str(exc), "warning")
+        return redirect(url_for("admin.dashboard"))
+
+    if result.skipped_self:
+        flash("Your own account was skipped.", "warning")
+    verbs = {"role": "updated", "status": "updated", "unlock": "unlocked", "delete": "deleted"}
+    flash(f"{result.changed} of {result.matched} selected users {verbs[action]}.", "success")
+    return redirect(url_for("admin.dashboard"))
+
+
 @admin_bp.post("/users/<int:user_id>/role")
-@role_required("admin")
+@permission_required("users.role")
 def update_role(user_id: int):
     target = db.session.get(User, user_id)
     if not target:
@@ -117,8 +219,12 @@ def update_role(user_id: int):
         flash("Invalid role value.", "danger")
         return redirect(url_for("admin.dashboard"))
 
-    if target.id == actor.id and new_role != UserRole.ADMIN.value:
-        flash("You cannot remove your own admin role.", "warning")
+    if target.id == actor.id:
+        flash("You cannot change your own role.", "warning")
+        return redirect(url_for("admin.dashboard"))
+
+    if not (can_grant_role(actor, new_role) and can_grant_role(actor, target.role.value)):
+        flash("You can only assign roles whose permissions you hold yourself.", "warning")
         return redirect(url_for("admin.dashboard"))
 
     if target.role == UserRole.ADMIN and new_role == UserRole.USER.value and _admin_count() <= 1:
@@ -134,7 +240,7 @@ def update_role(user_id: int):
 
 
 @admin_bp.post("/users/<int:user_id>/status")
-@role_required("admin")
+@permission_required("users.status")
 def update_status(user_id: int):
     target = db.session.get(User, user_id)
     if not target:
@@ -167,7 +273,7 @@ def update_status(user_id: int):
 
 
 @admin_bp.post("/users/<int:user_id>/unlock")
-@role_required("admin")
+@permission_required("users.unlock")
 def unlock_user(user_id: int):
     target = db.session.get(User, user_id)
     if not target:
@@ -183,7 +289,7 @@ def unlock_user(user_id: int):
 
 
 @admin_bp.post("/users/<int:user_id>/delete")
-@role_required("admin")
+@permission_required("users.delete")
 def delete_user(user_id: int):
     target = db.session.get(User, user_id)
     if not target:
@@ -197,9 +303,10 @@ def delete_user(user_id: int):
         return redirect(url_for("admin.dashboard"))
 
     # Preserve historical logs by nulling user ownership before deleting account.
-    AuditLog.query.filter(AuditLog.user_id == target.id).update({AuditLog.user_id: None})
+    detach_user_audit_rows([target.id], None if deleting_self else actor.id)
 
     target_label = target.username
+    target_avatar = target.avatar_filename
     db.session.delete(target)
 
     if deleting_self:
@@ -209,6 +316,9 @@ def delete_user(user_id: int):
 
     db.session.commit()
 
+    if target_avatar:
+        get_avatar_storage().delete(target_avatar)
+
     if deleting_self:
         response = redirect(url_for("auth.login"))
         unset_jwt_cookies(response)
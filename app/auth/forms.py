@@ -4,6 +4,8 @@ from flask_wtf import FlaskForm
 from wtforms import PasswordField, SelectField, StringField
 from wtforms.validators import DataRequired, Email, Length, Regexp, ValidationError
 
+from app.security.breached import is_breached_password
+
 USERNAME_PATTERN = r"^[A-Za-z0-9_]{3,30}$"
 
 
@@ -21,6 +23,9 @@ def password_strength_errors(password: str) -> list[str]:
     return failures
 
 
+BREACHED_PASSWORD_MESSAGE = "This password has appeared in a known data breach. Choose a different one."
+
+
 class RegistrationForm(FlaskForm):
     username = StringField(
         "Username",
@@ -45,6 +50,8 @@ class RegistrationForm(FlaskForm):
         if failures:
             requirement_text = ", ".join(failures)
             raise ValidationError(f"Password must include {requirement_text}.")
+        if is_breached_password(field.data):
+            raise ValidationError(BREACHED_PASSWORD_MESSAGE)
 
 
 class LoginForm(FlaskForm):
@@ -1,39 +1,60 @@
+import re
+
 from flask import Blueprint, abort, current_app, flash, g, jsonify, redirect, render_template, request, url_for
 from flask_jwt_extended import create_access_token, set_access_cookies, unset_jwt_cookies
 from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 
-from app.auth.forms import LoginForm, RegistrationForm
+from app.auth.forms import USERNAME_PATTERN, LoginForm, RegistrationForm
+from app.availability import FIELDS, get_availability_index, is_available, rate_limited
 from app.extensions import db
 from app.models import User, UserRole, utcnow
+from app.observability.tracing import span
 from app.security.audit import record_audit_event
 from app.security.authz import is_authenticated, login_required
 from app.security.captcha import (
     generate_math_challenge,
-    get_math_challenge,
     is_turnstile_enabled,
     verify_math_challenge,
     verify_turnstile_token,
 )
 from app.security.lockout import clear_failed_attempts, is_account_locked, record_failed_attempt
+from app.security.permissions import permission_claims
+from app.security.risk import assess_risk, record_auth_failure, remember_device
 
 auth_bp = Blueprint("auth", __name__)
 
+AVAILABILITY_PATTERNS = {
+    "username": re.compile(USERNAME_PATTERN),
+    "email": re.compile(r"^[^\s@]{1,64}@[^\s@]+\.[^\s@]+$"),
+}
+
 
-def _captcha_context(scope: str) -> dict:
-    turnstile_enabled = is_turnstile_enabled()
+def _captcha_context(scope: str, required: bool | None = None) -> dict:
+    if required is None:
+        required = assess_risk(scope, submitted=False).requires_captcha
+    turnstile_enabled = is_turnstile_enabled() and required
+    challenge = generate_math_challenge(scope) if required and not turnstile_enabled else None
     return {
+        "captcha_required": required,
         "turnstile_enabled": turnstile_enabled,
         "turnstile_site_key": current_app.config.get("TURNSTILE_SITE_KEY", ""),
-        "captcha_question": None if turnstile_enabled else get_math_challenge(scope),
+        "captcha_question": challenge.question if challenge else None,
+        "captcha_token": challenge.token if challenge else None,
     }
 
 
+def _captcha_failure_message() -> str:
+    if request.form.get("captcha_token") or request.form.get("cf-turnstile-response"):
+        return "CAPTCHA verification failed. Please try again."
+    return "Please complete the human verification to continue."
+
+
 def _validate_captcha(scope: str, submitted_math_answer: str) -> bool:
     if is_turnstile_enabled():
         token = request.form.get("cf-turnstile-response", "")
         return verify_turnstile_token(token, request.remote_addr)
-    return verify_math_challenge(scope, submitted_math_answer)
+    return verify_math_challenge(scope, request.form.get("captcha_token", ""), submitted_math_answer)
 
 
 @auth_bp.get("/captcha/<string:scope>/refresh")
@@ -44,8 +65,30 @@ def refresh_captcha(scope: str):
     if is_turnstile_enabled():
         return jsonify({"error": "Math captcha is disabled when Turnstile is enabled."}), 400
 
-    question = generate_math_challenge(scope)
-    return jsonify({"question": question})
+    challenge = generate_math_challenge(scope)
+    return jsonify({"question": challenge.question, "token": challenge.token})
+
+
+@auth_bp.get("/register/availability")
+def check_availability():
+    if get_availability_index(current_app) is None:
+        abort(404)
+
+    if rate_limited():
+        response = jsonify({"error": "Too many availability checks. Please slow down."})
+        response.headers["Retry-After"] = "60"
+        return response, 429
+
+    field = next((name for name in FIELDS if name in request.args), None)
+    if field is None:
+        return jsonify({"error": "Pass a username or email to check."}), 400
+    value = request.args[field].strip()
+    if len(value) > 255 or not AVAILABILITY_PATTERNS[field].match(value):
+        return jsonify({"field": field, "valid": False}), 400
+
+    response = jsonify({"field": field, "valid": True, "available": is_available(field, value)})
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 
 @auth_bp.route("/register", methods=["GET", "POST"])
@@ -55,31 +98,27 @@ def register():
 
     form = RegistrationForm()
 
-    if request.method == "GET" and not is_turnstile_enabled():
-        generate_math_challenge("register")
-
     if form.validate_on_submit():
-        if not _validate_captcha("register", form.captcha_answer.data):
-            flash("CAPTCHA verification failed. Please try again.", "danger")
+        risk = assess_risk("register")
+        if risk.requires_captcha and not _validate_captcha("register", form.captcha_answer.data):
+            flash(_captcha_failure_message(), "danger")
             record_audit_event("register_captcha_fail", "failure")
+            record_auth_failure()
             db.session.commit()
-            if not is_turnstile_enabled():
-                generate_math_challenge("register")
-            return render_template("auth/register.html", form=form, **_captcha_context("register")), 400
+            return render_template("auth/register.html", form=form, **_captcha_context("register", True)), 400
 
         username = form.username.data.strip()
         email = form.email.data.strip().lower()
 
+        # Counted as failures so probing for taken names or emails soon requires a challenge.
         if User.query.filter(func.lower(User.username) == username.lower()).first():
             form.username.errors.append("This username is already in use.")
-            if not is_turnstile_enabled():
-                generate_math_challenge("register")
+            record_auth_failure()
             return render_template("auth/register.html", form=form, **_captcha_context("register")), 400
 
         if User.query.filter(func.lower(User.email) == email).first():
             form.email.errors.append("This email is already registered.")
-            if not is_turnstile_enabled():
-                generate_math_challenge("register")
+            record_auth_failure()
             return render_template("auth/register.html", form=form, **_captcha_context("register")), 400
 
         selected_role = form.role.data.lower()
@@ -87,8 +126,6 @@ def register():
             "ALLOW_ADMIN_SELF_REGISTRATION", True
         ):
             form.role.errors.append("Admin self-registration is disabled.")
-            if not is_turnstile_enabled():
-                generate_math_challenge("register")
             return render_template("auth/register.html", form=form, **_captcha_context("register")), 403
 
         user = User(
@@ -106,16 +143,11 @@ def register():
         except IntegrityError:
             db.session.rollback()
             flash("Registration failed due to conflicting user data.", "danger")
-            if not is_turnstile_enabled():
-                generate_math_challenge("register")
             return render_template("auth/register.html", form=form, **_captcha_context("register")), 409
 
         flash("Account created successfully. You can now log in.", "success")
         return redirect(url_for("auth.login"))
 
-    if form.errors and request.method == "POST" and not is_turnstile_enabled():
-        generate_math_challenge("register")
-
     return render_template("auth/register.html", form=form, **_captcha_context("register"))
 
 
@@ -126,37 +158,34 @@ def login():
 
     form = LoginForm()
 
-    if request.method == "GET" and not is_turnstile_enabled():
-        generate_math_challenge("login")
-
     if form.validate_on_submit():
-        if not _validate_captcha("login", form.captcha_answer.data):
-            flash("CAPTCHA verification failed. Please try again.", "danger")
+        email = form.email.data.strip().lower()
+        # Scored on the submitted address, not the account, so a challenge never hints that it exists.
+        risk = assess_risk("login", email=email)
+        if risk.requires_captcha and not _validate_captcha("login", form.captcha_answer.data):
+            flash(_captcha_failure_message(), "danger")
             record_audit_event("login_captcha_fail", "failure")
+            record_auth_failure()
             db.session.commit()
-            if not is_turnstile_enabled():
-                generate_math_challenge("login")
-            return render_template("auth/login.html", form=form, **_captcha_context("login")), 400
+            return render_template("auth/login.html", form=form, **_captcha_context("login", True)), 400
 
-        email = form.email.data.strip().lower()
-        user = User.query.filter(func.lower(User.email) == email).first()
+        with span("login.user_lookup"):
+            user = User.query.filter(func.lower(User.email) == email).first()
 
         generic_error = "Invalid credentials or account locked."
 
         if not user or not user.is_active:
             flash(generic_error, "danger")
             record_audit_event("login_fail", "failure", user)
+            record_auth_failure(email)
             db.session.commit()
-            if not is_turnstile_enabled():
-                generate_math_challenge("login")
             return render_template("auth/login.html", form=form, **_captcha_context("login")), 401
 
         if is_account_locked(user):
             flash(generic_error, "danger")
             record_audit_event("login_locked", "failure", user)
+            record_auth_failure(email)
             db.session.commit()
-            if not is_turnstile_enabled():
-                generate_math_challenge("login")
             return render_template("auth/login.html", form=form, **_captcha_context("login")), 423
 
         if not user.verify_password(form.password.data):
@@ -164,29 +193,26 @@ def login():
             if was_locked:
                 record_audit_event("lockout", "failure", user)
             record_audit_event("login_fail", "failure", user)
+            record_auth_failure(email)
             db.session.commit()
             flash(generic_error, "danger")
-            if not is_turnstile_enabled():
-                generate_math_challenge("login")
             return render_template("auth/login.html", form=form, **_captcha_context("login")), 401
 
         clear_failed_attempts(user)
         user.last_login_at = utcnow()
         token = create_access_token(
             identity=str(user.id),
-            additional_claims={"role": user.role.value},
+            additional_claims={"role": user.role.value, **permission_claims(user)},
         )
         record_audit_event("login_success", "success", user)
         db.session.commit()
 
         response = redirect(url_for("user.home"))
         set_access_cookies(response, token)
+        remember_device(response, email)
         flash("Login successful.", "success")
         return response
 
-    if form.errors and request.method == "POST" and not is_turnstile_enabled():
-        generate_math_challenge("login")
-
     return render_template("auth/login.html", form=form, **_captcha_context("login"))
 
 
@@ -0,0 +1,259 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask, current_app, has_app_context, request
+from sqlalchemy import event, func, inspect, select
+
+from app.db_routing import RoutingSession
+from app.extensions import db
+from app.models import User
+from app.observability.metrics import AVAILABILITY_CHECKS, AVAILABILITY_FILTER_ENTRIES, AVAILABILITY_FILTER_REBUILDS
+from app.security.risk import SlidingCounter
+
+AVAILABILITY_KEY = "availability"
+FIELDS = ("username", "email")
+
+
+def normalize(field: str, value: str) -> str:
+    return f"{field}:{value.strip().lower()}"
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, key: str):
+        # Double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit digest.
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+    def update(self, keys) -> None:
+        # Byte-level read-modify-write is not atomic across threads; lookups stay lock-free.
+        bits = self.bits
+        with self._lock:
+            for key in keys:
+                added = False
+                for position in self._positions(key):
+                    mask = 1 << (position & 7)
+                    if not bits[position >> 3] & mask:
+                        bits[position >> 3] |= mask
+                        added = True
+                # A key that sets no new bit is (almost certainly) already in, so catch-up
+                # re-reads do not eat into the capacity.
+                if added:
+                    self.count += 1
+
+    def add(self, key: str) -> None:
+        self.update((key,))
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class AvailabilityIndex:
+    # Per-worker Bloom filter over normalized usernames and emails. A miss is definitive, so most
+    # "is it free?" checks cost no query. Rows inserted or renamed by other workers are pulled in
+    # by `updated_at` every `sync_seconds`. Values freed by renames and deletes stay in the filter
+    # and only cost a database lookup, until the periodic rebuild drops them.
+    def __init__(
+        self,
+        app: Flask,
+        error_rate: float,
+        min_capacity: int,
+        sync_seconds: float,
+        overlap_seconds: float,
+        rebuild_seconds: float,
+        rebuild_in_background: bool,
+    ):
+        self.app = app
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self.sync_seconds = sync_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.rebuild_seconds = rebuild_seconds
+        self.rebuild_in_background = rebuild_in_background
+        self.filter: BloomFilter | None = None
+        self.updated_since: datetime | None = None
+        self._synced_at = float("-inf")
+        self._built_at = float("-inf")
+        self._busy = False
+        self._lock = threading.Lock()
+
+    def rebuild(self) -> None:
+        users = db.session.execute(select(func.count(User.id))).scalar() or 0
+        # Room to double before the false-positive rate degrades and forces another rebuild.
+        bloom = BloomFilter(max(self.min_capacity, 4 * users), self.error_rate)
+        updated_since = None
+        rows = db.session.execute(
+            select(User.username, User.email, User.updated_at).execution_options(yield_per=5000)
+        )
+        for batch in rows.partitions():
+            bloom.update(
+                key
+                for username, email, _ in batch
+                for key in (normalize("username", username), normalize("email", email))
+            )
+            latest = max(updated_at for _, _, updated_at in batch)
+            updated_since = latest if updated_since is None else max(updated_since, latest)
+        with self._lock:
+            self.filter, self.updated_since = bloom, updated_since
+            self._synced_at = self._built_at = time.monotonic()
+        AVAILABILITY_FILTER_REBUILDS.inc()
+
+    def _rebuild_in_background(self) -> None:
+        try:
+            with self.app.app_context():
+                try:
+                    self.rebuild()
+                finally:
+                    db.session.remove()
+        finally:
+            self._busy = False
+
+    def _catch_up(self) -> None:
+        query = select(User.username, User.email, User.updated_at)
+        if self.updated_since is not None:
+            # updated_at is stamped before commit, so a slow transaction can land behind rows
+            # already seen; re-reading a trailing window catches it. Re-reads set no new bits.
+            query = query.where(User.updated_at >= self.updated_since - self.overlap)
+        for username, email, updated_at in db.session.execute(query):
+            self.add(username, email)
+            if self.updated_since is None or updated_at > self.updated_since:
+                self.updated_since = updated_at
+
+    def _sync(self) -> None:
+        with self._lock:
+            if self._busy or time.monotonic() - self._synced_at < self.sync_seconds:
+                return
+            self._busy = True
+            self._synced_at = time.monotonic()
+        background = False
+        try:
+            bloom = self.filter
+            fresh = time.monotonic() - self._built_at < self.rebuild_seconds
+            if bloom is not None and bloom.count <= bloom.capacity and fresh:
+                self._catch_up()
+                return
+            self.filter = None
+            if self.rebuild_in_background:
+                background = True
+                threading.Thread(target=self._rebuild_in_background, name="availability-rebuild", daemon=True).start()
+                return
+            self.rebuild()
+        finally:
+            if not background:
+                self._busy = False
+
+    def add(self, username: str, email: str) -> None:
+        bloom = self.filter
+        if bloom is not None:
+            bloom.update((normalize("username", username), normalize("email", email)))
+
+    def might_exist(self, field: str, value: str) -> bool | None:
+        if time.monotonic() - self._synced_at >= self.sync_seconds:
+            self._sync()
+        bloom = self.filter
+        if bloom is None:
+            return None
+        return normalize(field, value) in bloom
+
+    def entries(self) -> int:
+        bloom = self.filter
+        return bloom.count if bloom else 0
+
+
+def _value_taken(field: str, value: str) -> bool:
+    column = getattr(User, field)
+    value = value.strip().lower()
+    # Same comparison as registration; MySQL's case-insensitive collation lets it use the index.
+    if db.engine.dialect.name == "mysql":
+        clause = column == value
+    else:
+        clause = func.lower(column) == value
+    return db.session.execute(select(User.id).where(clause).limit(1)).first() is not None
+
+
+def get_availability_index(app: Flask) -> AvailabilityIndex | None:
+    state = app.extensions.get(AVAILABILITY_KEY)
+    return state["index"] if state else None
+
+
+def rate_limited() -> bool:
+    state = current_app.extensions[AVAILABILITY_KEY]
+    key = request.remote_addr or "unknown"
+    limiter = state["requests"]
+    if limiter.count(key) >= current_app.config["AVAILABILITY_RATE_LIMIT_PER_MINUTE"]:
+        return True
+    limiter.add(key)
+    return False
+
+
+def is_available(field: str, value: str) -> bool:
+    index = get_availability_index(current_app)
+    if index is not None:
+        found = index.might_exist(field, value)
+        if found is False:
+            AVAILABILITY_CHECKS.inc(field, "filter_miss")
+            return True
+    taken = _value_taken(field, value)
+    AVAILABILITY_CHECKS.inc(field, "db_taken" if taken else "db_free")
+    return not taken
+
+
+def _identity_changed(user: User) -> bool:
+    state = inspect(user)
+    return any(state.attrs[field].history.has_changes() for field in FIELDS)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _track_identity_changes(session, _flush_context, _instances):
+    renamed = [obj for obj in session.dirty if isinstance(obj, User) and _identity_changed(obj)]
+    added = [(obj.username, obj.email) for obj in (*session.new, *renamed) if isinstance(obj, User)]
+    if added:
+        session.info.setdefault("availability_added", []).extend(added)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _add_committed_identities(session):
+    added = session.info.pop("availability_added", None)
+    if not added or not has_app_context():
+        return
+    index = get_availability_index(current_app)
+    if index is not None:
+        for username, email in added:
+            index.add(username, email)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_rolled_back_identities(session):
+    session.info.pop("availability_added", None)
+
+
+def init_availability(app: Flask) -> None:
+    if not app.config.get("AVAILABILITY_ENABLED", True):
+        return
+    index = AvailabilityIndex(
+        app,
+        error_rate=app.config["AVAILABILITY_FILTER_ERROR_RATE"],
+        min_capacity=app.config["AVAILABILITY_FILTER_MIN_CAPACITY"],
+        sync_seconds=app.config["AVAILABILITY_SYNC_SECONDS"],
+        overlap_seconds=app.config["AVAILABILITY_SYNC_OVERLAP_SECONDS"],
+        rebuild_seconds=app.config["AVAILABILITY_REBUILD_SECONDS"],
+        rebuild_in_background=app.config["AVAILABILITY_REBUILD_IN_BACKGROUND"],
+    )
+    app.extensions[AVAILABILITY_KEY] = {
+        "index": index,
+        "requests": SlidingCounter(60, app.config.get("CAPTCHA_RISK_MAX_TRACKED_IPS", 50_000)),
+    }
+    AVAILABILITY_FILTER_ENTRIES.set_function(index.entries)
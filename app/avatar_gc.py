@@ -0,0 +1,100 @@
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import timedelta
+from itertools import islice
+
+from app.extensions import db
+from app.models import User, utcnow
+from app.storage import AvatarStorage, StoredObject
+
+
+@dataclass
+class AvatarGCReport:
+    scanned: int = 0
+    referenced: int = 0
+    skipped_recent: int = 0
+    orphans: int = 0
+    removed: int = 0
+    bytes_reclaimed: int = 0
+    # Quarantined files still occupy storage, so they are not counted as reclaimed.
+    quarantined: int = 0
+    bytes_quarantined: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+def _batched(items: Iterable[StoredObject], size: int) -> Iterator[list[StoredObject]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _referenced_names(names: list[str]) -> set[str]:
+    rows = db.session.execute(
+        db.select(User.avatar_filename).where(User.avatar_filename.in_(names))
+    ).scalars()
+    return set(rows)
+
+
+def collect_orphan_avatars(
+    storage: AvatarStorage,
+    batch_size: int = 500,
+    min_age_minutes: int = 60,
+    quarantine: bool = False,
+    dry_run: bool = False,
+    max_per_second: float = 0,
+    limit: int | None = None,
+) -> AvatarGCReport:
+    report = AvatarGCReport()
+    cutoff = utcnow() - timedelta(minutes=min_age_minutes)
+    interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+    last_removal = 0.0
+
+    for batch in _batched(storage.iter_objects(), batch_size):
+        report.scanned += len(batch)
+        referenced = _referenced_names([item.name for item in batch])
+        report.referenced += len(referenced)
+
+        for item in batch:
+            if item.name in referenced:
+                continue
+            # Uploads are written before the profile commit; give them time to land.
+            if item.modified_at > cutoff:
+                report.skipped_recent += 1
+                continue
+
+            report.orphans += 1
+            if dry_run:
+                if quarantine:
+                    report.bytes_quarantined += item.size
+                else:
+                    report.bytes_reclaimed += item.size
+                continue
+            if limit is not None and report.removed + report.quarantined >= limit:
+                return report
+
+            if interval:
+                wait = last_removal + interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                last_removal = time.monotonic()
+
+            try:
+                if quarantine:
+                    storage.quarantine(item.name)
+                else:
+                    storage.delete(item.name)
+            except Exception as exc:
+                report.errors.append(f"{item.name}: {exc}")
+                continue
+
+            if quarantine:
+                report.quarantined += 1
+                report.bytes_quarantined += item.size
+            else:
+                report.removed += 1
+                report.bytes_reclaimed += item.size
+
+        db.session.rollback()
+
+    return report
@@ -0,0 +1,246 @@
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+from app.cache import invalidate_users_cache
+from app.extensions import db
+from app.models import User, UserRole, utcnow
+from app.observability.tracing import span
+from app.security.audit import detach_events, null_user_audit_rows, record_audit_events
+from app.security.permissions import can_grant_role, refresh_user_masks
+from app.storage import get_avatar_storage
+
+BULK_ACTIONS = ("role", "status", "unlock", "delete")
+USER_FILTERS = ("locked", "inactive", "active", "admins", "users")
+ACTIVE_VALUES = {"1", "true", "yes", "on", "active"}
+INACTIVE_VALUES = {"0", "false", "no", "off", "inactive"}
+
+# Keeps IN lists well below parameter limits (SQLite: 32766, MySQL packet size).
+ID_CHUNK_SIZE = 1000
+
+_LOCKOUT_RESET = {"failed_attempts": 0, "failed_attempt_window_start": None, "locked_until": None}
+
+
+class BulkActionError(ValueError):
+    pass
+
+
+@dataclass
+class BulkActionResult:
+    action: str
+    matched: int = 0
+    changed: int = 0
+    skipped_self: bool = False
+    changed_ids: list[int] = field(default_factory=list)
+
+
+@dataclass
+class _Target:
+    id: int
+    role: UserRole
+    is_active: bool
+    locked: bool
+    avatar_filename: str | None
+
+
+def _chunks(ids: list[int]) -> Iterator[list[int]]:
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        yield ids[start : start + ID_CHUNK_SIZE]
+
+
+def filter_clause(name: str):
+    now = utcnow()
+    clauses = {
+        "locked": User.locked_until > now,
+        "inactive": User.is_active.is_(False),
+        "active": User.is_active.is_(True),
+        "admins": User.role == UserRole.ADMIN,
+        "users": User.role == UserRole.USER,
+    }
+    if name not in clauses:
+        raise BulkActionError(f"Unknown filter '{name}'. Choose one of: {', '.join(USER_FILTERS)}.")
+    return clauses[name]
+
+
+def _parse_value(action: str, value: str | None):
+    value = (value or "").strip().lower()
+    if action == "role":
+        if value not in {UserRole.ADMIN.value, UserRole.USER.value}:
+            raise BulkActionError("Invalid role value.")
+        return UserRole(value)
+    if action == "status":
+        if value in ACTIVE_VALUES:
+            return True
+        if value in INACTIVE_VALUES:
+            return False
+        raise BulkActionError("Invalid status value.")
+    return None
+
+
+def _select_targets(user_ids: list[int] | None, filter_name: str | None) -> list[_Target]:
+    statement = db.select(
+        User.id,
+        User.role,
+        User.is_active,
+        User.failed_attempts,
+        User.failed_attempt_window_start,
+        User.locked_until,
+        User.avatar_filename,
+    ).order_by(User.id)
+    if filter_name:
+        statement = statement.where(filter_clause(filter_name))
+
+    # Row locks stop a concurrent single-user edit from slipping between the checks and the UPDATE.
+    if user_ids is None:
+        batches = [statement.with_for_update()]
+    else:
+        batches = [statement.where(User.id.in_(chunk)).with_for_update() for chunk in _chunks(user_ids)]
+
+    targets = []
+    for batch in batches:
+        for row in db.session.execute(batch):
+            locked = bool(row.failed_attempts or row.failed_attempt_window_start or row.locked_until)
+            targets.append(_Target(row.id, row.role, row.is_active, locked, row.avatar_filename))
+    return targets
+
+
+def _check_role_grant(actor_id: int | None, value: UserRole, targets: list[_Target]) -> None:
+    # The CLI without --actor runs as the operator; every other caller is capped at its own roles.
+    if actor_id is None:
+        return
+    actor = db.session.get(User, actor_id)
+    roles = {value, *(target.role for target in targets)}
+    if actor is None or not all(can_grant_role(actor, role.value) for role in roles):
+        raise BulkActionError("You can only assign roles whose permissions you hold yourself.")
+
+
+def _needs_change(action: str, value, target: _Target) -> bool:
+    if action == "role":
+        return target.role != value
+    if action == "status":
+        return target.is_active != value
+    if action == "unlock":
+        return target.locked
+    return True
+
+
+def _removes_admin_access(action: str, value) -> bool:
+    return (
+        (action == "role" and value == UserRole.USER)
+        or (action == "status" and value is False)
+        or action == "delete"
+    )
+
+
+def _check_last_admin(action: str, targets: list[_Target]) -> None:
+    admins = [target for target in targets if target.role == UserRole.ADMIN]
+    if not admins:
+        return
+
+    if action == "status":
+        remaining = db.session.scalar(
+            db.select(db.func.count(User.id)).where(User.role == UserRole.ADMIN, User.is_active.is_(True))
+        ) - sum(1 for target in admins if target.is_active)
+    else:
+        remaining = db.session.scalar(
+            db.select(db.func.count(User.id)).where(User.role == UserRole.ADMIN)
+        ) - len(admins)
+
+    if remaining < 1:
+        messages = {
+            "role": "Cannot demote the last remaining admin.",
+            "status": "Cannot deactivate the last remaining admin.",
+            "delete": "Cannot delete the last remaining admin account.",
+        }
+        raise BulkActionError(messages[action])
+
+
+def _audit_action(action: str, value, user_id: int) -> str:
+    if action == "role":
+        return f"role_change_target_{user_id}"
+    if action == "status":
+        return f"{'activate' if value else 'deactivate'}_target_{user_id}"
+    if action == "unlock":
+        return f"unlock_target_{user_id}"
+    return f"delete_target_{user_id}"
+
+
+def _apply(action: str, value, ids: list[int]) -> None:
+    for chunk in _chunks(ids):
+        with span("bulk.chunk", action=action, rows=len(chunk)):
+            if action == "role":
+                db.session.execute(db.update(User).where(User.id.in_(chunk)).values(role=value))
+            elif action == "status":
+                values = {"is_active": value} if value else {"is_active": value, **_LOCKOUT_RESET}
+                db.session.execute(db.update(User).where(User.id.in_(chunk)).values(**values))
+            elif action == "unlock":
+                db.session.execute(db.update(User).where(User.id.in_(chunk)).values(**_LOCKOUT_RESET))
+            else:
+                # Preserve historical logs by nulling ownership first; ix_audit_logs_user_id keeps this
+                # from scanning the whole table per chunk. The compensating events are sealed with the
+                # rest of the batch just before commit.
+                null_user_audit_rows(chunk)
+                db.session.execute(db.delete(User).where(User.id.in_(chunk)))
+
+
+def apply_bulk_action(
+    action: str,
+    actor_id: int | None = None,
+    user_ids: Iterable[int] | None = None,
+    filter_name: str | None = None,
+    value: str | None = None,
+) -> BulkActionResult:
+    if action not in BULK_ACTIONS:
+        raise BulkActionError(f"Unknown action '{action}'. Choose one of: {', '.join(BULK_ACTIONS)}.")
+    if user_ids is not None:
+        user_ids = sorted(set(user_ids))
+    if not user_ids and not filter_name:
+        raise BulkActionError("Select at least one user or a filter.")
+
+    parsed = _parse_value(action, value)
+    result = BulkActionResult(action=action)
+
+    targets = _select_targets(user_ids or None, filter_name)
+    result.matched = len(targets)
+    targets = [target for target in targets if _needs_change(action, parsed, target)]
+
+    # Nobody changes their own role, and nobody removes their own admin access.
+    skips_self = action == "role" or _removes_admin_access(action, parsed)
+    if skips_self and any(target.id == actor_id for target in targets):
+        targets = [target for target in targets if target.id != actor_id]
+        result.skipped_self = True
+
+    try:
+        if action == "role":
+            _check_role_grant(actor_id, parsed, targets)
+        if _removes_admin_access(action, parsed):
+            _check_last_admin(action, targets)
+    except BulkActionError:
+        db.session.rollback()
+        raise
+
+    if not targets:
+        db.session.rollback()
+        return result
+
+    ids = [target.id for target in targets]
+    _apply(action, parsed, ids)
+    if action == "role":
+        refresh_user_masks(ids)
+    # Core statements skip the before_flush hook that normally bumps the users version.
+    invalidate_users_cache()
+    # Sealing takes the audit chain head lock, which every audited write (logins included) waits
+    # on, so it happens once, after the chunked statements and right before the commit.
+    events = detach_events(ids, actor_id) if action == "delete" else []
+    events.extend((_audit_action(action, parsed, user_id), "success", actor_id) for user_id in ids)
+    record_audit_events(events)
+    db.session.commit()
+
+    if action == "delete":
+        storage = get_avatar_storage()
+        for target in targets:
+            if target.avatar_filename:
+                storage.delete(target.avatar_filename)
+
+    result.changed = len(ids)
+    result.changed_ids = ids
+    return result
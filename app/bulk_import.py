@@ -0,0 +1,297 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+from app.admin.forms import AdminCreateUserForm
+from app.cache import invalidate_users_cache
+from app.extensions import db
+from app.models import User, UserRole, password_hasher
+from app.observability.tracing import span
+from app.security.audit import record_audit_events
+from app.security.permissions import get_permission_registry
+
+IMPORT_FIELDS = ("full_name", "username", "email", "password", "role")
+FORMATS = {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson"}
+
+
+@dataclass
+class ImportRowError:
+    line: int
+    field: str
+    message: str
+    username: str = ""
+    email: str = ""
+
+
+@dataclass
+class BulkImportReport:
+    processed: int = 0
+    inserted: int = 0
+    failed: int = 0
+    resumed_from_line: int = 0
+    last_committed_line: int = 0
+    truncated: bool = False
+    aborted: str | None = None
+    errors: list[ImportRowError] = field(default_factory=list)
+
+    def error_csv(self) -> str:
+        buffer = io.StringIO()
+        write_errors(buffer, self.errors, header=True)
+        return buffer.getvalue()
+
+
+@dataclass
+class _PendingRow:
+    line: int
+    values: dict
+
+
+def write_errors(stream, errors: Iterable[ImportRowError], header: bool = False) -> None:
+    writer = csv.writer(stream)
+    if header:
+        writer.writerow(["line", "field", "message", "username", "email"])
+    for error in errors:
+        writer.writerow([error.line, error.field, error.message, error.username, error.email])
+
+
+class ImportCheckpoint:
+    def __init__(self, path: str | Path, source: str | Path):
+        self.path = Path(path)
+        source = Path(source)
+        self.source = {"name": source.name, "size": source.stat().st_size}
+        self.previous = {"inserted": 0, "failed": 0}
+
+    def load(self) -> dict | None:
+        if not self.path.exists():
+            return None
+        state = json.loads(self.path.read_text())
+        if state.get("source") != self.source:
+            raise ValueError(f"Checkpoint {self.path} was written for a different file: {state.get('source')}")
+        self.previous = {"inserted": state["inserted"], "failed": state["failed"]}
+        return state
+
+    def save(self, report: BulkImportReport) -> None:
+        state = {
+            "source": self.source,
+            "line": report.last_committed_line,
+            "inserted": self.previous["inserted"] + report.inserted,
+            "failed": self.previous["failed"] + report.failed,
+        }
+        # Write-then-rename so a crash mid-write never leaves a truncated checkpoint.
+        temporary = self.path.with_suffix(self.path.suffix + ".tmp")
+        temporary.write_text(json.dumps(state))
+        os.replace(temporary, self.path)
+
+
+def detect_format(filename: str) -> str:
+    extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if extension not in FORMATS:
+        raise ValueError("Import files must be .csv, .ndjson or .jsonl.")
+    return FORMATS[extension]
+
+
+def iter_records(stream, file_format: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        missing = {"username", "email", "password"} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"CSV header is missing: {', '.join(sorted(missing))}.")
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_number, None, f"Invalid JSON: {exc.msg}."
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Each line must be a JSON object."
+            continue
+        yield line_number, record, None
+
+
+def validate_record(record: dict) -> tuple[dict | None, list[tuple[str, str]]]:
+    formdata = MultiDict(
+        {name: "" if record.get(name) is None else str(record[name]) for name in IMPORT_FIELDS}
+    )
+    if not formdata["role"]:
+        formdata["role"] = UserRole.USER.value
+    form = AdminCreateUserForm(formdata=formdata, meta={"csrf": False})
+    if not form.validate():
+        return None, [(name, messages[0]) for name, messages in form.errors.items() if messages]
+
+    role = UserRole.ADMIN if form.role.data.lower().strip() == UserRole.ADMIN.value else UserRole.USER
+    return {
+        "full_name": (form.full_name.data or "").strip() or None,
+        "username": form.username.data.strip(),
+        "email": form.email.data.strip().lower(),
+        "password": form.password.data,
+        "role": role,
+    }, []
+
+
+def hash_password(password: str) -> str:
+    return password_hasher().hash(password)
+
+
+def _existing_values(column, values: list[str]) -> set[str]:
+    if not values:
+        return set()
+    # MySQL's default collation compares case-insensitively, so a plain IN can use the
+    # unique index; other backends need lower() to match the single-user checks.
+    if db.engine.dialect.name == "mysql":
+        rows = db.session.execute(db.select(column).where(column.in_(values))).scalars()
+    else:
+        rows = db.session.execute(db.select(column).where(db.func.lower(column).in_(values))).scalars()
+    return {value.lower() for value in rows}
+
+
+class _Hasher:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = None
+        if workers > 1:
+            # spawn: forked children would inherit the parent's DB connections and threads.
+            self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def hash_all(self, passwords: list[str]) -> list[str]:
+        if self._executor is None:
+            return [hash_password(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._executor.map(hash_password, passwords, chunksize=chunksize))
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+
+
+def _insert_chunk(pending: list[_PendingRow], hasher: _Hasher, actor_id: int | None) -> None:
+    with span("import.hash", rows=len(pending)):
+        hashes = hasher.hash_all([row.values["password"] for row in pending])
+    # New accounts have no groups yet, so their role mask is already their effective mask.
+    table = get_permission_registry().table()
+    rows = [
+        {
+            "full_name": row.values["full_name"],
+            "username": row.values["username"],
+            "email": row.values["email"],
+            "role": row.values["role"],
+            "password_hash": password_hash,
+            "permission_mask": table.mask_for(row.values["role"].value),
+            "permissions_version": table.version,
+        }
+        for row, password_hash in zip(pending, hashes)
+    ]
+    db.session.execute(db.insert(User), rows)
+
+    emails = [row["email"] for row in rows]
+    created = db.session.execute(db.select(User.id).where(User.email.in_(emails))).scalars()
+    record_audit_events((f"admin_create_user_target_{user_id}", "success", actor_id) for user_id in created)
+    invalidate_users_cache()
+
+
+def import_users(
+    stream,
+    file_format: str,
+    actor_id: int | None = None,
+    chunk_size: int = 1000,
+    hash_workers: int = 0,
+    resume_from_line: int = 0,
+    max_rows: int | None = None,
+    on_commit: Callable[[BulkImportReport, list[ImportRowError]], None] | None = None,
+) -> BulkImportReport:
+    report = BulkImportReport(resumed_from_line=resume_from_line, last_committed_line=resume_from_line)
+    seen_usernames: set[str] = set()
+    seen_emails: set[str] = set()
+    pending: list[_PendingRow] = []
+    chunk_errors: list[ImportRowError] = []
+    hasher = _Hasher(hash_workers)
+
+    def fail(line: int, field_name: str, message: str, values: dict | None = None) -> None:
+        values = values or {}
+        error = ImportRowError(line, field_name, message, values.get("username", ""), values.get("email", ""))
+        chunk_errors.append(error)
+
+    def flush(last_line: int) -> None:
+        nonlocal pending, chunk_errors
+        existing_usernames = _existing_values(User.username, [row.values["username"].lower() for row in pending])
+        existing_emails = _existing_values(User.email, [row.values["email"] for row in pending])
+
+        accepted = []
+        for row in pending:
+            if row.values["username"].lower() in existing_usernames:
+                fail(row.line, "username", "Username already exists.", row.values)
+            elif row.values["email"] in existing_emails:
+                fail(row.line, "email", "Email already exists.", row.values)
+            else:
+                accepted.append(row)
+
+        if accepted:
+            _insert_chunk(accepted, hasher, actor_id)
+        db.session.commit()
+
+        report.inserted += len(accepted)
+        report.failed += len(chunk_errors)
+        report.last_committed_line = last_line
+        report.errors.extend(chunk_errors)
+        if on_commit:
+            on_commit(report, chunk_errors)
+        pending, chunk_errors = [], []
+
+    last_line = resume_from_line
+    try:
+        for line, record, parse_error in iter_records(stream, file_format):
+            if line <= resume_from_line:
+                continue
+            if max_rows is not None and report.processed >= max_rows:
+                report.truncated = True
+                break
+
+            report.processed += 1
+            last_line = line
+            if parse_error:
+                fail(line, "row", parse_error)
+                continue
+
+            values, errors = validate_record(record)
+            if errors:
+                for field_name, message in errors:
+                    fail(line, field_name, message, record)
+                continue
+
+            username_key = values["username"].lower()
+            if username_key in seen_usernames:
+                fail(line, "username", "Duplicate username in file.", values)
+                continue
+            if values["email"] in seen_emails:
+                fail(line, "email", "Duplicate email in file.", values)
+                continue
+            seen_usernames.add(username_key)
+            seen_emails.add(values["email"])
+
+            pending.append(_PendingRow(line, values))
+            if len(pending) >= chunk_size:
+                flush(line)
+
+        flush(last_line)
+    except (SQLAlchemyError, OSError) as exc:
+        # Nothing past last_committed_line was written; rerunning from the checkpoint is safe.
+        db.session.rollback()
+        report.aborted = f"{type(exc).__name__}: {exc}"
+    finally:
+        hasher.close()
+
+    return report
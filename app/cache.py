@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import Flask, current_app, g, has_app_context, render_template
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+from sqlalchemy import event, func, insert, inspect, select, update
+
+from app.db_routing import RoutingSession
+from app.extensions import db
+from app.models import CacheVersion, User, utcnow
+
+USERS_VERSION = "users"
+
+# Cached HTML is shared between sessions, so forms carry this marker instead of a real token.
+CSRF_PLACEHOLDER = "__fragment_csrf_token__"
+
+# Columns rendered by the directory and admin dashboard. Changes to anything else
+# (failed attempt counters, last login time, password hash) do not invalidate fragments.
+USER_DISPLAY_COLUMNS = (
+    "username",
+    "email",
+    "full_name",
+    "avatar_filename",
+    "role",
+    "is_active",
+    "locked_until",
+)
+
+
+class LRUFragmentCache:
+    def __init__(self, max_entries: int = 1024, default_ttl: int = 300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float | None = None) -> None:
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisFragmentCache:
+    def __init__(self, url: str, default_ttl: int = 300, prefix: str = "fragment:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> str | None:
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float | None = None) -> None:
+        seconds = max(1, int(self.default_ttl if ttl is None else ttl))
+        self.client.set(self.prefix + key, value.encode("utf-8"), ex=seconds)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+
+class NullFragmentCache:
+    def get(self, key: str) -> str | None:
+        return None
+
+    def set(self, key: str, value: str, ttl: float | None = None) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+def init_fragment_cache(app: Flask) -> None:
+    backend = app.config.get("FRAGMENT_CACHE_BACKEND", "lru").strip().lower()
+    ttl = app.config.get("FRAGMENT_CACHE_TTL", 300)
+
+    if backend == "lru":
+        cache = LRUFragmentCache(app.config.get("FRAGMENT_CACHE_MAX_ENTRIES", 1024), ttl)
+    elif backend == "redis":
+        cache = RedisFragmentCache(app.config["FRAGMENT_CACHE_REDIS_URL"], ttl)
+    elif backend == "none":
+        cache = NullFragmentCache()
+    else:
+        raise ValueError(f"Unknown FRAGMENT_CACHE_BACKEND: {backend!r}")
+
+    app.extensions["fragment_cache"] = cache
+
+    @app.before_request
+    def _reset_users_version():
+        g.pop("users_version", None)
+
+
+def get_fragment_cache():
+    return current_app.extensions["fragment_cache"]
+
+
+def users_version() -> int:
+    if "users_version" not in g:
+        version = db.session.execute(
+            select(CacheVersion.version).where(CacheVersion.name == USERS_VERSION)
+        ).scalar()
+        g.users_version = version or 0
+    return g.users_version
+
+
+def next_lock_expiry() -> datetime | None:
+    # Locks lapse without a write, so the earliest future unlock is cached per users version
+    # and recomputed once it has passed.
+    cache = get_fragment_cache()
+    key = f"users:v{users_version()}:next_unlock"
+    now = utcnow()
+
+    cached = cache.get(key)
+    if cached is not None:
+        expiry = datetime.fromisoformat(cached) if cached else None
+        if expiry is None or expiry > now:
+            return expiry
+
+    expiry = db.session.execute(select(func.min(User.locked_until)).where(User.locked_until > now)).scalar()
+    cache.set(key, expiry.isoformat() if expiry else "")
+    return expiry
+
+
+def bump_cache_version(connection, name: str) -> None:
+    table = CacheVersion.__table__
+    result = connection.execute(update(table).where(table.c.name == name).values(version=table.c.version + 1))
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(name=name, version=1))
+
+
+def bump_users_version(connection) -> None:
+    bump_cache_version(connection, USERS_VERSION)
+    if has_app_context():
+        g.pop("users_version", None)
+
+
+def _display_changed(user: User) -> bool:
+    state = inspect(user)
+    return any(state.attrs[column].history.has_changes() for column in USER_DISPLAY_COLUMNS)
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _bump_on_user_changes(session, _flush_context, _instances):
+    changed = any(isinstance(obj, User) for obj in session.new) or any(
+        isinstance(obj, User) for obj in session.deleted
+    )
+    if not changed:
+        changed = any(isinstance(obj, User) and _display_changed(obj) for obj in session.dirty)
+    if changed:
+        # Runs inside the flush transaction, so the bump commits or rolls back with the write.
+        bump_users_version(session.connection())
+
+
+def invalidate_users_cache() -> None:
+    bump_users_version(db.session.connection())
+
+
+def fragment_ttl(users) -> float:
+    # Lock badges flip when locked_until passes without any write, so fragments showing
+    # a lock must not outlive it.
+    now = utcnow()
+    ttl = current_app.config.get("FRAGMENT_CACHE_TTL", 300)
+    for user in users:
+        if user.locked_until and user.locked_until > now:
+            ttl = min(ttl, (user.locked_until - now).total_seconds())
+    return ttl
+
+
+def cached_fragment(key: str, render, ttl: float | None = None) -> str:
+    cache = get_fragment_cache()
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = render()
+        cache.set(key, fragment, ttl)
+    return fragment
+
+
+def render_user_row(template: str, user: User, ttl: float | None = None, **context) -> Markup:
+    flags = ":".join(f"{name}={int(bool(value))}" for name, value in sorted(context.items()))
+    key = f"{template}:{user.id}:r{user.row_version}:{flags}"
+    return Markup(
+        cached_fragment(
+            key,
+            lambda: render_template(template, user=user, csrf_placeholder=CSRF_PLACEHOLDER, **context),
+            ttl,
+        )
+    )
+
+
+def with_csrf_token(fragment: str) -> Markup:
+    return Markup(fragment.replace(CSRF_PLACEHOLDER, generate_csrf()))
@@ -0,0 +1,525 @@
+import os
+import time
+from pathlib import Path
+
+import click
+from flask import Flask, current_app
+
+from app.avatar_gc import collect_orphan_avatars
+from app.bulk_admin import BULK_ACTIONS, USER_FILTERS, BulkActionError, apply_bulk_action
+from app.bulk_import import ImportCheckpoint, detect_format, import_users, write_errors
+from app.extensions import db
+from app.models import Group, Permission, Role, User
+from app.observability.startup import format_import_tree, profile_startup
+from app.security.audit_chain import verify_chain
+from app.security.breached import CorpusFormatError, build_corpus, get_breached_corpus
+from app.security.hierarchy import HierarchyError, add_member, create_group, create_role, delete_node, move, remove_member
+from app.security.permissions import (
+    PERMISSION_BITS,
+    compile_permission_table,
+    materialize_user_permissions,
+    permission_names,
+    sync_permissions,
+)
+from app.storage import get_avatar_storage
+from app.templating import template_cache_dir, warm_templates
+
+
+def register_commands(app: Flask) -> None:
+    app.cli.add_command(avatars_cli)
+    app.cli.add_command(templates_cli)
+    app.cli.add_command(startup_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(permissions_cli)
+    app.cli.add_command(roles_cli)
+    app.cli.add_command(groups_cli)
+    app.cli.add_command(audit_cli)
+    app.cli.add_command(passwords_cli)
+
+
+@click.group("avatars")
+def avatars_cli():
+    """Avatar storage maintenance."""
+
+
+@avatars_cli.command("gc")
+@click.option("--batch-size", default=500, show_default=True, help="Objects checked per database query.")
+@click.option("--min-age", "min_age_minutes", default=60, show_default=True, help="Skip objects newer than this many minutes.")
+@click.option("--quarantine", is_flag=True, help="Move orphans aside instead of deleting them.")
+@click.option("--dry-run", is_flag=True, help="Report orphans without touching storage.")
+@click.option("--rate", "max_per_second", default=0.0, show_default=True, help="Maximum removals per second (0 = unlimited).")
+@click.option("--limit", type=int, default=None, help="Stop after removing this many objects.")
+def avatars_gc(batch_size, min_age_minutes, quarantine, dry_run, max_per_second, limit):
+    """Remove avatar files that no user references."""
+    report = collect_orphan_avatars(
+        get_avatar_storage(),
+        batch_size=batch_size,
+        min_age_minutes=min_age_minutes,
+        quarantine=quarantine,
+        dry_run=dry_run,
+        max_per_second=max_per_second,
+        limit=limit,
+    )
+
+    click.echo(f"Scanned {report.scanned} objects ({report.referenced} referenced, {report.skipped_recent} too recent).")
+    if dry_run and quarantine:
+        click.echo(f"Found {report.orphans} orphans; {report.bytes_quarantined} bytes would be quarantined.")
+    elif dry_run:
+        click.echo(f"Found {report.orphans} orphans; {report.bytes_reclaimed} bytes would be reclaimed.")
+    elif quarantine:
+        click.echo(
+            f"Found {report.orphans} orphans; quarantined {report.quarantined} "
+            f"({report.bytes_quarantined} bytes, still in storage under .quarantine/)."
+        )
+    else:
+        click.echo(f"Found {report.orphans} orphans; removed {report.removed}, reclaimed {report.bytes_reclaimed} bytes.")
+    for error in report.errors:
+        click.echo(f"[ERROR] {error}", err=True)
+
+
+@click.group("templates")
+def templates_cli():
+    """Jinja template cache maintenance."""
+
+
+@templates_cli.command("compile")
+@click.option("--clear", is_flag=True, help="Drop existing bytecode before compiling.")
+def templates_compile(clear):
+    """Compile every template into the shared bytecode cache."""
+    app = current_app._get_current_object()
+    cache = app.jinja_env.bytecode_cache
+    if cache is None:
+        raise click.ClickException("TEMPLATE_BYTECODE_CACHE_ENABLED is false.")
+
+    if clear:
+        cache.clear()
+    # Compiled templates may already be held in memory from startup warmup.
+    app.jinja_env.cache.clear()
+
+    started = time.perf_counter()
+    count = warm_templates(app)
+    elapsed = (time.perf_counter() - started) * 1000
+    click.echo(f"Compiled {count} templates into {template_cache_dir(app)} in {elapsed:.1f} ms.")
+
+
+@click.group("startup")
+def startup_cli():
+    """Application startup diagnostics."""
+
+
+@startup_cli.command("profile")
+@click.option("--env", "flask_env", default=None, help="FLASK_ENV for the profiled process (defaults to the current one).")
+@click.option("--min-ms", default=5.0, show_default=True, help="Hide imports cheaper than this (cumulative).")
+@click.option("--depth", default=4, show_default=True, help="Maximum import tree depth to print.")
+@click.option("--top", default=15, show_default=True, help="Number of top-level packages to list.")
+def startup_profile(flask_env, min_ms, depth, top):
+    """Profile imports and create_app phases in a fresh interpreter."""
+    profile = profile_startup({"FLASK_ENV": flask_env} if flask_env else None)
+
+    click.echo(f"import app:  {profile.import_ms:9.1f} ms")
+    click.echo(f"create_app:  {profile.create_app_ms:9.1f} ms")
+    click.echo(f"peak RSS:    {profile.max_rss_kb / 1024:9.1f} MiB")
+
+    click.echo("\ncreate_app phases:")
+    for name, elapsed in profile.phases_ms.items():
+        click.echo(f"  {name:24} {elapsed:9.1f} ms")
+
+    click.echo("\nSelf import time by package:")
+    for package, elapsed in profile.by_package()[:top]:
+        click.echo(f"  {package:24} {elapsed:9.1f} ms")
+
+    click.echo("\nImport tree (cumulative, self):")
+    for line in format_import_tree(profile.imports, min_ms=min_ms, max_depth=depth):
+        click.echo(f"  {line}")
+
+
+@click.group("users")
+def users_cli():
+    """User account administration."""
+
+
+@users_cli.command("import")
+@click.argument("source", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--format", "file_format", type=click.Choice(["csv", "ndjson"]), default=None, help="Defaults to the file extension.")
+@click.option("--chunk-size", default=None, type=int, help="Rows hashed and inserted per transaction.")
+@click.option("--workers", default=os.cpu_count() or 1, show_default=True, help="Argon2 hashing processes.")
+@click.option("--actor", "actor_email", default=None, help="Admin email recorded as the actor in the audit log.")
+@click.option("--errors", "errors_path", type=click.Path(dir_okay=False, path_type=Path), default=None, help="Per-row error report (CSV). Defaults to SOURCE.errors.csv.")
+@click.option("--checkpoint", "checkpoint_path", type=click.Path(dir_okay=False, path_type=Path), default=None, help="Defaults to SOURCE.checkpoint.json.")
+@click.option("--resume", is_flag=True, help="Continue after the last committed line in the checkpoint.")
+def users_import(source, file_format, chunk_size, workers, actor_email, errors_path, checkpoint_path, resume):
+    """Create users in bulk from a CSV or NDJSON file."""
+    try:
+        file_format = file_format or detect_format(source.name)
+    except ValueError as exc:
+        raise click.ClickException(str(exc)) from exc
+
+    actor_id = None
+    if actor_email:
+        actor = User.query.filter_by(email=actor_email.strip().lower()).first()
+        if actor is None:
+            raise click.ClickException(f"No user with email {actor_email}.")
+        actor_id = actor.id
+
+    checkpoint = ImportCheckpoint(checkpoint_path or source.with_name(source.name + ".checkpoint.json"), source)
+    errors_path = errors_path or source.with_name(source.name + ".errors.csv")
+    resume_from_line = 0
+    if resume:
+        try:
+            state = checkpoint.load()
+        except ValueError as exc:
+            raise click.ClickException(str(exc)) from exc
+        resume_from_line = state["line"] if state else 0
+        click.echo(f"Resuming after line {resume_from_line}.")
+
+    started = time.perf_counter()
+    with open(errors_path, "a" if resume else "w", newline="", encoding="utf-8") as errors_file:
+        if errors_file.tell() == 0:
+            write_errors(errors_file, [], header=True)
+
+        def on_commit(report, chunk_errors):
+            write_errors(errors_file, chunk_errors)
+            errors_file.flush()
+            checkpoint.save(report)
+            click.echo(f"  committed through line {report.last_committed_line}: {report.inserted} inserted, {report.failed} failed")
+
+        with open(source, newline="", encoding="utf-8-sig") as stream:
+            try:
+                report = import_users(
+                    stream,
+                    file_format,
+                    actor_id=actor_id,
+                    chunk_size=chunk_size or current_app.config.get("BULK_IMPORT_CHUNK_SIZE", 1000),
+                    hash_workers=workers,
+                    resume_from_line=resume_from_line,
+                    on_commit=on_commit,
+                )
+            except ValueError as exc:
+                raise click.ClickException(str(exc)) from exc
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"Processed {report.processed} rows in {elapsed:.1f}s: {report.inserted} inserted, {report.failed} failed.")
+    if report.failed:
+        click.echo(f"Row errors written to {errors_path}.")
+    if report.aborted:
+        raise click.ClickException(f"Import stopped after line {report.last_committed_line}: {report.aborted}. Rerun with --resume.")
+
+
+@users_cli.command("bulk")
+@click.argument("action", type=click.Choice(BULK_ACTIONS))
+@click.option("--value", default=None, help="New role (admin/user) or status (active/inactive).")
+@click.option("--ids", "id_list", default=None, help="Comma-separated user ids.")
+@click.option("--filter", "filter_name", type=click.Choice(USER_FILTERS), default=None, help="Target every matching user.")
+@click.option("--actor", "actor_email", default=None, help="Admin email recorded as the actor in the audit log.")
+def users_bulk(action, value, id_list, filter_name, actor_email):
+    """Change role or status, unlock or delete many users at once."""
+    try:
+        user_ids = [int(user_id) for user_id in id_list.split(",") if user_id.strip()] if id_list else None
+    except ValueError as exc:
+        raise click.ClickException("--ids must be a comma-separated list of integers.") from exc
+
+    actor_id = None
+    if actor_email:
+        actor = User.query.filter_by(email=actor_email.strip().lower()).first()
+        if actor is None:
+            raise click.ClickException(f"No user with email {actor_email}.")
+        actor_id = actor.id
+
+    try:
+        result = apply_bulk_action(action, actor_id=actor_id, user_ids=user_ids, filter_name=filter_name, value=value)
+    except BulkActionError as exc:
+        raise click.ClickException(str(exc)) from exc
+
+    if result.skipped_self:
+        click.echo("Skipped the actor's own account.")
+    click.echo(f"{action}: {result.matched} matched, {result.changed} changed.")
+
+
+@click.group("permissions")
+def permissions_cli():
+    """Role and permission administration."""
+
+
+@permissions_cli.command("sync")
+def permissions_sync():
+    """Create permissions and built-in roles that are missing from the database."""
+    created = sync_permissions()
+    click.echo(f"Created {created['permissions']} permissions, {created['roles']} roles, {created['grants']} grants.")
+
+
+@permissions_cli.command("show")
+def permissions_show():
+    """Print the compiled permission mask of every role."""
+    table = compile_permission_table()
+    click.echo(f"Permission table version {table.version}")
+    for role, mask in sorted(table.role_masks.items()):
+        click.echo(f"  {role:12} {mask:#06x}  {', '.join(permission_names(mask)) or '-'}")
+    if table.group_masks:
+        names = dict(db.session.execute(db.select(Group.id, Group.name)).all())
+        click.echo("Groups")
+        for group_id, mask in sorted(table.group_masks.items(), key=lambda item: names.get(item[0], "")):
+            click.echo(f"  {names.get(group_id, group_id):12} {mask:#06x}  {', '.join(permission_names(mask)) or '-'}")
+
+
+@permissions_cli.command("materialize")
+@click.option("--chunk-size", default=2000, show_default=True, type=click.IntRange(min=1))
+def permissions_materialize(chunk_size):
+    """Rewrite stored per-user permission masks that are out of date."""
+    updated = materialize_user_permissions(chunk_size)
+    click.echo(f"Updated {updated} users.")
+
+
+def _commit_and_materialize() -> None:
+    db.session.commit()
+    click.echo(f"Updated {materialize_user_permissions()} user permission masks.")
+
+
+def _role_and_permission(role_name: str, permission_name: str) -> tuple[Role, Permission]:
+    role = Role.query.filter_by(name=role_name).first()
+    if role is None:
+        raise click.ClickException(f"No role named {role_name!r}.")
+    if permission_name not in PERMISSION_BITS:
+        raise click.ClickException(f"Unknown permission {permission_name!r}.")
+    permission = Permission.query.filter_by(name=permission_name).first()
+    if permission is None:
+        raise click.ClickException(f"Permission {permission_name!r} is not in the database; run `flask permissions sync`.")
+    return role, permission
+
+
+@permissions_cli.command("grant")
+@click.argument("role_name")
+@click.argument("permission_name")
+def permissions_grant(role_name, permission_name):
+    """Grant a permission to a role."""
+    role, permission = _role_and_permission(role_name, permission_name)
+    if permission not in role.permissions:
+        role.permissions.append(permission)
+        _commit_and_materialize()
+    click.echo(f"{role_name} can {permission_name}.")
+
+
+@permissions_cli.command("revoke")
+@click.argument("role_name")
+@click.argument("permission_name")
+def permissions_revoke(role_name, permission_name):
+    """Revoke a permission from a role."""
+    role, permission = _role_and_permission(role_name, permission_name)
+    if permission in role.permissions:
+        role.permissions.remove(permission)
+        _commit_and_materialize()
+    click.echo(f"{role_name} can no longer {permission_name}.")
+
+
+def _get_named(model, name: str | None):
+    if not name:
+        return None
+    node = model.query.filter_by(name=name).first()
+    if node is None:
+        raise click.ClickException(f"No {model.__tablename__[:-1]} named {name!r}.")
+    return node
+
+
+def _get_user(email: str) -> User:
+    user = User.query.filter_by(email=email.strip().lower()).first()
+    if user is None:
+        raise click.ClickException(f"No user with email {email}.")
+    return user
+
+
+@click.group("roles")
+def roles_cli():
+    """Role hierarchy administration."""
+
+
+@roles_cli.command("create")
+@click.argument("name")
+@click.option("--parent", default=None, help="Senior role that includes the new role.")
+@click.option("--description", default=None)
+def roles_create(name, parent, description):
+    """Create a role, optionally below a senior role."""
+    try:
+        create_role(name, description, _get_named(Role, parent))
+    except HierarchyError as exc:
+        raise click.ClickException(str(exc)) from exc
+    _commit_and_materialize()
+    click.echo(f"Created role {name}.")
+
+
+@roles_cli.command("move")
+@click.argument("name")
+@click.option("--parent", default=None, help="New senior role; omit to make the role a root.")
+def roles_move(name, parent):
+    """Move a role and everything below it under another role."""
+    try:
+        move(_get_named(Role, name), _get_named(Role, parent))
+    except HierarchyError as exc:
+        raise click.ClickException(str(exc)) from exc
+    _commit_and_materialize()
+    click.echo(f"Moved role {name}.")
+
+
+@roles_cli.command("delete")
+@click.argument("name")
+def roles_delete(name):
+    """Delete a role; the roles below it move up one level."""
+    try:
+        delete_node(_get_named(Role, name))
+    except HierarchyError as exc:
+        raise click.ClickException(str(exc)) from exc
+    _commit_and_materialize()
+    click.echo(f"Deleted role {name}.")
+
+
+@click.group("groups")
+def groups_cli():
+    """Group hierarchy and membership administration."""
+
+
+@groups_cli.command("create")
+@click.argument("name")
+@click.option("--parent", default=None, help="Enclosing group; members also belong to it.")
+@click.option("--description", default=None)
+def groups_create(name, parent, description):
+    """Create a group, optionally inside another group."""
+    try:
+        create_group(name, description, _get_named(Group, parent))
+    except HierarchyError as exc:
+        raise click.ClickException(str(exc)) from exc
+    _commit_and_materialize()
+    click.echo(f"Created group {name}.")
+
+
+@groups_cli.command("move")
+@click.argument("name")
+@click.option("--parent", default=None, help="New enclosing group; omit to make the group a root.")
+def groups_move(name, parent):
+    """Move a group and its subgroups under another group."""
+    try:
+        move(_get_named(Group, name), _get_named(Group, parent))
+    except HierarchyError as exc:
+        raise click.ClickException(str(exc)) from exc
+    _commit_and_materialize()
+    click.echo(f"Moved group {name}.")
+
+
+@groups_cli.command("delete")
+@click.argument("name")
+def groups_delete(name):
+    """Delete a group; its subgroups move up one level."""
+    delete_node(_get_named(Group, name))
+    _commit_and_materialize()
+    click.echo(f"Deleted group {name}.")
+
+
+@groups_cli.command("grant")
+@click.argument("group_name")
+@click.argument("role_name")
+def groups_grant(group_name, role_name):
+    """Give every member of a group (and its subgroups) a role."""
+    group, role = _get_named(Group, group_name), _get_named(Role, role_name)
+    if role not in group.roles:
+        group.roles.append(role)
+        _commit_and_materialize()
+    click.echo(f"Members of {group_name} hold {role_name}.")
+
+
+@groups_cli.command("revoke")
+@click.argument("group_name")
+@click.argument("role_name")
+def groups_revoke(group_name, role_name):
+    """Take a role away from a group."""
+    group, role = _get_named(Group, group_name), _get_named(Role, role_name)
+    if role in group.roles:
+        group.roles.remove(role)
+        _commit_and_materialize()
+    click.echo(f"Members of {group_name} no longer hold {role_name}.")
+
+
+@groups_cli.command("add-member")
+@click.argument("group_name")
+@click.argument("email")
+def groups_add_member(group_name, email):
+    """Add a user to a group."""
+    add_member(_get_named(Group, group_name), _get_user(email))
+    db.session.commit()
+    click.echo(f"{email} is a member of {group_name}.")
+
+
+@groups_cli.command("remove-member")
+@click.argument("group_name")
+@click.argument("email")
+def groups_remove_member(group_name, email):
+    """Remove a user from a group."""
+    remove_member(_get_named(Group, group_name), _get_user(email))
+    db.session.commit()
+    click.echo(f"{email} is no longer a member of {group_name}.")
+
+
+@click.group("audit")
+def audit_cli():
+    """Audit log integrity tools."""
+
+
+@audit_cli.command("verify")
+@click.option("--workers", type=click.IntRange(min=1), default=None, help="Defaults to AUDIT_VERIFY_WORKERS.")
+@click.option("--chunk-rows", type=click.IntRange(min=1), default=None, help="Defaults to AUDIT_VERIFY_CHUNK_ROWS.")
+def audit_verify(workers, chunk_rows):
+    """Check the audit log hash chain and Merkle checkpoints."""
+    report = verify_chain(
+        workers=workers or current_app.config["AUDIT_VERIFY_WORKERS"],
+        chunk_size=chunk_rows or current_app.config["AUDIT_VERIFY_CHUNK_ROWS"],
+        database_url=db.engine.url.render_as_string(hide_password=False),
+    )
+    click.echo(
+        f"Checked {report.rows} rows and {report.checkpoints} checkpoints in {report.chunks} chunks "
+        f"({report.seconds:.1f}s, {report.legacy_rows} unchained legacy rows)."
+    )
+    for error in report.errors:
+        click.echo(f"  {error}")
+    if not report.ok:
+        raise click.ClickException(f"Audit log verification failed with {report.error_count} problems.")
+
+
+@click.group("passwords")
+def passwords_cli():
+    """Breached password corpus tools."""
+
+
+@passwords_cli.command("build")
+@click.argument("source", type=click.File("r", encoding="utf-8", errors="replace", lazy=True))
+@click.option("--output", type=click.Path(dir_okay=False), default=None, help="Defaults to BREACHED_PASSWORDS_FILE.")
+@click.option("--index-bits", type=click.IntRange(0, 24), default=None, help="Prefix index size; defaults to BREACHED_PASSWORDS_INDEX_BITS.")
+@click.option("--min-count", type=click.IntRange(min=1), default=1, show_default=True, help="Skip hashes seen fewer times than this.")
+def passwords_build(source, output, index_bits, min_count):
+    """Compile an ordered SHA1:COUNT dump into the memory-mapped corpus."""
+    output = output or current_app.config["BREACHED_PASSWORDS_FILE"]
+    if not output:
+        raise click.ClickException("Pass --output or set BREACHED_PASSWORDS_FILE.")
+    if index_bits is None:
+        index_bits = current_app.config["BREACHED_PASSWORDS_INDEX_BITS"]
+
+    started = time.perf_counter()
+    try:
+        report = build_corpus(source, output, index_bits=index_bits, min_count=min_count)
+    except CorpusFormatError as exc:
+        raise click.ClickException(str(exc)) from exc
+    click.echo(
+        f"Wrote {report.records} hashes to {output} in {time.perf_counter() - started:.1f}s "
+        f"({report.duplicates} duplicates, {report.below_min_count} below --min-count, {report.invalid} invalid lines)."
+    )
+
+
+@passwords_cli.command("check")
+@click.password_option("--password", confirmation_prompt=False)
+def passwords_check(password):
+    """Look a password up in the breached password corpus."""
+    corpus = get_breached_corpus(current_app)
+    if corpus is None:
+        raise click.ClickException("BREACHED_PASSWORDS_FILE is not set.")
+    started = time.perf_counter()
+    found = corpus.contains(password)
+    elapsed_us = (time.perf_counter() - started) * 1_000_000
+    if found is None:
+        raise click.ClickException(f"{corpus.path} is missing or unusable; see the log for details.")
+    verdict = "is in" if found else "is not in"
+    click.echo(f"Password {verdict} the corpus of {len(corpus)} hashes ({elapsed_us:.0f}us).")
@@ -0,0 +1,113 @@
+import time
+
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from app.db_routing import REPLICA_ENGINE_KEY
+from app.extensions import db
+from app.observability.metrics import (
+    DB_POOL_CHECKOUT_TIMEOUTS,
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_CONNECTIONS,
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def build_engine_options(database_uri: str, config) -> dict:
+    options = dict(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    url = make_url(database_uri)
+
+    # SQLite uses single-connection pools that reject sizing arguments.
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    options.setdefault("poolclass", InstrumentedQueuePool)
+    options.setdefault("pool_size", config.get("DB_POOL_SIZE", 10))
+    options.setdefault("max_overflow", config.get("DB_MAX_OVERFLOW", 10))
+    options.setdefault("pool_timeout", config.get("DB_POOL_TIMEOUT", 10))
+    options.setdefault("pool_recycle", config.get("DB_POOL_RECYCLE", 1800))
+    options.setdefault("pool_pre_ping", config.get("DB_POOL_PRE_PING", True))
+    return options
+
+
+def configure_engine_options(app: Flask) -> None:
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = build_engine_options(
+        app.config["SQLALCHEMY_DATABASE_URI"],
+        app.config,
+    )
+
+
+def init_replica_engine(app: Flask) -> None:
+    # Kept out of SQLALCHEMY_BINDS: binds add a metadata per key to the shared db object,
+    # and the replica mirrors the default schema rather than owning tables of its own.
+    replica_uri = app.config.get("DATABASE_REPLICA_URL")
+    if replica_uri:
+        app.extensions[REPLICA_ENGINE_KEY] = create_engine(
+            replica_uri,
+            **build_engine_options(replica_uri, app.config),
+        )
+
+
+def pool_status(engine=None) -> dict:
+    engine = engine or db.engine
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        "overflow": pool.overflow(),
+        "saturation": round(checked_out / capacity, 3) if capacity > 0 else 0.0,
+    }
+
+
+def warm_db_pool(app: Flask, connections: int | None = None) -> int:
+    with app.app_context():
+        engine = db.engine
+        if not isinstance(engine.pool, QueuePool):
+            return 0
+
+        target = connections or app.config.get("DB_POOL_WARMUP_CONNECTIONS") or engine.pool.size()
+        opened = []
+        try:
+            for _ in range(min(target, engine.pool.size())):
+                opened.append(engine.connect())
+        except SQLAlchemyError as exc:
+            app.logger.warning("Database pool warmup stopped after %d connections: %s", len(opened), exc)
+        finally:
+            for connection in opened:
+                connection.close()
+        return len(opened)
+
+
+def register_pool_metrics(app: Flask) -> None:
+    with app.app_context():
+        engine = db.engine
+
+    def stat(key: str):
+        return lambda: pool_status(engine).get(key, 0)
+
+    DB_POOL_CONNECTIONS.set_function(stat("size"), "size")
+    DB_POOL_CONNECTIONS.set_function(stat("checked_out"), "checked_out")
+    DB_POOL_CONNECTIONS.set_function(stat("overflow"), "overflow")
+    DB_POOL_CONNECTIONS.set_function(stat("saturation"), "saturation")
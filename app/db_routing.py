@@ -0,0 +1,77 @@
+import time
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import Flask, current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_ENGINE_KEY = "db_replica_engine"
+
+
+def _primary_is_sticky() -> bool:
+    if g.get("db_wrote"):
+        return True
+    cookie_name = current_app.config.get("DB_REPLICA_STICKY_COOKIE", "db_primary_until")
+    try:
+        sticky_until = float(request.cookies.get(cookie_name, 0))
+    except ValueError:
+        return False
+    return sticky_until > time.time()
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._should_use_replica(clause):
+            return current_app.extensions[REPLICA_ENGINE_KEY]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _should_use_replica(self, clause) -> bool:
+        if not isinstance(clause, sa.Select) or self._flushing:
+            return False
+        if not has_request_context() or not g.get("use_read_replica"):
+            return False
+        if REPLICA_ENGINE_KEY not in current_app.extensions:
+            return False
+        # Pending changes were autoflushed before get_bind, so a write in this request
+        # has already marked it sticky.
+        return not _primary_is_sticky()
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _remember_write(session, _flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+
+def use_read_replica(view_func):
+    @wraps(view_func)
+    def wrapped(*args, **kwargs):
+        g.use_read_replica = True
+        return view_func(*args, **kwargs)
+
+    return wrapped
+
+
+def init_replica_routing(app: Flask) -> None:
+    @app.before_request
+    def _reset_routing_flags():
+        g.use_read_replica = False
+        g.db_wrote = False
+
+    @app.after_request
+    def _set_primary_stickiness(response):
+        if not g.get("db_wrote"):
+            return response
+
+        window = app.config.get("DB_REPLICA_STICKINESS_SECONDS", 5)
+        if window > 0 and app.config.get("DATABASE_REPLICA_URL"):
+            response.set_cookie(
+                app.config.get("DB_REPLICA_STICKY_COOKIE", "db_primary_until"),
+                str(int(time.time()) + window),
+                max_age=window,
+                httponly=True,
+                secure=app.config.get("JWT_COOKIE_SECURE", False),
+                samesite="Lax",
+            )
+        return response
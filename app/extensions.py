@@ -1,10 +1,23 @@
+import click
+from flask import Flask
 from flask_jwt_extended import JWTManager
-from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import CSRFProtect
 
+from app.db_routing import RoutingSession
 
-db = SQLAlchemy()
-migrate = Migrate()
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 jwt = JWTManager()
 csrf = CSRFProtect()
+
+
+def init_migrations(app: Flask) -> None:
+    # Flask-Migrate imports Alembic, the largest single import in the app. Only `flask db ...`
+    # needs it, and those commands always build the app inside a click context.
+    if click.get_current_context(silent=True) is None and not app.config.get("DB_MIGRATE_ALWAYS_LOAD"):
+        return
+
+    from flask_migrate import Migrate
+
+    Migrate().init_app(app, db)
@@ -0,0 +1,74 @@
+import hashlib
+from functools import wraps
+from pathlib import Path
+
+from flask import Flask, current_app, g, make_response, request, session
+
+from app.cache import next_lock_expiry, users_version
+
+TEMPLATE_FINGERPRINT_KEY = "template_fingerprint"
+
+
+def _template_fingerprint(app: Flask) -> str:
+    # Deploys that change a template must not keep answering 304 for pages rendered by the old one.
+    digest = hashlib.sha1()
+    template_dir = Path(app.root_path) / (app.template_folder or "templates")
+    for path in sorted(template_dir.rglob("*.html")):
+        stat = path.stat()
+        digest.update(f"{path.relative_to(template_dir)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+def init_http_cache(app: Flask) -> None:
+    app.extensions[TEMPLATE_FINGERPRINT_KEY] = _template_fingerprint(app)
+
+
+def _apply_private_caching(response, etag: str | None = None):
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.cache_control.must_revalidate = True
+    response.vary.add("Cookie")
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def view_etag(include_locks: bool = False) -> str:
+    user = g.current_user
+    parts = [
+        current_app.extensions.get(TEMPLATE_FINGERPRINT_KEY, ""),
+        request.endpoint or "",
+        str(users_version()),
+        str(user.id),
+        str(user.row_version),
+        # Forms embed tokens derived from the session's CSRF secret.
+        session.get("csrf_token", ""),
+    ]
+    if include_locks:
+        expiry = next_lock_expiry()
+        parts.append(expiry.isoformat() if expiry else "")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def conditional_view(include_locks: bool = False):
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(*args, **kwargs):
+            if not current_app.config.get("HTTP_CONDITIONAL_GET_ENABLED", True):
+                return view_func(*args, **kwargs)
+
+            # Pending flash messages are rendered into the body, so that response is never
+            # interchangeable with a cached copy.
+            if session.get("_flashes"):
+                return _apply_private_caching(make_response(view_func(*args, **kwargs)))
+
+            etag = view_etag(include_locks)
+            if request.if_none_match.contains_weak(etag):
+                return _apply_private_caching(make_response("", 304), etag)
+
+            response = make_response(view_func(*args, **kwargs))
+            return _apply_private_caching(response, etag if response.status_code == 200 else None)
+
+        return wrapped
+
+    return decorator
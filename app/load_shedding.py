@@ -0,0 +1,227 @@
+import random
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+
+from flask import Flask
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+from werkzeug.wrappers import Response
+
+from app.observability.metrics import (
+    KDF_IN_FLIGHT,
+    LOAD_SHED_DECISIONS,
+    LOAD_SHED_IN_FLIGHT,
+    LOAD_SHED_LEVEL,
+    LOAD_SHED_QUEUE_DELAY,
+)
+
+LOAD_SHEDDER_KEY = "load_shedder"
+PAGE_CLASS = "page"
+EXEMPT_CLASS = "exempt"
+EXEMPT_ENDPOINTS = {"metrics", "static"}
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_kdf_lock = threading.Lock()
+_kdf_in_flight = 0
+
+
+@contextmanager
+def track_kdf():
+    global _kdf_in_flight
+    with _kdf_lock:
+        _kdf_in_flight += 1
+    try:
+        yield
+    finally:
+        with _kdf_lock:
+            _kdf_in_flight -= 1
+
+
+def kdf_in_flight() -> int:
+    return _kdf_in_flight
+
+
+def parse_request_start(value: str, now: float) -> float | None:
+    # Proxies send "t=<epoch>" in seconds (nginx $msec), milliseconds or microseconds.
+    try:
+        started = float(value.strip().removeprefix("t="))
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1_000_000
+    elif started > 1e11:
+        started /= 1000
+    delay = now - started
+    return delay if 0 <= delay < 60 else None
+
+
+class LoadShedder:
+    # Per-worker admission control. Each class has an in-flight limit. The overload level rises
+    # while even the least-delayed request of an interval queued longer than the target (the
+    # CoDel signal for a standing queue). At level n, the first n classes in priority order are
+    # rejected without queueing.
+    def __init__(
+        self,
+        priority: tuple[str, ...],
+        limits: dict[str, int],
+        queue_timeout: float,
+        target_delay: float,
+        interval: float,
+        max_kdf_in_flight: int,
+        kdf_classes: set[str],
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.priority = priority
+        self.limits = limits
+        self.queue_timeout = queue_timeout
+        self.target_delay = target_delay
+        self.interval = interval
+        self.max_kdf_in_flight = max_kdf_in_flight
+        self.kdf_classes = kdf_classes
+        self.clock = clock
+        self.level = 0
+        self.in_flight = {name: 0 for name in priority}
+        self._ranks = {name: rank for rank, name in enumerate(priority)}
+        self._condition = threading.Condition()
+        self._interval_ends = clock() + interval
+        self._min_delay: float | None = None
+
+    def _tick(self, now: float) -> None:
+        if now < self._interval_ends:
+            return
+        if self._min_delay is not None and self._min_delay > self.target_delay:
+            # The last class is only ever bounded by its limit, never shed wholesale.
+            self.level = min(self.level + 1, len(self.priority) - 1)
+        elif self.level:
+            self.level -= 1
+        self._min_delay = None
+        self._interval_ends = now + self.interval
+
+    def _record_delay(self, delay: float) -> None:
+        if self._min_delay is None or delay < self._min_delay:
+            self._min_delay = delay
+
+    def observe_delay(self, delay: float) -> None:
+        with self._condition:
+            self._tick(self.clock())
+            self._record_delay(delay)
+
+    def admit(self, name: str) -> str | None:
+        with self._condition:
+            now = self.clock()
+            self._tick(now)
+            if self._ranks.get(name, len(self.priority)) < self.level:
+                return "overload"
+            if name in self.kdf_classes and self.max_kdf_in_flight and kdf_in_flight() >= self.max_kdf_in_flight:
+                return "kdf"
+
+            limit = self.limits.get(name, 0)
+            if limit and self.in_flight.get(name, 0) >= limit:
+                if not self._condition.wait_for(lambda: self.in_flight.get(name, 0) < limit, self.queue_timeout):
+                    self._record_delay(self.clock() - now)
+                    return "limit"
+            delay = self.clock() - now
+            self._record_delay(delay)
+            self.in_flight[name] = self.in_flight.get(name, 0) + 1
+        LOAD_SHED_QUEUE_DELAY.observe(delay, name)
+        return None
+
+    def release(self, name: str) -> None:
+        with self._condition:
+            self.in_flight[name] -= 1
+            # Waiters of every class share the condition.
+            self._condition.notify_all()
+
+
+class LoadSheddingMiddleware:
+    # Runs before Flask builds the request context, so a shed request costs a URL match and
+    # never reaches CSRF, session or database work.
+    def __init__(self, wsgi_app, flask_app: Flask, shedder: LoadShedder):
+        self.wsgi_app = wsgi_app
+        self.flask_app = flask_app
+        self.shedder = shedder
+        config = flask_app.config
+        self.endpoint_classes = config["LOAD_SHED_ENDPOINT_CLASSES"]
+        self.retry_after = config["LOAD_SHED_RETRY_AFTER"]
+        self.trust_request_start = config["LOAD_SHED_TRUST_REQUEST_START"]
+
+    def classify(self, environ) -> str:
+        url_map = self.flask_app.url_map
+        adapter = url_map.bind_to_environ(
+            environ,
+            server_name=self.flask_app.config["SERVER_NAME"],
+            subdomain=url_map.default_subdomain or "",
+        )
+        method = environ.get("REQUEST_METHOD", "GET")
+        try:
+            endpoint, _ = adapter.match(method=method)
+        except (HTTPException, RequestRedirect):
+            return EXEMPT_CLASS
+        if endpoint in EXEMPT_ENDPOINTS:
+            return EXEMPT_CLASS
+        if method in SAFE_METHODS:
+            return PAGE_CLASS
+        return self.endpoint_classes.get(endpoint, PAGE_CLASS)
+
+    def _reject(self, name: str, reason: str, environ, start_response):
+        LOAD_SHED_DECISIONS.inc(name, reason)
+        # Jitter spreads the retries of a burst that was shed together.
+        retry_after = self.retry_after + random.randint(0, self.retry_after)
+        response = Response(
+            "Service is busy, please retry shortly.\n",
+            status=503,
+            mimetype="text/plain",
+            headers={"Retry-After": str(retry_after), "Cache-Control": "no-store"},
+        )
+        return response(environ, start_response)
+
+    def __call__(self, environ, start_response):
+        name = self.classify(environ)
+        if name == EXEMPT_CLASS:
+            return self.wsgi_app(environ, start_response)
+
+        if self.trust_request_start and "HTTP_X_REQUEST_START" in environ:
+            delay = parse_request_start(environ["HTTP_X_REQUEST_START"], time.time())
+            if delay is not None:
+                self.shedder.observe_delay(delay)
+
+        reason = self.shedder.admit(name)
+        if reason is not None:
+            return self._reject(name, reason, environ, start_response)
+        LOAD_SHED_DECISIONS.inc(name, "admitted")
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            self.shedder.release(name)
+
+
+def get_load_shedder(app: Flask) -> LoadShedder | None:
+    return app.extensions.get(LOAD_SHEDDER_KEY)
+
+
+def init_load_shedding(app: Flask) -> None:
+    KDF_IN_FLIGHT.set_function(kdf_in_flight)
+    if not app.config.get("LOAD_SHED_ENABLED", True):
+        return
+
+    config = app.config
+    priority = tuple(config["LOAD_SHED_PRIORITY"])
+    if PAGE_CLASS not in priority:
+        priority += (PAGE_CLASS,)
+    shedder = LoadShedder(
+        priority=priority,
+        limits=config["LOAD_SHED_LIMITS"],
+        queue_timeout=config["LOAD_SHED_QUEUE_TIMEOUT_MS"] / 1000,
+        target_delay=config["LOAD_SHED_TARGET_DELAY_MS"] / 1000,
+        interval=config["LOAD_SHED_INTERVAL_MS"] / 1000,
+        max_kdf_in_flight=config["LOAD_SHED_MAX_KDF_IN_FLIGHT"],
+        kdf_classes=set(config["LOAD_SHED_KDF_CLASSES"]),
+    )
+    app.extensions[LOAD_SHEDDER_KEY] = shedder
+    app.wsgi_app = LoadSheddingMiddleware(app.wsgi_app, app, shedder)
+
+    LOAD_SHED_LEVEL.set_function(lambda: shedder.level)
+    for name in priority:
+        LOAD_SHED_IN_FLIGHT.set_function(lambda name=name: shedder.in_flight[name], name)
@@ -1,9 +1,20 @@
 from datetime import UTC, datetime
 from enum import Enum
-
-from passlib.hash import argon2
+from functools import cache
 
 from app.extensions import db
+from app.load_shedding import track_kdf
+from app.observability.metrics import KDF_HASH_SECONDS, KDF_VERIFY_SECONDS
+from app.observability.tracing import span
+
+
+@cache
+def password_hasher():
+    # passlib's registry and the argon2-cffi backend load on first use, so CLI commands and
+    # processes that never hash a password skip them. Gunicorn preloads it in the master.
+    from passlib.hash import argon2
+
+    return argon2
 
 
 def utcnow() -> datetime:
@@ -33,16 +44,28 @@ class User(db.Model):
 
     is_active = db.Column(db.Boolean, nullable=False, default=True)
     created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
-    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow, onupdate=utcnow, index=True)
+    # Bumped by every ORM and Core UPDATE. updated_at has one-second precision on MySQL, so two
+    # writes in the same second would otherwise look identical to fragment keys and ETags.
+    row_version = db.Column(
+        db.Integer, nullable=False, default=1, server_default="1", onupdate=db.literal_column("row_version + 1")
+    )
     last_login_at = db.Column(db.DateTime, nullable=True)
 
+    # Effective permission bits from the role and every group, valid while permissions_version
+    # matches the compiled permission table; see app.security.permissions.
+    permission_mask = db.Column(db.BigInteger, nullable=False, default=0)
+    permissions_version = db.Column(db.BigInteger, nullable=True)
+
     audit_logs = db.relationship("AuditLog", backref="user", lazy=True)
 
     def set_password(self, password: str) -> None:
-        self.password_hash = argon2.hash(password)
+        with track_kdf(), span("kdf.hash"), KDF_HASH_SECONDS.time():
+            self.password_hash = password_hasher().hash(password)
 
     def verify_password(self, password: str) -> bool:
-        return argon2.verify(password, self.password_hash)
+        with track_kdf(), span("kdf.verify"), KDF_VERIFY_SECONDS.time():
+            return password_hasher().verify(password, self.password_hash)
 
     @property
     def is_locked(self) -> bool:
@@ -78,9 +101,119 @@ class AuditLog(db.Model):
     __tablename__ = "audit_logs"
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=True, index=True)
     action = db.Column(db.String(120), nullable=False)
     status = db.Column(db.String(20), nullable=False)
     ip_address = db.Column(db.String(45), nullable=True)
     user_agent = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+    # Chain position and hash, assigned in app.security.audit_chain when the row is flushed.
+    # user_ref keeps the original user_id inside the hash, since user_id is nulled on delete.
+    seq = db.Column(db.BigInteger, nullable=True, unique=True)
+    user_ref = db.Column(db.Integer, nullable=True)
+    row_hash = db.Column(db.String(64), nullable=True)
+
+
+class AuditChainHead(db.Model):
+    __tablename__ = "audit_chain_head"
+
+    id = db.Column(db.Integer, primary_key=True)
+    last_seq = db.Column(db.BigInteger, nullable=False, default=0)
+    last_hash = db.Column(db.String(64), nullable=False)
+    checkpoint_seq = db.Column(db.BigInteger, nullable=False, default=0)
+    checkpoint_hash = db.Column(db.String(64), nullable=False)
+    # Merkle subtree roots of the rows since the last checkpoint, as JSON.
+    frontier = db.Column(db.Text, nullable=False, default="[]")
+
+
+class AuditCheckpoint(db.Model):
+    __tablename__ = "audit_checkpoints"
+
+    id = db.Column(db.Integer, primary_key=True)
+    first_seq = db.Column(db.BigInteger, nullable=False)
+    last_seq = db.Column(db.BigInteger, nullable=False, unique=True)
+    merkle_root = db.Column(db.String(64), nullable=False)
+    chain_hash = db.Column(db.String(64), nullable=False)
+    checkpoint_hash = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+
+class CacheVersion(db.Model):
+    __tablename__ = "cache_versions"
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+def _closure_table(name: str, node_table: str) -> db.Table:
+    # One row per (ancestor, descendant) pair including depth-0 self rows, so "everything
+    # above/below X" is a single indexed lookup whatever the depth.
+    return db.Table(
+        name,
+        db.Column("ancestor_id", db.Integer, db.ForeignKey(f"{node_table}.id", ondelete="CASCADE"), primary_key=True),
+        db.Column(
+            "descendant_id",
+            db.Integer,
+            db.ForeignKey(f"{node_table}.id", ondelete="CASCADE"),
+            primary_key=True,
+            index=True,
+        ),
+        db.Column("depth", db.Integer, nullable=False),
+    )
+
+
+role_closure = _closure_table("role_closure", "roles")
+group_closure = _closure_table("group_closure", "groups")
+
+role_permissions = db.Table(
+    "role_permissions",
+    db.Column("role_id", db.Integer, db.ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("permission_id", db.Integer, db.ForeignKey("permissions.id", ondelete="CASCADE"), primary_key=True),
+)
+
+
+class Permission(db.Model):
+    __tablename__ = "permissions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False, unique=True)
+    description = db.Column(db.String(255), nullable=True)
+    bit = db.Column(db.Integer, nullable=False, unique=True)
+
+
+class Role(db.Model):
+    __tablename__ = "roles"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False, unique=True)
+    description = db.Column(db.String(255), nullable=True)
+    # The senior role that includes this one: a role holds every permission of the roles below it.
+    parent_id = db.Column(db.Integer, db.ForeignKey("roles.id"), nullable=True)
+
+    permissions = db.relationship("Permission", secondary=role_permissions, lazy="selectin")
+
+
+group_roles = db.Table(
+    "group_roles",
+    db.Column("group_id", db.Integer, db.ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("role_id", db.Integer, db.ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True),
+)
+
+group_members = db.Table(
+    "group_members",
+    db.Column("group_id", db.Integer, db.ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("user_id", db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True),
+)
+
+
+class Group(db.Model):
+    __tablename__ = "groups"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False, unique=True)
+    description = db.Column(db.String(255), nullable=True)
+    # Members of a group are members of every group above it.
+    parent_id = db.Column(db.Integer, db.ForeignKey("groups.id"), nullable=True)
+
+    roles = db.relationship("Role", secondary=group_roles, lazy="selectin")
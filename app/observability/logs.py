@@ -0,0 +1,227 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import Flask, g, has_request_context, request
+from flask.logging import default_handler
+
+from app.observability.metrics import AUDIT_QUEUE_DEPTH, LOG_RECORDS_DROPPED, LOG_RECORDS_SUPPRESSED
+
+LOG_HANDLER_KEY = "log_handler"
+APP_LOGGER = "app"
+REQUEST_ID_HEADER = "X-Request-ID"
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_active_handler: "NonBlockingQueueHandler | None" = None
+# LogRecord attributes that are not user-supplied extras.
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RESERVED})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+JsonFormatter.converter = time.gmtime
+
+
+class RequestContextFilter(logging.Filter):
+    # Attached to the queue handler, so it runs in the request thread while g is reachable.
+    def filter(self, record: logging.LogRecord) -> bool:
+        if has_request_context():
+            if not hasattr(record, "request_id"):
+                record.request_id = g.get("request_id")
+            if not hasattr(record, "user_id"):
+                user = g.get("current_user")
+                record.user_id = user.id if user else None
+            trace = g.get("trace")
+            if trace is not None:
+                record.trace_id = trace.trace_id
+        return True
+
+
+class EventRateLimiter(logging.Filter):
+    # Per event name: the first `burst` records of each window pass, after that one in
+    # `sample_every`. The next record that passes carries how many were held back.
+    def __init__(self, rules: dict[str, tuple[int, float, int]]):
+        super().__init__()
+        self.rules = rules
+        self._state: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        rule = self.rules.get(event)
+        if rule is None:
+            return True
+        burst, window, sample_every = rule
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(event)
+            if state is None or now - state[0] >= window:
+                # window start, records seen, records suppressed
+                state = self._state[event] = [now, 0, state[2] if state else 0]
+            state[1] += 1
+            if state[1] > burst and (state[1] - burst) % sample_every:
+                state[2] += 1
+                LOG_RECORDS_SUPPRESSED.inc(event)
+                return False
+            if state[1] > burst:
+                record.sampled = sample_every
+            if state[2]:
+                record.suppressed, state[2] = state[2], 0
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    # Request threads only enqueue; a QueueListener thread formats and writes. The listener
+    # is started lazily per process, so Gunicorn workers forked from a preloaded master get
+    # their own thread and queue.
+    def __init__(self, handlers: list[logging.Handler], maxsize: int):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.handlers = handlers
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._pid: int | None = None
+        self._listener: QueueListener | None = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=self.maxsize)
+            self._listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve what cannot cross threads (args, tracebacks); JSON encoding happens in
+        # the listener.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc(record.levelname)
+            return
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            overflow = logging.LogRecord(APP_LOGGER, logging.WARNING, __file__, 0, "log queue overflow", None, None)
+            overflow.event = "log_queue_overflow"
+            overflow.dropped = dropped
+            try:
+                self.queue.put_nowait(overflow)
+            except queue.Full:
+                self.dropped += dropped
+
+    def depth(self) -> int:
+        return self.queue.qsize() if self._pid == os.getpid() else 0
+
+    def flush(self) -> None:
+        if self._pid == os.getpid():
+            self.queue.join()
+
+    def stop(self) -> None:
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._pid = None
+
+
+def _build_handlers(app: Flask) -> list[logging.Handler]:
+    path = app.config.get("LOG_FILE", "")
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler: logging.Handler = logging.FileHandler(path, encoding="utf-8")
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    if app.config.get("LOG_JSON", True):
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+        handler.addFilter(_default_request_id)
+    return [handler]
+
+
+def _default_request_id(record: logging.LogRecord) -> bool:
+    if not hasattr(record, "request_id"):
+        record.request_id = "-"
+    return True
+
+
+def get_log_handler(app: Flask) -> NonBlockingQueueHandler | None:
+    return app.extensions.get(LOG_HANDLER_KEY)
+
+
+def _request_id(trust_header: bool) -> str:
+    supplied = request.headers.get(REQUEST_ID_HEADER, "") if trust_header else ""
+    return supplied if REQUEST_ID_RE.match(supplied) else uuid.uuid4().hex
+
+
+def init_logging(app: Flask) -> None:
+    if not app.config.get("LOG_ENABLED", True):
+        return
+
+    global _active_handler
+    logger = logging.getLogger(APP_LOGGER)
+    # One handler per process: a second create_app (tests, CLI) replaces the first.
+    if _active_handler is not None:
+        _active_handler.stop()
+        logger.removeHandler(_active_handler)
+    logger.removeHandler(default_handler)
+
+    handler = NonBlockingQueueHandler(_build_handlers(app), app.config.get("LOG_QUEUE_SIZE", 10_000))
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(EventRateLimiter(app.config.get("LOG_RATE_LIMITS", {})))
+    logger.addHandler(handler)
+    logger.setLevel(app.config.get("LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+    app.extensions[LOG_HANDLER_KEY] = handler
+    AUDIT_QUEUE_DEPTH.set_function(handler.depth, "log")
+    _active_handler = handler
+
+    trust_request_id = app.config.get("LOG_TRUST_REQUEST_ID", False)
+
+    @app.before_request
+    def _assign_request_id():
+        g.request_id = _request_id(trust_request_id)
+
+    @app.after_request
+    def _echo_request_id(response):
+        request_id = g.get("request_id")
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+
+@atexit.register
+def _drain_on_exit() -> None:
+    if _active_handler is not None:
+        _active_handler.stop()
@@ -0,0 +1,437 @@
+import hmac
+import math
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections.abc import Callable
+from contextlib import contextmanager
+
+from flask import Flask, Response, abort, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+KDF_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 2.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+PROXY_HEADERS = ("X-Forwarded-For", "Forwarded", "X-Real-IP")
+
+REGISTRY: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Each thread writes only to its own shard, so the hot path never takes a lock. Shards of
+        # finished threads are folded into `_retired`, so thread-per-request servers stay bounded.
+        self._local = threading.local()
+        self._shards: list[tuple[weakref.ref, dict]] = []
+        self._retired: dict = {}
+        self._prune_at = 64
+        self._shards_lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = {}
+            self._local.values = shard
+            with self._shards_lock:
+                if len(self._shards) >= self._prune_at:
+                    self._prune()
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+        return shard
+
+    def _prune(self) -> None:
+        # Caller holds `_shards_lock`. A finished thread never writes again, so its shard is safe
+        # to merge without the owner's cooperation.
+        live = []
+        for owner, shard in self._shards:
+            thread = owner()
+            if thread is not None and thread.is_alive():
+                live.append((owner, shard))
+                continue
+            for labels, value in shard.copy().items():
+                if isinstance(value, list):
+                    total = self._retired.setdefault(labels, [0] * len(value))
+                    for index, item in enumerate(value):
+                        total[index] += item
+                else:
+                    self._retired[labels] = self._retired.get(labels, 0) + value
+        self._shards = live
+        self._prune_at = max(64, 2 * len(live))
+
+    def _snapshots(self) -> list[dict]:
+        with self._shards_lock:
+            self._prune()
+            shards = [shard for _, shard in self._shards]
+            retired = {
+                labels: list(value) if isinstance(value, list) else value for labels, value in self._retired.items()
+            }
+        return [retired, *(shard.copy() for shard in shards)]
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return sum(snapshot.get(labelvalues, 0) for snapshot in self._snapshots())
+
+    def render(self) -> list[str]:
+        totals: dict[tuple, float] = {}
+        for snapshot in self._snapshots():
+            for labels, value in snapshot.items():
+                totals[labels] = totals.get(labels, 0) + value
+
+        lines = super().render()
+        for labels, value in sorted(totals.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues) -> None:
+        shard = self._shard()
+        state = shard.get(labelvalues)
+        if state is None:
+            # Per-bucket counts, then sum and count.
+            state = [0] * (len(self.buckets) + 2)
+            shard[labelvalues] = state
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state[index] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def count(self, *labelvalues) -> int:
+        return sum(snapshot[labelvalues][-1] for snapshot in self._snapshots() if labelvalues in snapshot)
+
+    def render(self) -> list[str]:
+        merged: dict[tuple, list] = {}
+        for snapshot in self._snapshots():
+            for labels, state in snapshot.items():
+                target = merged.setdefault(labels, [0] * len(state))
+                for index, value in enumerate(list(state)):
+                    target[index] += value
+
+        lines = super().render()
+        for labels, state in sorted(merged.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, state):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, inf)} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks: dict[tuple, Callable[[], float]] = {}
+
+    def set_function(self, callback: Callable[[], float], *labelvalues) -> None:
+        self._callbacks[labelvalues] = callback
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, callback in sorted(self._callbacks.items()):
+            try:
+                value = float(callback())
+            except Exception:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by endpoint.",
+    ("endpoint", "method", "status"),
+)
+KDF_VERIFY_SECONDS = Histogram(
+    "argon2_verify_duration_seconds",
+    "Time spent in Argon2 password verification.",
+    buckets=KDF_BUCKETS,
+)
+KDF_HASH_SECONDS = Histogram(
+    "argon2_hash_duration_seconds",
+    "Time spent in Argon2 password hashing.",
+    buckets=KDF_BUCKETS,
+)
+LOCKOUT_EVENTS = Counter(
+    "auth_lockout_events_total",
+    "Failed login attempts recorded by the lockout module.",
+    ("outcome",),
+)
+CAPTCHA_VERIFY_SECONDS = Histogram(
+    "captcha_verify_duration_seconds",
+    "CAPTCHA verification latency.",
+    ("provider",),
+)
+CAPTCHA_RESULTS = Counter(
+    "captcha_verify_total",
+    "CAPTCHA verification results.",
+    ("provider", "result"),
+)
+CAPTCHA_RISK_DECISIONS = Counter(
+    "captcha_risk_decisions_total",
+    "Submitted logins/registrations that were challenged or let through by risk scoring.",
+    ("scope", "decision"),
+)
+BREACHED_PASSWORD_CHECKS = Counter(
+    "breached_password_checks_total",
+    "New passwords checked against the breached password corpus.",
+    ("result",),
+)
+AVAILABILITY_CHECKS = Counter(
+    "availability_checks_total",
+    "Username/email availability checks by how they were answered.",
+    ("field", "answer"),
+)
+AVAILABILITY_FILTER_ENTRIES = Gauge(
+    "availability_filter_entries",
+    "Usernames and emails in this worker's availability Bloom filter.",
+)
+AVAILABILITY_FILTER_REBUILDS = Counter(
+    "availability_filter_rebuilds_total",
+    "Full rebuilds of the availability Bloom filter.",
+)
+AUDIT_EVENTS = Counter(
+    "audit_events_total",
+    "Audit events recorded.",
+    ("status",),
+)
+AUDIT_QUEUE_DEPTH = Gauge(
+    "audit_queue_depth",
+    "Audit/log records waiting to be written.",
+    ("queue",),
+)
+KDF_IN_FLIGHT = Gauge(
+    "argon2_in_flight",
+    "Argon2 hash/verify calls running in this worker.",
+)
+LOAD_SHED_DECISIONS = Counter(
+    "load_shed_decisions_total",
+    "Admission decisions by endpoint class: admitted, or shed for overload, kdf or limit.",
+    ("class", "decision"),
+)
+LOAD_SHED_QUEUE_DELAY = Histogram(
+    "load_shed_queue_delay_seconds",
+    "Time admitted requests waited for an endpoint-class slot.",
+    ("class",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+LOAD_SHED_IN_FLIGHT = Gauge(
+    "load_shed_in_flight",
+    "Requests in flight in this worker by endpoint class.",
+    ("class",),
+)
+LOAD_SHED_LEVEL = Gauge(
+    "load_shed_level",
+    "Number of endpoint classes currently shed for overload.",
+)
+TRACE_SPANS_EXPORTED = Counter(
+    "trace_spans_exported_total",
+    "Spans written by the trace exporter.",
+)
+TRACE_SPANS_DROPPED = Counter(
+    "trace_spans_dropped_total",
+    "Spans dropped because the export queue was full.",
+)
+TRACE_EXPORT_ERRORS = Counter(
+    "trace_export_errors_total",
+    "Span batches the exporter failed to write.",
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue was full.",
+    ("level",),
+)
+LOG_RECORDS_SUPPRESSED = Counter(
+    "log_records_suppressed_total",
+    "Log records held back by per-event rate limiting and sampling.",
+    ("event",),
+)
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "SQL statements executed.",
+)
+DB_QUERY_SECONDS = Counter(
+    "db_query_seconds_total",
+    "Time spent executing SQL statements.",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total",
+    "Connection checkouts that hit the pool timeout.",
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Database connection pool state.",
+    ("state",),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed per request.",
+    ("endpoint",),
+    buckets=COUNT_BUCKETS,
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "SQL execution time per request.",
+    ("endpoint",),
+)
+
+
+def render_metrics() -> str:
+    lines: list[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started_at")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    DB_QUERIES.inc()
+    DB_QUERY_SECONDS.inc(amount=elapsed)
+
+    try:
+        stats = g.get("sql_stats")
+    except RuntimeError:
+        return
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+_sql_listeners_installed = False
+
+
+def _install_sql_listeners() -> None:
+    global _sql_listeners_installed
+    if _sql_listeners_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _sql_listeners_installed = True
+
+
+def _metrics_access_allowed(app: Flask) -> bool:
+    token = app.config.get("METRICS_TOKEN", "")
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        return hmac.compare_digest(supplied, token)
+
+    allowed = {ip.strip() for ip in app.config.get("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()}
+    # A proxied request is never "internal", whatever address the proxy connects from.
+    if not allowed or any(header in request.headers for header in PROXY_HEADERS):
+        return False
+    return request.remote_addr in allowed
+
+
+def init_metrics(app: Flask) -> None:
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    _install_sql_listeners()
+
+    @app.before_request
+    def _start_request_metrics():
+        g.request_started_at = time.perf_counter()
+        g.sql_stats = [0, 0.0]
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.get("request_started_at")
+        if started is None:
+            return response
+
+        endpoint = request.endpoint or "unmatched"
+        if endpoint == "metrics":
+            return response
+
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            endpoint,
+            request.method,
+            str(response.status_code),
+        )
+        query_count, query_time = g.get("sql_stats", (0, 0.0))
+        DB_QUERIES_PER_REQUEST.observe(query_count, endpoint)
+        DB_TIME_PER_REQUEST.observe(query_time, endpoint)
+        return response
+
+    def metrics():
+        if not _metrics_access_allowed(app):
+            abort(404)
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule(app.config.get("METRICS_PATH", "/metrics"), "metrics", metrics, methods=["GET"])
@@ -0,0 +1,175 @@
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from flask import Flask, current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+APP_DIR = str(Path(__file__).resolve().parents[1])
+PROFILER_DIR = str(Path(__file__).resolve().parent)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_POSTCOMPILE = re.compile(r"\(?__\[POSTCOMPILE_\w+\]\)?")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def statement_shape(statement: str) -> str:
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _POSTCOMPILE.sub("(?)", shape)
+    shape = _IN_LIST.sub("IN (?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _call_site() -> str:
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and not filename.startswith(PROFILER_DIR):
+            return f"{Path(filename).relative_to(APP_DIR).as_posix()}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+@dataclass
+class QueryRecord:
+    statement: str
+    shape: str
+    duration: float
+    call_site: str
+
+
+@dataclass(eq=False)
+class QueryProfile:
+    endpoint: str | None = None
+    queries: list[QueryRecord] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_time(self) -> float:
+        return sum(query.duration for query in self.queries)
+
+    def repeated_shapes(self, threshold: int = 3) -> dict[str, int]:
+        counts = Counter(query.shape for query in self.queries)
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+    def report(self, threshold: int = 3) -> str:
+        lines = [f"{self.endpoint or '<no endpoint>'}: {self.count} queries in {self.total_time * 1000:.1f} ms"]
+        for shape, count in self.repeated_shapes(threshold).items():
+            sites = sorted({query.call_site for query in self.queries if query.shape == shape})
+            lines.append(f"  possible N+1 ({count}x): {shape}")
+            lines.extend(f"    at {site}" for site in sites)
+        return "\n".join(lines)
+
+    def assert_within(self, max_queries: int, n_plus_one_threshold: int | None = 3) -> None:
+        if self.count > max_queries:
+            raise QueryBudgetExceeded(
+                f"Query budget exceeded ({self.count} > {max_queries}).\n{self.report(n_plus_one_threshold or 3)}"
+            )
+        if n_plus_one_threshold and self.repeated_shapes(n_plus_one_threshold):
+            raise QueryBudgetExceeded(f"Repeated statement shapes detected.\n{self.report(n_plus_one_threshold)}")
+
+
+_local = threading.local()
+
+
+def _active_profiles() -> list[QueryProfile]:
+    profiles = getattr(_local, "profiles", None)
+    if profiles is None:
+        profiles = []
+        _local.profiles = profiles
+    return profiles
+
+
+@contextmanager
+def profile_queries(endpoint: str | None = None):
+    profile = QueryProfile(endpoint=endpoint)
+    profiles = _active_profiles()
+    profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        profiles.remove(profile)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_profiles():
+        conn.info.setdefault("profiler_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profiles = _active_profiles()
+    started = conn.info.get("profiler_started_at")
+    if not profiles or not started:
+        return
+
+    record = QueryRecord(
+        statement=statement,
+        shape=statement_shape(statement),
+        duration=time.perf_counter() - started.pop(),
+        call_site=_call_site(),
+    )
+    for profile in profiles:
+        profile.queries.append(record)
+
+
+_listeners_installed = False
+
+
+def _install_listeners() -> None:
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _listeners_installed = True
+
+
+def init_query_profiler(app: Flask) -> None:
+    if not app.config.get("SQL_PROFILER_ENABLED", False):
+        return
+
+    _install_listeners()
+
+    @app.before_request
+    def _start_query_profile():
+        g.query_profile = QueryProfile(endpoint=request.endpoint)
+        _active_profiles().append(g.query_profile)
+
+    @app.teardown_request
+    def _stop_query_profile(_error=None):
+        profile = g.get("query_profile")
+        if profile is not None and profile in _active_profiles():
+            _active_profiles().remove(profile)
+
+    @app.after_request
+    def _check_query_profile(response):
+        profile = g.get("query_profile")
+        if profile is None:
+            return response
+
+        threshold = current_app.config.get("SQL_PROFILER_N_PLUS_ONE_THRESHOLD", 3)
+        budget = current_app.config.get("SQL_QUERY_BUDGETS", {}).get(profile.endpoint)
+        response.headers["X-Query-Count"] = str(profile.count)
+
+        over_budget = budget is not None and profile.count > budget
+        if over_budget or profile.repeated_shapes(threshold):
+            current_app.logger.warning("SQL profile\n%s", profile.report(threshold))
+        if over_budget and current_app.config.get("SQL_PROFILER_STRICT", False):
+            raise QueryBudgetExceeded(f"Query budget exceeded ({profile.count} > {budget}).\n{profile.report(threshold)}")
+        return response
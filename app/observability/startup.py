@@ -0,0 +1,120 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+_PROBE = """
+import json, resource, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "phases_ms": app.extensions["startup_timings"],
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+
+class StartupTimer:
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 3)
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+    children: list["ImportRecord"] = field(default_factory=list)
+
+
+@dataclass
+class StartupProfile:
+    import_ms: float
+    create_app_ms: float
+    phases_ms: dict[str, float]
+    max_rss_kb: int
+    imports: list[ImportRecord]
+
+    def by_package(self) -> list[tuple[str, float]]:
+        totals: dict[str, int] = {}
+        for record in _walk(self.imports):
+            package = record.module.split(".", 1)[0]
+            totals[package] = totals.get(package, 0) + record.self_us
+        return sorted(((name, us / 1000) for name, us in totals.items()), key=lambda item: -item[1])
+
+
+def _walk(records: list[ImportRecord]):
+    for record in records:
+        yield record
+        yield from _walk(record.children)
+
+
+def parse_importtime(output: str) -> list[ImportRecord]:
+    # -X importtime prints children before their parent, each indented two spaces deeper.
+    pending: dict[int, list[ImportRecord]] = {}
+    roots: list[ImportRecord] = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        module = parts[2].rstrip()[1:]
+        depth = (len(module) - len(module.lstrip(" "))) // 2
+        record = ImportRecord(module.strip(), int(parts[0]), int(parts[1]), depth)
+        record.children = pending.pop(depth + 1, [])
+        if depth == 0:
+            roots.append(record)
+        else:
+            pending.setdefault(depth, []).append(record)
+    return roots
+
+
+def profile_startup(env: dict | None = None) -> StartupProfile:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=PROJECT_ROOT,
+        env={**os.environ, **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    return StartupProfile(
+        import_ms=summary["import_ms"],
+        create_app_ms=summary["create_app_ms"],
+        phases_ms=summary["phases_ms"],
+        max_rss_kb=summary["max_rss_kb"],
+        imports=parse_importtime(result.stderr),
+    )
+
+
+def format_import_tree(records: list[ImportRecord], min_ms: float = 5.0, max_depth: int = 6) -> list[str]:
+    lines = []
+    for record in sorted(records, key=lambda item: -item.cumulative_us):
+        if record.cumulative_us / 1000 < min_ms or record.depth > max_depth:
+            continue
+        indent = "  " * record.depth
+        lines.append(f"{record.cumulative_us / 1000:9.1f} ms {record.self_us / 1000:8.1f} ms  {indent}{record.module}")
+        lines.extend(format_import_tree(record.children, min_ms, max_depth))
+    return lines
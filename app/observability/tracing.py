@@ -0,0 +1,384 @@
+import atexit
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.observability.metrics import TRACE_EXPORT_ERRORS, TRACE_SPANS_DROPPED, TRACE_SPANS_EXPORTED
+
+TRACER_KEY = "tracer"
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+MAX_STATEMENT_CHARS = 200
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: str | None
+    started: float
+    started_ns: int
+    attributes: dict = field(default_factory=dict)
+    ended: float | None = None
+
+
+@dataclass
+class RequestTrace:
+    trace_id: str
+    # sampled: spans are exported. timed: durations feed the Server-Timing header.
+    sampled: bool
+    timed: bool
+    spans: list[Span] = field(default_factory=list)
+    stack: list[Span] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+    finished: bool = False
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def current_trace() -> RequestTrace | None:
+    if not has_request_context():
+        return None
+    return g.get("trace")
+
+
+def start_span(name: str, **attributes) -> Span | None:
+    trace = current_trace()
+    if trace is None or trace.finished:
+        return None
+    parent = trace.stack[-1].span_id if trace.stack else None
+    span = Span(name, _new_id(64), parent, time.perf_counter(), time.time_ns(), attributes)
+    trace.stack.append(span)
+    if trace.sampled:
+        trace.spans.append(span)
+    return span
+
+
+def end_span(span: Span | None, **attributes) -> None:
+    trace = current_trace()
+    if span is None or trace is None or span.ended is not None:
+        return
+    span.ended = time.perf_counter()
+    span.attributes.update(attributes)
+    # Spans opened by session events can be left open when a flush or commit raises.
+    while trace.stack:
+        top = trace.stack.pop()
+        if top is span:
+            break
+        top.ended = span.ended
+        top.attributes["error"] = True
+    if trace.timed and span.parent_id is not None:
+        trace.timings[span.name] = trace.timings.get(span.name, 0.0) + (span.ended - span.started)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    current = start_span(name, **attributes)
+    try:
+        yield current
+    except BaseException:
+        end_span(current, error=True)
+        raise
+    end_span(current)
+
+
+def _record_statement(started: float, started_ns: int, statement: str) -> None:
+    # Per-statement spans are exported but kept out of Server-Timing, which reports the
+    # request's SQL total as "db".
+    trace = current_trace()
+    if trace is None or not trace.sampled or trace.finished:
+        return
+    parent = trace.stack[-1].span_id if trace.stack else None
+    trace.spans.append(
+        Span(
+            "db.query",
+            _new_id(64),
+            parent,
+            started,
+            started_ns,
+            {"db.statement": " ".join(statement.split())[:MAX_STATEMENT_CHARS]},
+            time.perf_counter(),
+        )
+    )
+
+
+def _span_record(trace: RequestTrace, item: Span) -> dict:
+    return {
+        "traceId": trace.trace_id,
+        "spanId": item.span_id,
+        "parentSpanId": item.parent_id,
+        "name": item.name,
+        "startTimeUnixNano": item.started_ns,
+        "endTimeUnixNano": item.started_ns + int(((item.ended or item.started) - item.started) * 1e9),
+        "attributes": item.attributes,
+    }
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(records: list[dict], service_name: str) -> dict:
+    spans = []
+    for record in records:
+        otlp_span = {
+            "traceId": record["traceId"],
+            "spanId": record["spanId"],
+            "name": record["name"],
+            "kind": 2 if record["parentSpanId"] is None else 1,
+            "startTimeUnixNano": str(record["startTimeUnixNano"]),
+            "endTimeUnixNano": str(record["endTimeUnixNano"]),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in record["attributes"].items()],
+        }
+        if record["parentSpanId"]:
+            otlp_span["parentSpanId"] = record["parentSpanId"]
+        if record["attributes"].get("error"):
+            otlp_span["status"] = {"code": 2}
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+                "scopeSpans": [{"scope": {"name": "app.observability.tracing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def file_exporter(path: Path) -> Callable[[list[dict]], None]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(records: list[dict]) -> None:
+        with path.open("a", encoding="utf-8") as handle:
+            handle.writelines(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+
+    return export
+
+
+def otlp_exporter(endpoint: str, service_name: str, timeout: float) -> Callable[[list[dict]], None]:
+    def export(records: list[dict]) -> None:
+        # Imported on first export, like the Turnstile client.
+        import requests
+
+        response = requests.post(endpoint, json=otlp_payload(records, service_name), timeout=timeout)
+        response.raise_for_status()
+
+    return export
+
+
+class BatchExporter:
+    # Request threads only enqueue. A daemon thread, started lazily in each worker process
+    # so it survives Gunicorn's fork, writes batches.
+    def __init__(self, export: Callable[[list[dict]], None], queue_size: int, batch_size: int, interval: float):
+        self.export = export
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._pid: int | None = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit(self, records: list[dict]) -> None:
+        self._ensure_started()
+        for index, record in enumerate(records):
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                TRACE_SPANS_DROPPED.inc(amount=len(records) - index)
+                return
+
+    def _run(self) -> None:
+        work = self._queue
+        while True:
+            batch = [work.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(work.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.export(batch)
+                TRACE_SPANS_EXPORTED.inc(amount=len(batch))
+            except Exception:
+                TRACE_EXPORT_ERRORS.inc()
+            finally:
+                for _ in batch:
+                    work.task_done()
+
+    def flush(self) -> None:
+        if self._pid == os.getpid():
+            self._queue.join()
+
+
+@dataclass
+class Tracer:
+    sample_rate: float
+    server_timing: bool
+    trust_traceparent: bool
+    exporter: BatchExporter | None
+
+    def begin(self) -> RequestTrace | None:
+        trace_id, sampled = None, random.random() < self.sample_rate
+        if self.trust_traceparent:
+            match = TRACEPARENT_RE.match(request.headers.get("traceparent", ""))
+            if match:
+                trace_id, sampled = match.group(1), bool(int(match.group(3), 16) & 1)
+        sampled = sampled and self.exporter is not None
+        if not sampled and not self.server_timing:
+            return None
+        return RequestTrace(trace_id or _new_id(128), sampled, self.server_timing)
+
+    def finish(self, trace: RequestTrace) -> None:
+        trace.finished = True
+        if trace.sampled and trace.spans:
+            self.exporter.submit([_span_record(trace, item) for item in trace.spans])
+
+
+def server_timing_header(trace: RequestTrace, total: float) -> str:
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in trace.timings.items()]
+    stats = g.get("sql_stats")
+    if stats:
+        entries.append(f'db;dur={stats[1] * 1000:.2f};desc="{stats[0]} queries"')
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+_listeners_installed = False
+
+
+def _install_listeners() -> None:
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    from app.db_routing import RoutingSession
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("trace_query_started", []).append((time.perf_counter(), time.time_ns()))
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("trace_query_started")
+        if started:
+            _record_statement(*started.pop(), statement)
+
+    def before_commit(session):
+        session.info["trace_commit_span"] = start_span("db.commit")
+
+    def after_commit(session):
+        end_span(session.info.pop("trace_commit_span", None))
+
+    def after_rollback(session):
+        end_span(session.info.pop("trace_commit_span", None), error=True)
+
+    def before_flush(session, _flush_context, _instances):
+        session.info["trace_flush_span"] = start_span("db.flush", objects=len(session.new) + len(session.dirty))
+
+    def after_flush(session, _flush_context):
+        end_span(session.info.pop("trace_flush_span", None))
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(RoutingSession, "before_commit", before_commit)
+    event.listen(RoutingSession, "after_commit", after_commit)
+    event.listen(RoutingSession, "after_soft_rollback", lambda session, _previous: after_rollback(session))
+    # Registered ahead of the audit chain's listener so sealing shows up inside the flush.
+    event.listen(RoutingSession, "before_flush", before_flush, insert=True)
+    event.listen(RoutingSession, "after_flush_postexec", after_flush)
+    _listeners_installed = True
+
+
+def _build_exporter(app: Flask) -> BatchExporter | None:
+    config = app.config
+    kind = config.get("TRACING_EXPORTER", "file").strip().lower()
+    if kind == "file":
+        path = Path(config.get("TRACING_FILE_PATH") or Path(app.instance_path) / "traces.jsonl")
+        export = file_exporter(path)
+    elif kind == "otlp":
+        export = otlp_exporter(
+            config["TRACING_OTLP_ENDPOINT"], config["TRACING_SERVICE_NAME"], config["TRACING_EXPORT_TIMEOUT"]
+        )
+    else:
+        return None
+    exporter = BatchExporter(
+        export,
+        queue_size=config["TRACING_EXPORT_QUEUE_SIZE"],
+        batch_size=config["TRACING_EXPORT_BATCH_SIZE"],
+        interval=config["TRACING_EXPORT_INTERVAL_MS"] / 1000,
+    )
+    atexit.register(exporter.flush)
+    return exporter
+
+
+def get_tracer(app: Flask) -> Tracer | None:
+    return app.extensions.get(TRACER_KEY)
+
+
+def init_tracing(app: Flask) -> None:
+    tracing = app.config.get("TRACING_ENABLED", False)
+    server_timing = app.config.get("SERVER_TIMING_ENABLED", False)
+    if not tracing and not server_timing:
+        return
+
+    tracer = Tracer(
+        sample_rate=app.config.get("TRACING_SAMPLE_RATE", 0.01),
+        server_timing=server_timing,
+        trust_traceparent=app.config.get("TRACING_TRUST_TRACEPARENT", False),
+        exporter=_build_exporter(app) if tracing else None,
+    )
+    app.extensions[TRACER_KEY] = tracer
+    _install_listeners()
+
+    @app.before_request
+    def _start_trace():
+        trace = tracer.begin()
+        if trace is None:
+            return
+        g.trace = trace
+        g.trace_root = start_span(request.endpoint or "unmatched", method=request.method, route=str(request.url_rule))
+
+    @app.after_request
+    def _end_trace(response):
+        trace = g.get("trace")
+        if trace is None:
+            return response
+        root = g.trace_root
+        end_span(root, status=response.status_code)
+        if trace.timed:
+            response.headers["Server-Timing"] = server_timing_header(trace, root.ended - root.started)
+        return response
+
+    @app.teardown_request
+    def _export_trace(error):
+        trace = g.get("trace")
+        if trace is None:
+            return
+        end_span(g.trace_root, error=error is not None)
+        tracer.finish(trace)
@@ -1,12 +1,31 @@
-from flask import request
+import logging
+import re
+from collections import Counter
+from collections.abc import Iterable
+
+from flask import has_request_context, request
 
 from app.extensions import db
-from app.models import AuditLog, User
+from app.models import AuditLog, User, utcnow
+from app.observability.metrics import AUDIT_EVENTS
+from app.observability.tracing import span
+from app.security.audit_chain import DETACH_ACTION_PREFIX, seal_records
 
+security_log = logging.getLogger("app.security")
+TARGET_SUFFIX = re.compile(r"_\d+$")
 
-def record_audit_event(action: str, status: str, user: User | None = None) -> None:
-    ip_address = request.headers.get("X-Forwarded-For", request.remote_addr)
+
+def _request_origin() -> tuple[str | None, str | None]:
+    if not has_request_context():
+        return None, None
+    # remote_addr is the client address once ProxyFix trusts the proxy; the raw header is client-controlled.
+    ip_address = request.remote_addr
     user_agent = (request.user_agent.string or "")[:255]
+    return ip_address, user_agent
+
+
+def record_audit_event(action: str, status: str, user: User | None = None) -> None:
+    ip_address, user_agent = _request_origin()
 
     log = AuditLog(
         user_id=user.id if user else None,
@@ -16,3 +35,55 @@ def record_audit_event(action: str, status: str, user: User | None = None) -> No
         user_agent=user_agent,
     )
     db.session.add(log)
+    AUDIT_EVENTS.inc(status)
+    security_log.log(
+        logging.INFO if status == "success" else logging.WARNING,
+        action,
+        extra={"event": action, "status": status, "subject_id": log.user_id, "ip": ip_address},
+    )
+
+
+def record_audit_events(events: Iterable[tuple[str, str, int | None]]) -> int:
+    # One multi-row INSERT for bulk operations instead of an ORM object per event.
+    ip_address, user_agent = _request_origin()
+    created_at = utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "action": action,
+            "status": status,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "created_at": created_at,
+        }
+        for action, status, user_id in events
+    ]
+    if not rows:
+        return 0
+
+    # Seal pending ORM events first so chain order follows insert order.
+    db.session.flush()
+    seal_records(db.session.connection(), rows)
+    db.session.execute(db.insert(AuditLog), rows)
+    for status, count in Counter(row["status"] for row in rows).items():
+        AUDIT_EVENTS.inc(status, amount=count)
+    # One record per batch; per-target action names are folded into counts.
+    actions = Counter(TARGET_SUFFIX.sub("", row["action"]) for row in rows)
+    security_log.info("audit_batch", extra={"event": "audit_batch", "events": len(rows), "actions": dict(actions)})
+    return len(rows)
+
+
+def null_user_audit_rows(user_ids: list[int]) -> None:
+    # Nulling user_id keeps history when an account is deleted. user_id is not hashed, and the
+    # verifier accepts a detached row only if a compensating event names the user.
+    with span("audit.detach", users=len(user_ids)):
+        db.session.execute(db.update(AuditLog).where(AuditLog.user_id.in_(user_ids)).values(user_id=None))
+
+
+def detach_events(user_ids: list[int], actor_id: int | None = None) -> list[tuple[str, str, int | None]]:
+    return [(f"{DETACH_ACTION_PREFIX}{user_id}", "success", actor_id) for user_id in user_ids]
+
+
+def detach_user_audit_rows(user_ids: list[int], actor_id: int | None = None) -> None:
+    null_user_audit_rows(user_ids)
+    record_audit_events(detach_events(user_ids, actor_id))
@@ -0,0 +1,383 @@
+import hashlib
+import json
+import multiprocessing
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import create_engine, event, insert, select, update
+from sqlalchemy.pool import NullPool
+
+from app.db_routing import RoutingSession
+from app.extensions import db
+from app.models import AuditChainHead, AuditCheckpoint, AuditLog, utcnow
+from app.observability.tracing import span
+
+GENESIS_HASH = "0" * 64
+HEAD_ID = 1
+DEFAULT_CHECKPOINT_INTERVAL = 1024
+# Compensating event written when user deletion detaches a user's audit rows.
+DETACH_ACTION_PREFIX = "audit_detach_user_"
+VERIFY_FETCH_SIZE = 10_000
+MAX_REPORTED_ERRORS = 50
+
+_ROW_COLUMNS = (
+    AuditLog.seq,
+    AuditLog.user_id,
+    AuditLog.user_ref,
+    AuditLog.action,
+    AuditLog.status,
+    AuditLog.ip_address,
+    AuditLog.user_agent,
+    AuditLog.created_at,
+    AuditLog.row_hash,
+)
+
+
+def row_digest(prev_hash: str, seq: int, user_ref, action, status, ip_address, user_agent, created_at: datetime) -> str:
+    # JSON keeps None and "" apart; user_id is left out because deletes may null it.
+    payload = json.dumps(
+        [seq, user_ref, action, status, ip_address, user_agent, created_at.isoformat()],
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(bytes.fromhex(prev_hash) + payload.encode()).hexdigest()
+
+
+def checkpoint_digest(prev_hash: str, first_seq: int, last_seq: int, merkle_root: str, chain_hash: str) -> str:
+    payload = f"{first_seq}:{last_seq}:{merkle_root}:{chain_hash}".encode()
+    return hashlib.sha256(bytes.fromhex(prev_hash) + payload).hexdigest()
+
+
+class MerkleFrontier:
+    # Roots of the complete subtrees seen so far, one slot per level: adding a leaf is a binary
+    # carry, so a batch's root costs O(log n) memory however many rows it covers.
+    def __init__(self, nodes: list[bytes | None] | None = None):
+        self.nodes = nodes or []
+
+    def add(self, row_hash: str) -> None:
+        carry = hashlib.sha256(b"\x00" + bytes.fromhex(row_hash)).digest()
+        level = 0
+        while level < len(self.nodes) and self.nodes[level] is not None:
+            carry = hashlib.sha256(b"\x01" + self.nodes[level] + carry).digest()
+            self.nodes[level] = None
+            level += 1
+        if level == len(self.nodes):
+            self.nodes.append(carry)
+        else:
+            self.nodes[level] = carry
+
+    def root(self) -> str:
+        acc = None
+        for node in self.nodes:
+            if node is not None:
+                acc = node if acc is None else hashlib.sha256(b"\x01" + node + acc).digest()
+        return (acc or b"\x00" * 32).hex()
+
+    def dumps(self) -> str:
+        return json.dumps([node.hex() if node else None for node in self.nodes])
+
+    @classmethod
+    def loads(cls, value: str | None) -> "MerkleFrontier":
+        return cls([bytes.fromhex(node) if node else None for node in json.loads(value or "[]")])
+
+
+def _checkpoint_interval() -> int:
+    if has_app_context():
+        return max(1, current_app.config.get("AUDIT_CHECKPOINT_INTERVAL", DEFAULT_CHECKPOINT_INTERVAL))
+    return DEFAULT_CHECKPOINT_INTERVAL
+
+
+def seal_records(connection, records: list[dict]) -> None:
+    with span("audit.seal", rows=len(records)):
+        _seal_records(connection, records)
+
+
+def _seal_records(connection, records: list[dict]) -> None:
+    # The head row lock serializes audit writers until commit, which is what makes seq gapless
+    # and each row's predecessor unambiguous.
+    head_table = AuditChainHead.__table__
+    if connection.dialect.name == "sqlite":
+        # SQLite ignores FOR UPDATE. A no-op UPDATE takes the database write lock before the
+        # head is read, so two writers can never read the same head.
+        statement = (
+            update(head_table)
+            .where(head_table.c.id == HEAD_ID)
+            .values(last_seq=head_table.c.last_seq)
+            .returning(*head_table.c)
+        )
+    else:
+        statement = select(head_table).where(head_table.c.id == HEAD_ID).with_for_update()
+    head = connection.execute(statement).mappings().first()
+    created = head is None
+    if created:
+        head = {"last_seq": 0, "last_hash": GENESIS_HASH, "checkpoint_seq": 0, "checkpoint_hash": GENESIS_HASH, "frontier": "[]"}
+
+    interval = _checkpoint_interval()
+    seq, prev_hash = head["last_seq"], head["last_hash"]
+    checkpoint_seq, checkpoint_hash = head["checkpoint_seq"], head["checkpoint_hash"]
+    frontier = MerkleFrontier.loads(head["frontier"])
+    checkpoints = []
+
+    for record in records:
+        seq += 1
+        # DATETIME columns drop microseconds on MySQL; hash what the database will return.
+        record["created_at"] = (record.get("created_at") or utcnow()).replace(microsecond=0)
+        if record.get("user_ref") is None:
+            record["user_ref"] = record.get("user_id")
+        record["seq"] = seq
+        prev_hash = record["row_hash"] = row_digest(
+            prev_hash,
+            seq,
+            record["user_ref"],
+            record["action"],
+            record["status"],
+            record.get("ip_address"),
+            record.get("user_agent"),
+            record["created_at"],
+        )
+        frontier.add(prev_hash)
+
+        if seq - checkpoint_seq >= interval:
+            root = frontier.root()
+            checkpoint_hash = checkpoint_digest(checkpoint_hash, checkpoint_seq + 1, seq, root, prev_hash)
+            checkpoints.append(
+                {
+                    "first_seq": checkpoint_seq + 1,
+                    "last_seq": seq,
+                    "merkle_root": root,
+                    "chain_hash": prev_hash,
+                    "checkpoint_hash": checkpoint_hash,
+                    "created_at": utcnow(),
+                }
+            )
+            checkpoint_seq = seq
+            frontier = MerkleFrontier()
+
+    values = {
+        "last_seq": seq,
+        "last_hash": prev_hash,
+        "checkpoint_seq": checkpoint_seq,
+        "checkpoint_hash": checkpoint_hash,
+        "frontier": frontier.dumps(),
+    }
+    if created:
+        connection.execute(insert(head_table).values(id=HEAD_ID, **values))
+    else:
+        connection.execute(update(head_table).where(head_table.c.id == HEAD_ID).values(**values))
+    if checkpoints:
+        connection.execute(insert(AuditCheckpoint.__table__), checkpoints)
+
+
+_SEALED_FIELDS = ("user_id", "user_ref", "action", "status", "ip_address", "user_agent", "created_at")
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _seal_new_audit_logs(session, _flush_context, _instances):
+    logs = [obj for obj in session.new if isinstance(obj, AuditLog) and obj.row_hash is None]
+    if not logs:
+        return
+    records = [{name: getattr(log, name) for name in _SEALED_FIELDS} for log in logs]
+    seal_records(session.connection(), records)
+    for log, record in zip(logs, records):
+        log.seq = record["seq"]
+        log.user_ref = record["user_ref"]
+        log.created_at = record["created_at"]
+        log.row_hash = record["row_hash"]
+
+
+@dataclass
+class ChunkResult:
+    first_seq: int
+    last_seq: int
+    rows: int = 0
+    errors: list[str] = field(default_factory=list)
+    error_count: int = 0
+    roots: dict[int, str] = field(default_factory=dict)
+    tail_root: str | None = None
+    last_hash: str | None = None
+    detached: dict[int, int] = field(default_factory=dict)
+    compensated: dict[int, int] = field(default_factory=dict)
+
+    def fail(self, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+
+def verify_range(connection, first_seq: int, last_seq: int, checkpoint_ends: Iterable[int] = ()) -> ChunkResult:
+    result = ChunkResult(first_seq, last_seq)
+    ends = set(checkpoint_ends)
+    frontier = MerkleFrontier()
+    prev_hash = GENESIS_HASH if first_seq == 1 else None
+    expected = first_seq
+
+    statement = (
+        select(*_ROW_COLUMNS)
+        .where(AuditLog.seq >= first_seq - 1, AuditLog.seq <= last_seq)
+        .order_by(AuditLog.seq)
+    )
+    # yield_per streams through a server-side cursor instead of buffering the whole range.
+    for row in connection.execution_options(yield_per=VERIFY_FETCH_SIZE).execute(statement):
+        if row.seq == first_seq - 1:
+            prev_hash = row.row_hash
+            continue
+        if row.seq != expected:
+            result.fail(f"seq {expected}-{row.seq - 1}: rows missing")
+            prev_hash = None
+        if prev_hash is None:
+            result.fail(f"seq {row.seq}: predecessor missing, link not checked")
+        elif row_digest(
+            prev_hash, row.seq, row.user_ref, row.action, row.status, row.ip_address, row.user_agent, row.created_at
+        ) != row.row_hash:
+            result.fail(f"seq {row.seq}: hash mismatch (row edited, inserted or reordered)")
+
+        if row.user_id is not None and row.user_id != row.user_ref:
+            result.fail(f"seq {row.seq}: user_id {row.user_id} differs from recorded user {row.user_ref}")
+        elif row.user_id is None and row.user_ref is not None:
+            result.detached[row.user_ref] = max(result.detached.get(row.user_ref, 0), row.seq)
+        if row.action.startswith(DETACH_ACTION_PREFIX):
+            user_ref = row.action.removeprefix(DETACH_ACTION_PREFIX)
+            if user_ref.isdigit():
+                result.compensated[int(user_ref)] = max(result.compensated.get(int(user_ref), 0), row.seq)
+
+        # Chain from the stored hash so one edited row is reported once, not for every later row.
+        prev_hash = row.row_hash
+        frontier.add(row.row_hash)
+        if row.seq in ends:
+            result.roots[row.seq] = frontier.root()
+            frontier = MerkleFrontier()
+        result.rows += 1
+        expected = row.seq + 1
+
+    if expected <= last_seq:
+        result.fail(f"seq {expected}-{last_seq}: rows missing")
+    result.tail_root = frontier.root() if frontier.nodes else None
+    result.last_hash = prev_hash
+    return result
+
+
+_worker_engine = None
+
+
+def _init_worker(database_url: str) -> None:
+    global _worker_engine
+    _worker_engine = create_engine(database_url, poolclass=NullPool)
+
+
+def _verify_in_worker(first_seq: int, last_seq: int, checkpoint_ends: list[int]) -> ChunkResult:
+    with _worker_engine.connect() as connection:
+        return verify_range(connection, first_seq, last_seq, checkpoint_ends)
+
+
+@dataclass
+class VerifyReport:
+    rows: int = 0
+    chunks: int = 0
+    checkpoints: int = 0
+    legacy_rows: int = 0
+    seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+    error_count: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error_count == 0
+
+    def fail(self, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+
+def _plan_chunks(checkpoints: list, last_seq: int, chunk_size: int) -> list[tuple[int, int, list[int]]]:
+    # Chunks end on checkpoint boundaries so each worker can rebuild whole Merkle roots.
+    chunks = []
+    start, ends = 1, []
+    for checkpoint in checkpoints:
+        ends.append(checkpoint.last_seq)
+        if checkpoint.last_seq - start + 1 >= chunk_size:
+            chunks.append((start, checkpoint.last_seq, ends))
+            start, ends = checkpoint.last_seq + 1, []
+    if start <= last_seq:
+        chunks.append((start, last_seq, ends))
+    return chunks
+
+
+def verify_chain(workers: int = 1, chunk_size: int = 1_000_000, database_url: str | None = None) -> VerifyReport:
+    started = time.perf_counter()
+    report = VerifyReport()
+    head = db.session.get(AuditChainHead, HEAD_ID)
+    if head is None:
+        report.legacy_rows = db.session.scalar(select(db.func.count(AuditLog.id)))
+        report.seconds = time.perf_counter() - started
+        return report
+
+    report.legacy_rows = db.session.scalar(select(db.func.count(AuditLog.id)).where(AuditLog.seq.is_(None)))
+    checkpoints = db.session.execute(
+        select(
+            AuditCheckpoint.first_seq,
+            AuditCheckpoint.last_seq,
+            AuditCheckpoint.merkle_root,
+            AuditCheckpoint.chain_hash,
+            AuditCheckpoint.checkpoint_hash,
+        ).order_by(AuditCheckpoint.last_seq)
+    ).all()
+
+    checkpoint_hash, expected_first = GENESIS_HASH, 1
+    for checkpoint in checkpoints:
+        if checkpoint.first_seq != expected_first:
+            report.fail(f"checkpoint {checkpoint.last_seq}: starts at {checkpoint.first_seq}, expected {expected_first}")
+        checkpoint_hash = checkpoint_digest(
+            checkpoint_hash, checkpoint.first_seq, checkpoint.last_seq, checkpoint.merkle_root, checkpoint.chain_hash
+        )
+        if checkpoint_hash != checkpoint.checkpoint_hash:
+            report.fail(f"checkpoint {checkpoint.last_seq}: checkpoint chain broken")
+            checkpoint_hash = checkpoint.checkpoint_hash
+        expected_first = checkpoint.last_seq + 1
+    if checkpoint_hash != head.checkpoint_hash or expected_first != head.checkpoint_seq + 1:
+        report.fail("chain head does not match the last checkpoint")
+
+    chunks = _plan_chunks(checkpoints, head.last_seq, chunk_size)
+    if workers > 1 and database_url and len(chunks) > 1:
+        # spawn: forked children would inherit the parent's DB connections and threads.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(database_url,)) as pool:
+            results = list(pool.map(_verify_in_worker, *zip(*chunks)))
+    else:
+        connection = db.session.connection()
+        results = [verify_range(connection, first, last, ends) for first, last, ends in chunks]
+
+    by_end = {checkpoint.last_seq: checkpoint for checkpoint in checkpoints}
+    detached: dict[int, int] = {}
+    compensated: dict[int, int] = {}
+    for result in results:
+        report.rows += result.rows
+        report.error_count += result.error_count
+        report.errors.extend(result.errors[: MAX_REPORTED_ERRORS - len(report.errors)])
+        for end, root in result.roots.items():
+            report.checkpoints += 1
+            if root != by_end[end].merkle_root:
+                report.fail(f"checkpoint {end}: Merkle root mismatch")
+        for user_ref, seq in result.detached.items():
+            detached[user_ref] = max(detached.get(user_ref, 0), seq)
+        for user_ref, seq in result.compensated.items():
+            compensated[user_ref] = max(compensated.get(user_ref, 0), seq)
+
+    if results:
+        tail = results[-1]
+        if tail.last_hash != head.last_hash:
+            report.fail(f"last row hash does not match the chain head (seq {head.last_seq})")
+        if head.checkpoint_seq < head.last_seq and tail.tail_root != MerkleFrontier.loads(head.frontier).root():
+            report.fail("rows after the last checkpoint do not match the chain head")
+
+    for user_ref, seq in sorted(detached.items()):
+        if compensated.get(user_ref, 0) == 0:
+            report.fail(f"user {user_ref}: audit rows detached without a compensating event (last seq {seq})")
+
+    report.chunks = len(chunks)
+    report.seconds = time.perf_counter() - started
+    return report
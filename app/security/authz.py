@@ -5,6 +5,7 @@ from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 
 from app.extensions import db
 from app.models import User
+from app.observability.tracing import span
 
 
 AUTH_REDIRECT_ENDPOINT = "auth.login"
@@ -22,17 +23,24 @@ def _identity_to_user(identity) -> User | None:
     return db.session.get(User, user_id)
 
 
-def attach_current_user() -> None:
-    g.current_user = None
+def _resolve_current_user() -> User | None:
     try:
         verify_jwt_in_request(optional=True, locations=["cookies"])
     except Exception:
-        return
+        return None
 
     identity = get_jwt_identity()
     user = _identity_to_user(identity)
     if user and user.is_active:
-        g.current_user = user
+        return user
+    return None
+
+
+def attach_current_user() -> None:
+    # Resolve before replacing g.current_user: the session's identity map only holds weak
+    # references, so dropping the previous instance first would force a second SELECT.
+    with span("auth.current_user"):
+        g.current_user = _resolve_current_user()
 
 
 def is_authenticated() -> bool:
@@ -58,7 +66,10 @@ def role_required(required_role: str):
         @wraps(view_func)
         @login_required
         def wrapped(*args, **kwargs):
-            if g.current_user.role.value != role_value:
+            # Imported here: the permissions module builds on login_required above.
+            from app.security.permissions import holds_role
+
+            if g.current_user.role.value != role_value and not holds_role(g.current_user, role_value):
                 abort(403)
             return view_func(*args, **kwargs)
 
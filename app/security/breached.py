@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from flask import Flask, current_app
+
+from app.observability.metrics import BREACHED_PASSWORD_CHECKS
+from app.observability.tracing import span
+
+BREACHED_CORPUS_KEY = "breached_passwords"
+MAGIC = b"BRPW"
+VERSION = 1
+# magic, version, prefix index bits, record count
+HEADER = struct.Struct(">4sHB x Q")
+DIGEST_SIZE = 20
+MAX_INDEX_BITS = 24
+
+logger = logging.getLogger("app.security")
+
+
+class CorpusFormatError(ValueError):
+    pass
+
+
+def password_digest(password: str) -> bytes:
+    # Same digest as the HIBP dumps: SHA-1 over the UTF-8 password.
+    return hashlib.sha1(password.encode("utf-8")).digest()
+
+
+class _Records:
+    # Lets bisect run over the mapped file without materialising it.
+    def __init__(self, buffer: mmap.mmap, index_bits: int, count: int):
+        self.buffer = buffer
+        self.index_bits = index_bits
+        self.start = HEADER.size + (((1 << index_bits) + 1) * 8 if index_bits else 0)
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> bytes:
+        offset = self.start + index * DIGEST_SIZE
+        return self.buffer[offset : offset + DIGEST_SIZE]
+
+
+class BreachedPasswordCorpus:
+    # The file is mapped read-only, so every worker shares the kernel's page cache instead of
+    # holding its own copy. A rebuilt file is swapped in by rename; the next lookup notices the
+    # new inode and remaps.
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._identity: tuple[int, int] | None = None
+        self._records: _Records | None = None
+        self._warned = False
+
+    def _open(self) -> _Records | None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            if not self._warned:
+                logger.warning("breached password corpus %s is unavailable", self.path)
+                self._warned = True
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        if identity == self._identity:
+            return self._records
+
+        with self._lock:
+            if identity == self._identity:
+                return self._records
+            try:
+                records = self._map()
+            except (OSError, ValueError, struct.error) as exc:
+                # Empty, truncated or foreign files fail open like a missing one. The identity is
+                # remembered so a bad file is not re-read on every check; a rebuilt file has a
+                # new inode and is picked up.
+                if not self._warned:
+                    logger.warning("breached password corpus %s is unusable: %s", self.path, exc)
+                    self._warned = True
+                records = None
+            else:
+                self._warned = False
+            # The old mapping is left to the garbage collector: a concurrent lookup may still
+            # be reading from it.
+            self._records = records
+            self._identity = identity
+        return self._records
+
+    def _map(self) -> _Records:
+        with open(self.path, "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, index_bits, count = HEADER.unpack_from(mapped)
+            if magic != MAGIC or version != VERSION:
+                raise CorpusFormatError(f"{self.path} is not a breached password corpus.")
+            records = _Records(mapped, index_bits, count)
+            if len(mapped) != records.start + count * DIGEST_SIZE:
+                raise CorpusFormatError(f"{self.path} is truncated or has trailing data.")
+        except (ValueError, struct.error):
+            mapped.close()
+            raise
+        if hasattr(mmap, "MADV_RANDOM"):
+            # Lookups touch a handful of pages; readahead would only evict useful ones.
+            mapped.madvise(mmap.MADV_RANDOM)
+        return records
+
+    def __len__(self) -> int:
+        records = self._open()
+        return len(records) if records else 0
+
+    def _bucket(self, digest: bytes, records: _Records) -> tuple[int, int]:
+        bits = records.index_bits
+        if not bits:
+            return 0, len(records)
+        prefix = int.from_bytes(digest[:4], "big") >> (32 - bits)
+        return struct.unpack_from(">QQ", records.buffer, HEADER.size + prefix * 8)
+
+    def contains_digest(self, digest: bytes) -> bool | None:
+        records = self._open()
+        if records is None:
+            return None
+        low, high = self._bucket(digest, records)
+        position = bisect_left(records, digest, low, high)
+        return position < high and records[position] == digest
+
+    def contains(self, password: str) -> bool | None:
+        return self.contains_digest(password_digest(password))
+
+
+@dataclass
+class BuildReport:
+    records: int = 0
+    duplicates: int = 0
+    below_min_count: int = 0
+    invalid: int = 0
+
+
+def _parse_line(line: str) -> tuple[bytes, int] | None:
+    text, _, count = line.strip().partition(":")
+    if len(text) != DIGEST_SIZE * 2:
+        return None
+    try:
+        return bytes.fromhex(text), int(count) if count else 1
+    except ValueError:
+        return None
+
+
+def build_corpus(lines: Iterable[str], output_path: str, index_bits: int = 16, min_count: int = 1) -> BuildReport:
+    # Streams the "SHA1:COUNT" dump (ordered by hash, as HIBP publishes it) straight to disk,
+    # so memory stays at the prefix index no matter how large the dump is.
+    if not 0 <= index_bits <= MAX_INDEX_BITS:
+        raise ValueError(f"index_bits must be between 0 and {MAX_INDEX_BITS}.")
+    report = BuildReport()
+    buckets = array("Q", bytes(8 * (1 << index_bits))) if index_bits else None
+    index_size = ((1 << index_bits) + 1) * 8 if index_bits else 0
+    temporary = f"{output_path}.tmp"
+    previous = b""
+
+    try:
+        with open(temporary, "wb") as output:
+            output.write(bytes(HEADER.size + index_size))
+            for line_number, line in enumerate(lines, start=1):
+                parsed = _parse_line(line)
+                if parsed is None:
+                    if line.strip():
+                        report.invalid += 1
+                    continue
+                digest, count = parsed
+                if count < min_count:
+                    report.below_min_count += 1
+                    continue
+                if digest == previous:
+                    report.duplicates += 1
+                    continue
+                if digest < previous:
+                    raise CorpusFormatError(
+                        f"Line {line_number} is out of order; use the ordered-by-hash dump or sort it first."
+                    )
+                output.write(digest)
+                previous = digest
+                report.records += 1
+                if buckets is not None:
+                    buckets[int.from_bytes(digest[:4], "big") >> (32 - index_bits)] += 1
+
+            output.seek(0)
+            output.write(HEADER.pack(MAGIC, VERSION, index_bits, report.records))
+            if buckets is not None:
+                offsets = array("Q", [0])
+                for size in buckets:
+                    offsets.append(offsets[-1] + size)
+                if sys.byteorder == "little":
+                    offsets.byteswap()
+                output.write(offsets.tobytes())
+        # Rename so running workers keep their mapping of the old file until they remap.
+        os.replace(temporary, output_path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return report
+
+
+def get_breached_corpus(app: Flask) -> BreachedPasswordCorpus | None:
+    path = app.config.get("BREACHED_PASSWORDS_FILE", "")
+    if not path:
+        return None
+    corpus = app.extensions.get(BREACHED_CORPUS_KEY)
+    if corpus is None or corpus.path != path:
+        corpus = app.extensions[BREACHED_CORPUS_KEY] = BreachedPasswordCorpus(path)
+    return corpus
+
+
+def is_breached_password(password: str) -> bool:
+    corpus = get_breached_corpus(current_app)
+    if corpus is None:
+        return False
+    with span("password.breach_check"):
+        found = corpus.contains(password)
+    # A missing corpus fails open: the check adds to the strength rules, it does not replace them.
+    BREACHED_PASSWORD_CHECKS.inc("unavailable" if found is None else "breached" if found else "clean")
+    return bool(found)
@@ -1,9 +1,17 @@
+import base64
+import hashlib
 import hmac
 import secrets
+import threading
+import time
+from dataclasses import dataclass
+from itertools import islice
 from typing import Optional
 
-import requests
-from flask import current_app, session
+from flask import Flask, current_app
+
+from app.observability.metrics import CAPTCHA_RESULTS, CAPTCHA_VERIFY_SECONDS
+from app.observability.tracing import span
 
 TURNSTILE_VERIFY_URL = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
 
@@ -18,8 +26,12 @@ def is_turnstile_enabled() -> bool:
 
 def verify_turnstile_token(token: str, remote_ip: Optional[str] = None) -> bool:
     if not token:
+        CAPTCHA_RESULTS.inc("turnstile", "missing")
         return False
 
+    # Imported on first use: requests (and urllib3) only matter when Turnstile is enabled.
+    import requests
+
     payload = {
         "secret": current_app.config.get("TURNSTILE_SECRET_KEY"),
         "response": token,
@@ -27,22 +39,94 @@ def verify_turnstile_token(token: str, remote_ip: Optional[str] = None) -> bool:
     }
 
     try:
-        response = requests.post(TURNSTILE_VERIFY_URL, data=payload, timeout=5)
-        response.raise_for_status()
-        data = response.json()
+        with CAPTCHA_VERIFY_SECONDS.time("turnstile"), span("captcha.turnstile"):
+            response = requests.post(TURNSTILE_VERIFY_URL, data=payload, timeout=5)
+            response.raise_for_status()
+            data = response.json()
     except requests.RequestException:
+        CAPTCHA_RESULTS.inc("turnstile", "error")
         return False
 
-    return bool(data.get("success"))
+    is_valid = bool(data.get("success"))
+    CAPTCHA_RESULTS.inc("turnstile", "success" if is_valid else "failure")
+    return is_valid
+
+
+class ReplayGuard:
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._expiry: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, nonce: str, expires_at: int) -> bool:
+        now = int(time.time())
+        with self._lock:
+            # Claims arrive in roughly expiry order, so expired nonces sit at the front.
+            for seen in list(islice(self._expiry, 64)):
+                if self._expiry[seen] >= now:
+                    break
+                del self._expiry[seen]
+
+            if nonce in self._expiry:
+                return False
+            if len(self._expiry) >= self.max_entries:
+                self._expiry.pop(next(iter(self._expiry)))
+            self._expiry[nonce] = expires_at
+            return True
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+
+class RedisReplayGuard:
+    # Shared by every worker, so a nonce burned on one cannot be replayed on another.
+    def __init__(self, client, prefix: str = "captcha-nonce:"):
+        self.client = client
+        self.prefix = prefix
+
+    def claim(self, nonce: str, expires_at: int) -> bool:
+        ttl = max(1, expires_at - int(time.time()))
+        return bool(self.client.set(self.prefix + nonce, b"1", nx=True, ex=ttl))
+
+
+@dataclass(frozen=True)
+class MathChallenge:
+    question: str
+    token: str
+
+
+def init_captcha(app: Flask) -> None:
+    backend = app.config.get("MATH_CAPTCHA_REPLAY_BACKEND", "memory").strip().lower()
 
+    if backend == "memory":
+        guard = ReplayGuard(app.config.get("MATH_CAPTCHA_REPLAY_MAX_ENTRIES", 100_000))
+    elif backend == "redis":
+        import redis
+
+        url = app.config.get("MATH_CAPTCHA_REDIS_URL") or app.config["FRAGMENT_CACHE_REDIS_URL"]
+        guard = RedisReplayGuard(redis.Redis.from_url(url))
+    else:
+        raise ValueError(f"Unknown MATH_CAPTCHA_REPLAY_BACKEND: {backend!r}")
+    app.extensions["captcha_replay_guard"] = guard
+
+
+def _signing_key() -> bytes:
+    secret = current_app.config["SECRET_KEY"]
+    if isinstance(secret, str):
+        secret = secret.encode()
+    return hashlib.sha256(b"math-captcha:" + secret).digest()
 
-def _captcha_session_keys(scope: str) -> tuple[str, str]:
-    question_key = f"captcha_{scope}_question"
-    answer_key = f"captcha_{scope}_answer"
-    return question_key, answer_key
 
+def _mac(key: bytes, message: str, length: int) -> str:
+    digest = hmac.new(key, message.encode(), hashlib.sha256).digest()[:length]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
 
-def generate_math_challenge(scope: str) -> str:
+
+def _answer_tag(key: bytes, nonce: str, answer: str) -> str:
+    return _mac(key, f"answer|{nonce}|{answer}", 9)
+
+
+def generate_math_challenge(scope: str) -> MathChallenge:
     left = secrets.randbelow(15) + 5
     right = secrets.randbelow(9) + 1
 
@@ -55,29 +139,33 @@ def generate_math_challenge(scope: str) -> str:
         question = f"What is {left} - {right}?"
         answer = left - right
 
-    question_key, answer_key = _captcha_session_keys(scope)
-    session[question_key] = question
-    session[answer_key] = str(answer)
-    return question
-
+    # The token carries everything verification needs, so the session is never written.
+    key = _signing_key()
+    expires_at = int(time.time()) + current_app.config.get("MATH_CAPTCHA_TTL_SECONDS", 600)
+    nonce = secrets.token_urlsafe(9)
+    body = f"{expires_at}.{nonce}.{_answer_tag(key, nonce, str(answer))}"
+    return MathChallenge(question, f"{body}.{_mac(key, f'{scope}|{body}', 12)}")
 
-def get_math_challenge(scope: str) -> str:
-    question_key, _ = _captcha_session_keys(scope)
-    question = session.get(question_key)
-    if question:
-        return question
-    return generate_math_challenge(scope)
 
+def verify_math_challenge(scope: str, token: str, answer: str) -> bool:
+    with CAPTCHA_VERIFY_SECONDS.time("math"), span("captcha.math"):
+        is_valid = _check_math_token(scope, token or "", (answer or "").strip())
+    CAPTCHA_RESULTS.inc("math", "success" if is_valid else "failure")
+    return is_valid
 
-def verify_math_challenge(scope: str, answer: str) -> bool:
-    _, answer_key = _captcha_session_keys(scope)
-    expected = session.get(answer_key)
-    submitted = (answer or "").strip()
-
-    is_valid = bool(expected) and hmac.compare_digest(submitted, str(expected))
 
-    question_key, _ = _captcha_session_keys(scope)
-    session.pop(answer_key, None)
-    session.pop(question_key, None)
+def _check_math_token(scope: str, token: str, answer: str) -> bool:
+    parts = token.split(".")
+    if len(parts) != 4 or not parts[0].isdigit():
+        return False
+    expires_raw, nonce, answer_tag, signature = parts
 
-    return is_valid
+    key = _signing_key()
+    if not hmac.compare_digest(signature, _mac(key, f"{scope}|{expires_raw}.{nonce}.{answer_tag}", 12)):
+        return False
+    if int(expires_raw) < time.time():
+        return False
+    # Burn the nonce before checking the answer so one token cannot be used to guess repeatedly.
+    if not current_app.extensions["captcha_replay_guard"].claim(nonce, int(expires_raw)):
+        return False
+    return bool(answer) and hmac.compare_digest(answer_tag, _answer_tag(key, nonce, answer))
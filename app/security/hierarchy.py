@@ -0,0 +1,123 @@
+from sqlalchemy import delete, insert, select
+
+from app.extensions import db
+from app.models import Group, Role, User, UserRole, group_closure, group_members, role_closure
+from app.security.permissions import mark_permissions_changed, refresh_user_masks
+
+ID_CHUNK_SIZE = 1000
+
+
+class HierarchyError(ValueError):
+    pass
+
+
+def _closure_for(node) -> tuple:
+    if isinstance(node, Role):
+        return Role, role_closure
+    return Group, group_closure
+
+
+def _ancestor_rows(closure, node_id: int) -> list[tuple[int, int]]:
+    statement = select(closure.c.ancestor_id, closure.c.depth).where(closure.c.descendant_id == node_id)
+    return [(ancestor_id, depth) for ancestor_id, depth in db.session.execute(statement)]
+
+
+def _descendant_rows(closure, node_id: int) -> list[tuple[int, int]]:
+    statement = select(closure.c.descendant_id, closure.c.depth).where(closure.c.ancestor_id == node_id)
+    return [(descendant_id, depth) for descendant_id, depth in db.session.execute(statement)]
+
+
+def ancestors(node) -> list[int]:
+    _, closure = _closure_for(node)
+    rows = sorted(_ancestor_rows(closure, node.id), key=lambda row: row[1])
+    return [node_id for node_id, depth in rows if depth > 0]
+
+
+def descendants(node) -> list[int]:
+    _, closure = _closure_for(node)
+    return [node_id for node_id, depth in _descendant_rows(closure, node.id) if depth > 0]
+
+
+def create_role(name: str, description: str | None = None, parent: Role | None = None) -> Role:
+    if Role.query.filter_by(name=name).first() is not None:
+        raise HierarchyError(f"A role named {name!r} already exists.")
+    role = Role(name=name, description=description, parent_id=parent.id if parent else None)
+    db.session.add(role)
+    db.session.flush()
+    return role
+
+
+def create_group(name: str, description: str | None = None, parent: Group | None = None) -> Group:
+    if Group.query.filter_by(name=name).first() is not None:
+        raise HierarchyError(f"A group named {name!r} already exists.")
+    group = Group(name=name, description=description, parent_id=parent.id if parent else None)
+    db.session.add(group)
+    db.session.flush()
+    return group
+
+
+def move(node, parent) -> None:
+    model, closure = _closure_for(node)
+    if parent is not None and not isinstance(parent, model):
+        raise HierarchyError("A node can only be moved under a node of the same kind.")
+
+    subtree = _descendant_rows(closure, node.id)
+    subtree_ids = [node_id for node_id, _ in subtree]
+    if parent is not None and parent.id in subtree_ids:
+        raise HierarchyError(f"Cannot move {node.name!r} under itself or one of its descendants.")
+
+    # Only paths that enter the subtree from above change; paths inside it keep their depth.
+    old_ancestors = [node_id for node_id, depth in _ancestor_rows(closure, node.id) if depth > 0]
+    if old_ancestors:
+        for start in range(0, len(subtree_ids), ID_CHUNK_SIZE):
+            chunk = subtree_ids[start : start + ID_CHUNK_SIZE]
+            db.session.execute(
+                delete(closure).where(closure.c.ancestor_id.in_(old_ancestors), closure.c.descendant_id.in_(chunk))
+            )
+
+    if parent is not None:
+        new_ancestors = _ancestor_rows(closure, parent.id)
+        rows = [
+            {"ancestor_id": ancestor_id, "descendant_id": descendant_id, "depth": above + below + 1}
+            for ancestor_id, above in new_ancestors
+            for descendant_id, below in subtree
+        ]
+        for start in range(0, len(rows), ID_CHUNK_SIZE):
+            db.session.execute(insert(closure), rows[start : start + ID_CHUNK_SIZE])
+
+    node.parent_id = parent.id if parent else None
+    mark_permissions_changed()
+
+
+def delete_node(node) -> None:
+    # Children move up to the deleted node's parent instead of losing their place in the tree.
+    model, _ = _closure_for(node)
+    if model is Role and node.name in {role.value for role in UserRole}:
+        raise HierarchyError(f"The built-in {node.name!r} role cannot be deleted.")
+    parent = db.session.get(model, node.parent_id) if node.parent_id else None
+    for child in model.query.filter_by(parent_id=node.id).all():
+        move(child, parent)
+    db.session.flush()
+    db.session.delete(node)
+    mark_permissions_changed()
+
+
+def add_member(group: Group, user: User) -> bool:
+    exists = db.session.execute(
+        select(group_members.c.user_id).where(group_members.c.group_id == group.id, group_members.c.user_id == user.id)
+    ).first()
+    if exists:
+        return False
+    db.session.execute(insert(group_members).values(group_id=group.id, user_id=user.id))
+    refresh_user_masks([user.id])
+    return True
+
+
+def remove_member(group: Group, user: User) -> bool:
+    result = db.session.execute(
+        delete(group_members).where(group_members.c.group_id == group.id, group_members.c.user_id == user.id)
+    )
+    if not result.rowcount:
+        return False
+    refresh_user_masks([user.id])
+    return True
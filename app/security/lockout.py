@@ -1,5 +1,7 @@
 from datetime import UTC, datetime, timedelta
 
+from app.observability.metrics import LOCKOUT_EVENTS
+
 
 def utcnow() -> datetime:
     return datetime.now(UTC).replace(tzinfo=None)
@@ -39,6 +41,8 @@ def record_failed_attempt(user, config: dict) -> bool:
         user.locked_until = now + duration
         user.failed_attempts = 0
         user.failed_attempt_window_start = None
+        LOCKOUT_EVENTS.inc("locked")
         return True
 
+    LOCKOUT_EVENTS.inc("failed_attempt")
     return False
@@ -0,0 +1,417 @@
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from functools import wraps
+
+from flask import Flask, abort, current_app, g, has_app_context
+from sqlalchemy import delete, event, insert, inspect, or_, select, update
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from app.cache import bump_cache_version
+from app.db_routing import RoutingSession
+from app.extensions import db
+from app.models import (
+    CacheVersion,
+    Group,
+    Permission,
+    Role,
+    User,
+    UserRole,
+    group_closure,
+    group_members,
+    group_roles,
+    role_closure,
+    role_permissions,
+)
+from app.security.authz import login_required
+
+PERMISSIONS_VERSION = "permissions"
+MATERIALIZE_CHUNK_SIZE = 2000
+
+# Bit positions are stored in permissions.bit and carried in JWTs, so only ever append.
+PERMISSIONS = (
+    ("admin.dashboard", "View the admin dashboard"),
+    ("users.create", "Create accounts from the admin panel"),
+    ("users.import", "Bulk import accounts"),
+    ("users.role", "Change account roles"),
+    ("users.status", "Activate or deactivate accounts"),
+    ("users.unlock", "Clear account lockouts"),
+    ("users.delete", "Delete accounts"),
+)
+PERMISSION_BITS = {name: 1 << index for index, (name, _) in enumerate(PERMISSIONS)}
+
+# Applied when `flask permissions sync` first creates a role or a permission; later edits win.
+DEFAULT_ROLE_PERMISSIONS = {
+    UserRole.ADMIN.value: tuple(name for name, _ in PERMISSIONS),
+    UserRole.USER.value: (),
+}
+
+
+def permission_mask(*names: str) -> int:
+    mask = 0
+    for name in names:
+        if name not in PERMISSION_BITS:
+            raise ValueError(f"Unknown permission: {name!r}")
+        mask |= PERMISSION_BITS[name]
+    return mask
+
+
+def permission_names(mask: int) -> list[str]:
+    return [name for name, bit in PERMISSION_BITS.items() if mask & bit]
+
+
+@dataclass(frozen=True)
+class PermissionTable:
+    version: int
+    role_masks: dict[str, int]
+    group_masks: dict[int, int] = field(default_factory=dict)
+
+    def mask_for(self, role: str) -> int:
+        return self.role_masks.get(role, 0)
+
+    def user_mask(self, role: str, group_ids: Iterable[int] = ()) -> int:
+        mask = self.mask_for(role)
+        for group_id in group_ids:
+            mask |= self.group_masks.get(group_id, 0)
+        return mask
+
+
+def _on_primary(statement):
+    # A lagging replica would delay a revoke, or mix versions, so grants are always read from
+    # the primary, even inside replica-routed views.
+    return db.session.execute(statement, bind_arguments={"bind": db.engine})
+
+
+def _read_version() -> int:
+    return _on_primary(select(CacheVersion.version).where(CacheVersion.name == PERMISSIONS_VERSION)).scalar() or 0
+
+
+def compile_permission_table() -> PermissionTable:
+    # Read the version first: a change committed mid-compile leaves the table one version
+    # behind, so the next refresh rebuilds it instead of caching a mix.
+    version = _read_version()
+    rows = _on_primary(
+        select(Role.id, Role.name, Permission.bit)
+        .select_from(Role)
+        .outerjoin(role_permissions, role_permissions.c.role_id == Role.id)
+        .outerjoin(Permission, Permission.id == role_permissions.c.permission_id)
+    )
+    role_names: dict[int, str] = {}
+    direct: dict[int, int] = {}
+    for role_id, role_name, bit in rows:
+        role_names[role_id] = role_name
+        direct[role_id] = direct.get(role_id, 0) | (1 << bit if bit is not None else 0)
+
+    # Closure rows already list every role below each role, so inheritance is one pass
+    # over the table rather than a walk per level.
+    effective = dict(direct)
+    for ancestor_id, descendant_id in _on_primary(
+        select(role_closure.c.ancestor_id, role_closure.c.descendant_id).where(role_closure.c.depth > 0)
+    ):
+        effective[ancestor_id] = effective.get(ancestor_id, 0) | direct.get(descendant_id, 0)
+
+    granted: dict[int, int] = {}
+    for group_id, role_id in _on_primary(select(group_roles.c.group_id, group_roles.c.role_id)):
+        granted[group_id] = granted.get(group_id, 0) | effective.get(role_id, 0)
+
+    group_masks = dict(granted)
+    for ancestor_id, descendant_id in _on_primary(
+        select(group_closure.c.ancestor_id, group_closure.c.descendant_id).where(group_closure.c.depth > 0)
+    ):
+        if ancestor_id in granted:
+            group_masks[descendant_id] = group_masks.get(descendant_id, 0) | granted[ancestor_id]
+
+    role_masks = {role_names[role_id]: mask for role_id, mask in effective.items() if role_id in role_names}
+    return PermissionTable(version, role_masks, group_masks)
+
+
+class PermissionRegistry:
+    def __init__(self):
+        self._table: PermissionTable | None = None
+        self._lock = threading.Lock()
+
+    def table(self) -> PermissionTable:
+        # Other workers only learn about edits through the version row. It is read once per
+        # request (a primary-key lookup), so a revoke applies everywhere on the next request.
+        cached = g.get("permission_table") if has_app_context() else None
+        if cached is not None:
+            return cached
+
+        version = _read_version()
+        table = self._table
+        if table is None or table.version != version:
+            with self._lock:
+                if self._table is None or self._table.version != version:
+                    self._table = compile_permission_table()
+                table = self._table
+        if has_app_context():
+            g.permission_table = table
+        return table
+
+    def invalidate(self) -> None:
+        self._table = None
+        if has_app_context():
+            g.pop("permission_table", None)
+
+
+def init_permissions(app: Flask) -> None:
+    app.extensions["permission_registry"] = PermissionRegistry()
+
+    @app.before_request
+    def _reset_permission_table():
+        g.pop("permission_table", None)
+
+    @app.context_processor
+    def _inject_permission_helpers():
+        return {"can": has_permission}
+
+
+def compile_on_startup(app: Flask) -> bool:
+    with app.app_context():
+        try:
+            get_permission_registry().table()
+        except (OperationalError, ProgrammingError):
+            # Fresh database (e.g. before `flask db upgrade`): compile on first check instead.
+            db.session.rollback()
+            get_permission_registry().invalidate()
+            return False
+    return True
+
+
+def get_permission_registry() -> PermissionRegistry:
+    return current_app.extensions["permission_registry"]
+
+
+def _role_value(user) -> str:
+    return (user.role or UserRole.USER).value
+
+
+def _group_ids_by_user(user_ids: list[int], connection=None) -> dict[int, list[int]]:
+    statement = select(group_members.c.user_id, group_members.c.group_id).where(group_members.c.user_id.in_(user_ids))
+    rows = (connection or db.session).execute(statement)
+    groups: dict[int, list[int]] = {}
+    for user_id, group_id in rows:
+        groups.setdefault(user_id, []).append(group_id)
+    return groups
+
+
+def user_permission_mask(user) -> int:
+    if user is None:
+        return 0
+    table = get_permission_registry().table()
+    if user.permissions_version == table.version:
+        return user.permission_mask
+
+    # Stale after a role, group or grant change until `flask permissions materialize` rewrites
+    # the row: one indexed membership lookup, remembered for the rest of the request.
+    masks = g.setdefault("permission_masks", {})
+    key = (user.id, table.version)
+    if key not in masks:
+        masks[key] = table.user_mask(_role_value(user), _group_ids_by_user([user.id]).get(user.id, ()))
+    return masks[key]
+
+
+def has_permission(*names: str) -> bool:
+    required = permission_mask(*names)
+    return user_permission_mask(g.get("current_user")) & required == required
+
+
+def holds_role(user, role: str) -> bool:
+    # Senior roles and group grants qualify: the user must hold every permission of `role`.
+    required = get_permission_registry().table().role_masks.get(role)
+    return bool(required) and user_permission_mask(user) & required == required
+
+
+def can_grant_role(user, role: str) -> bool:
+    # `users.role` only moves accounts between roles the actor already covers, so it can never
+    # hand out (or take away) more than the actor holds.
+    required = get_permission_registry().table().mask_for(role)
+    return user_permission_mask(user) & required == required
+
+
+def permission_claims(user) -> dict:
+    # For downstream consumers of the token; this app always re-checks against the table.
+    if not current_app.config.get("PERMISSIONS_IN_JWT", False):
+        return {}
+    return {"perms": user_permission_mask(user), "perms_v": get_permission_registry().table().version}
+
+
+def permission_required(*names: str):
+    required = permission_mask(*names)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        @login_required
+        def wrapped(*args, **kwargs):
+            if user_permission_mask(g.current_user) & required != required:
+                abort(403)
+            return view_func(*args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+def _write_masks(table: PermissionTable, users) -> int:
+    groups = _group_ids_by_user([user.id for user in users])
+    by_mask: dict[int, list[int]] = {}
+    for user in users:
+        mask = table.user_mask(user.role.value, groups.get(user.id, ()))
+        if user.permissions_version != table.version or user.permission_mask != mask:
+            by_mask.setdefault(mask, []).append(user.id)
+
+    # Most users share a handful of masks, so this is one UPDATE per distinct mask, not per row.
+    users_table = User.__table__
+    for mask, ids in by_mask.items():
+        db.session.execute(
+            update(users_table)
+            .where(users_table.c.id.in_(ids))
+            .values(
+                permission_mask=mask,
+                permissions_version=table.version,
+                updated_at=users_table.c.updated_at,
+                row_version=users_table.c.row_version,
+            )
+        )
+    return sum(len(ids) for ids in by_mask.values())
+
+
+def _mask_columns():
+    return select(User.id, User.role, User.permission_mask, User.permissions_version)
+
+
+def refresh_user_masks(user_ids: Iterable[int]) -> int:
+    # Runs in the caller's transaction; the row locks order it against a concurrent materialize.
+    table = get_permission_registry().table()
+    ids = sorted(set(user_ids))
+    updated = 0
+    for start in range(0, len(ids), MATERIALIZE_CHUNK_SIZE):
+        chunk = ids[start : start + MATERIALIZE_CHUNK_SIZE]
+        users = db.session.execute(_mask_columns().where(User.id.in_(chunk)).with_for_update()).all()
+        updated += _write_masks(table, users)
+    return updated
+
+
+def materialize_user_permissions(chunk_size: int = MATERIALIZE_CHUNK_SIZE) -> int:
+    table = get_permission_registry().table()
+    updated = 0
+    last_id = 0
+    while True:
+        statement = _mask_columns().where(User.id > last_id).order_by(User.id).limit(chunk_size)
+        users = db.session.execute(statement.with_for_update()).all()
+        if not users:
+            return updated
+        updated += _write_masks(table, users)
+        db.session.commit()
+        last_id = users[-1].id
+
+
+def sync_permissions() -> dict[str, int]:
+    created = {"permissions": 0, "roles": 0, "grants": 0}
+    permissions = {permission.name: permission for permission in Permission.query.all()}
+    new_permissions = set()
+    for index, (name, description) in enumerate(PERMISSIONS):
+        if name not in permissions:
+            permissions[name] = Permission(name=name, description=description, bit=index)
+            db.session.add(permissions[name])
+            new_permissions.add(name)
+            created["permissions"] += 1
+
+    roles = {role.name: role for role in Role.query.all()}
+    for role_name, defaults in DEFAULT_ROLE_PERMISSIONS.items():
+        role = roles.get(role_name)
+        if role is None:
+            role = Role(name=role_name, description=f"Built-in {role_name} role")
+            db.session.add(role)
+            created["roles"] += 1
+            grants = defaults
+        else:
+            grants = [name for name in defaults if name in new_permissions]
+        for name in grants:
+            role.permissions.append(permissions[name])
+            created["grants"] += 1
+
+    db.session.commit()
+    return created
+
+
+def mark_permissions_changed(session=None) -> None:
+    # Core writes to the closure and membership tables bypass the before_flush check below.
+    session = session or db.session()
+    bump_cache_version(session.connection(), PERMISSIONS_VERSION)
+    session.info["permissions_changed"] = True
+
+
+def _touches_roles(session) -> bool:
+    return any(
+        isinstance(obj, (Role, Permission, Group)) for obj in (*session.new, *session.dirty, *session.deleted)
+    )
+
+
+def _stamp_new_and_regraded_users(session) -> None:
+    new_users = [obj for obj in session.new if isinstance(obj, User)]
+    regraded = [
+        obj for obj in session.dirty if isinstance(obj, User) and inspect(obj).attrs.role.history.has_changes()
+    ]
+    if not new_users and not regraded:
+        return
+
+    table = get_permission_registry().table()
+    groups = _group_ids_by_user([user.id for user in regraded], session.connection()) if regraded else {}
+    for user in (*new_users, *regraded):
+        user.permission_mask = table.user_mask(_role_value(user), groups.get(user.id, ()))
+        user.permissions_version = table.version
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _bump_on_role_changes(session, _flush_context, _instances):
+    if _touches_roles(session):
+        mark_permissions_changed(session)
+    if has_app_context():
+        _stamp_new_and_regraded_users(session)
+
+
+def _attach_to_closure(closure, connection, node_id: int, parent_id: int | None) -> None:
+    rows = [{"ancestor_id": node_id, "descendant_id": node_id, "depth": 0}]
+    if parent_id is not None:
+        ancestors = connection.execute(
+            select(closure.c.ancestor_id, closure.c.depth).where(closure.c.descendant_id == parent_id)
+        )
+        rows.extend({"ancestor_id": ancestor_id, "descendant_id": node_id, "depth": depth + 1} for ancestor_id, depth in ancestors)
+    connection.execute(insert(closure), rows)
+
+
+def _detach_from_closure(closure, connection, node_id: int) -> None:
+    connection.execute(delete(closure).where(or_(closure.c.ancestor_id == node_id, closure.c.descendant_id == node_id)))
+
+
+@event.listens_for(Role, "after_insert")
+def _add_role_to_closure(_mapper, connection, role):
+    _attach_to_closure(role_closure, connection, role.id, role.parent_id)
+
+
+@event.listens_for(Group, "after_insert")
+def _add_group_to_closure(_mapper, connection, group):
+    _attach_to_closure(group_closure, connection, group.id, group.parent_id)
+
+
+@event.listens_for(Role, "before_delete")
+def _remove_role_from_closure(_mapper, connection, role):
+    _detach_from_closure(role_closure, connection, role.id)
+
+
+@event.listens_for(Group, "before_delete")
+def _remove_group_from_closure(_mapper, connection, group):
+    _detach_from_closure(group_closure, connection, group.id)
+    connection.execute(delete(group_members).where(group_members.c.group_id == group.id))
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("permissions_changed", False) and has_app_context():
+        get_permission_registry().invalidate()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_rolled_back_changes(session):
+    session.info.pop("permissions_changed", None)
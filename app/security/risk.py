@@ -0,0 +1,168 @@
+import base64
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from flask import Flask, current_app, request
+
+from app.observability.metrics import CAPTCHA_RISK_DECISIONS
+
+KNOWN_DEVICE_COOKIE = "known_device"
+KNOWN_DEVICE_SLOTS = 5
+KNOWN_DEVICE_DISCOUNT = 2
+GLOBAL_KEY = "*"
+
+
+class SlidingCounter:
+    def __init__(self, window_seconds: int, max_keys: int = 50_000):
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        # key -> [window index, count in that window, count in the previous window]
+        self._windows: OrderedDict[str, list[int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _roll(self, key: str, now: float) -> list[int] | None:
+        state = self._windows.get(key)
+        if state is None:
+            return None
+        index = int(now // self.window_seconds)
+        if state[0] != index:
+            state[2] = state[1] if state[0] == index - 1 else 0
+            state[1] = 0
+            state[0] = index
+        return state
+
+    def add(self, key: str, amount: int = 1) -> None:
+        now = time.time()
+        with self._lock:
+            state = self._roll(key, now)
+            if state is None:
+                if len(self._windows) >= self.max_keys:
+                    self._windows.popitem(last=False)
+                state = self._windows[key] = [int(now // self.window_seconds), 0, 0]
+            state[1] += amount
+            self._windows.move_to_end(key)
+
+    def count(self, key: str) -> float:
+        # Weight the previous window by how much of it still overlaps the sliding window.
+        now = time.time()
+        with self._lock:
+            state = self._roll(key, now)
+            if state is None:
+                return 0.0
+            elapsed = (now % self.window_seconds) / self.window_seconds
+            return state[1] + state[2] * (1 - elapsed)
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+
+@dataclass
+class RiskAssessment:
+    score: float = 0.0
+    requires_captcha: bool = True
+    reasons: list[str] = field(default_factory=list)
+
+
+def init_risk(app: Flask) -> None:
+    window = app.config.get("CAPTCHA_RISK_WINDOW_SECONDS", 900)
+    max_keys = app.config.get("CAPTCHA_RISK_MAX_TRACKED_IPS", 50_000)
+    app.extensions["captcha_risk"] = {
+        "ip_failures": SlidingCounter(window, max_keys),
+        "email_failures": SlidingCounter(window, max_keys),
+        "global_failures": SlidingCounter(60, 1),
+    }
+
+
+def _counters() -> dict:
+    return current_app.extensions["captcha_risk"]
+
+
+def _client_ip() -> str:
+    return request.remote_addr or "unknown"
+
+
+def _email_key(email: str) -> str:
+    secret = current_app.config["SECRET_KEY"]
+    if isinstance(secret, str):
+        secret = secret.encode()
+    return hmac.new(secret, f"login-email|{email.lower()}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def record_auth_failure(email: str | None = None) -> None:
+    counters = _counters()
+    counters["ip_failures"].add(_client_ip())
+    counters["global_failures"].add(GLOBAL_KEY)
+    # Keyed by the submitted address whether or not an account exists, so the challenge decision
+    # cannot tell the two apart.
+    if email:
+        counters["email_failures"].add(_email_key(email))
+
+
+def _device_tag(email: str) -> str:
+    secret = current_app.config["SECRET_KEY"]
+    if isinstance(secret, str):
+        secret = secret.encode()
+    digest = hmac.new(secret, f"known-device|{email.lower()}".encode(), hashlib.sha256).digest()[:12]
+    return base64.urlsafe_b64encode(digest).decode()
+
+
+def _known_device_tags() -> list[str]:
+    value = request.cookies.get(KNOWN_DEVICE_COOKIE, "")
+    return [tag for tag in value.split(".") if tag][:KNOWN_DEVICE_SLOTS]
+
+
+def is_known_device(email: str) -> bool:
+    expected = _device_tag(email)
+    return any(hmac.compare_digest(tag, expected) for tag in _known_device_tags())
+
+
+def remember_device(response, email: str) -> None:
+    tag = _device_tag(email)
+    tags = [tag] + [existing for existing in _known_device_tags() if existing != tag]
+    response.set_cookie(
+        KNOWN_DEVICE_COOKIE,
+        ".".join(tags[:KNOWN_DEVICE_SLOTS]),
+        max_age=current_app.config.get("KNOWN_DEVICE_COOKIE_DAYS", 90) * 86400,
+        secure=current_app.config.get("JWT_COOKIE_SECURE", False),
+        httponly=True,
+        samesite="Lax",
+    )
+
+
+def assess_risk(scope: str, email: str | None = None, submitted: bool = True) -> RiskAssessment:
+    config = current_app.config
+    if not config.get("CAPTCHA_RISK_ENABLED", True):
+        return RiskAssessment(requires_captcha=True, reasons=["risk_scoring_disabled"])
+
+    counters = _counters()
+    assessment = RiskAssessment(requires_captcha=False)
+    forced = False
+
+    global_rate = counters["global_failures"].count(GLOBAL_KEY)
+    if global_rate >= config.get("CAPTCHA_RISK_GLOBAL_FAILURES_PER_MINUTE", 60):
+        assessment.reasons.append("global_failure_rate")
+        forced = True
+
+    ip_failures = counters["ip_failures"].count(_client_ip())
+    if ip_failures >= 1:
+        assessment.score += ip_failures
+        assessment.reasons.append("ip_failures")
+
+    if email:
+        email_failures = counters["email_failures"].count(_email_key(email))
+        if email_failures >= 1:
+            assessment.score += email_failures
+            assessment.reasons.append("email_failures")
+
+    if email and is_known_device(email):
+        assessment.score = max(0.0, assessment.score - KNOWN_DEVICE_DISCOUNT)
+        assessment.reasons.append("known_device")
+
+    assessment.requires_captcha = forced or assessment.score >= config.get("CAPTCHA_RISK_THRESHOLD", 3)
+    if submitted:
+        CAPTCHA_RISK_DECISIONS.inc(scope, "challenge" if assessment.requires_captcha else "skip")
+    return assessment
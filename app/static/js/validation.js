@@ -107,6 +107,55 @@
     });
   }
 
+  function bindAvailabilityChecks(form) {
+    const url = form.dataset.availabilityUrl;
+    const patterns = { username: USERNAME_REGEX, email: EMAIL_REGEX };
+    const takenMessages = {
+      username: "This username is already in use.",
+      email: "This email is already registered.",
+    };
+
+    form.querySelectorAll("[data-availability]").forEach((field) => {
+      const name = field.dataset.availability;
+      const note = document.createElement("p");
+      note.hidden = true;
+      field.insertAdjacentElement("afterend", note);
+      let timer = null;
+
+      const check = async () => {
+        const value = field.value.trim();
+        if (!patterns[name].test(value)) {
+          return;
+        }
+
+        try {
+          const response = await fetch(`${url}?${new URLSearchParams({ [name]: value })}`, {
+            method: "GET",
+            headers: { Accept: "application/json" },
+            credentials: "same-origin",
+          });
+          // Skip answers for a value the user has already typed past.
+          if (!response.ok || field.value.trim() !== value) {
+            return;
+          }
+
+          const payload = await response.json();
+          note.className = payload.available ? "hint" : "error";
+          note.textContent = payload.available ? `This ${name} is available.` : takenMessages[name];
+          note.hidden = false;
+        } catch (_error) {
+          // Advisory only; registration re-checks uniqueness on submit.
+        }
+      };
+
+      field.addEventListener("input", () => {
+        note.hidden = true;
+        window.clearTimeout(timer);
+        timer = window.setTimeout(check, 400);
+      });
+    });
+  }
+
   function getTheme() {
     return document.documentElement.getAttribute("data-theme") === "dark" ? "dark" : "light";
   }
@@ -352,6 +401,10 @@
           const payload = await response.json();
           if (payload.question) {
             question.textContent = payload.question;
+            const tokenInput = form.querySelector("[data-captcha-token]");
+            if (tokenInput) {
+              tokenInput.value = payload.token || "";
+            }
             const answerInput = form.querySelector("#captcha_answer");
             if (answerInput) {
               answerInput.value = "";
@@ -608,6 +661,23 @@
     searchInput.addEventListener("input", filterRows);
   }
 
+  function bindBulkSelection() {
+    const selectAll = document.querySelector("[data-bulk-select-all]");
+    if (!selectAll) {
+      return;
+    }
+
+    selectAll.addEventListener("change", () => {
+      document.querySelectorAll("[data-user-row]").forEach((row) => {
+        const checkbox = row.querySelector("[data-bulk-select]");
+        // Only rows left visible by the search box are selected.
+        if (checkbox && row.style.display !== "none") {
+          checkbox.checked = selectAll.checked;
+        }
+      });
+    });
+  }
+
   function cleanupFlashStack(stack) {
     if (stack && stack.children.length === 0) {
       stack.remove();
@@ -660,6 +730,7 @@
 
   window.addEventListener("DOMContentLoaded", () => {
     document.querySelectorAll("form[data-validate]").forEach((form) => bindValidation(form));
+    document.querySelectorAll("form[data-availability-url]").forEach((form) => bindAvailabilityChecks(form));
     bindThemeToggle();
     bindProfileMenu();
     bindPasswordToggles();
@@ -669,6 +740,7 @@
     bindCaptchaRefresh();
     bindConfirmationForms();
     bindAdminSearch();
+    bindBulkSelection();
     bindFlashAutoDismiss();
   });
 })();
@@ -0,0 +1,203 @@
+import os
+import shutil
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+from flask import Flask, current_app, url_for
+
+
+class StoredObject(NamedTuple):
+    name: str
+    size: int
+    modified_at: datetime
+
+
+class AvatarStorage(ABC):
+    @abstractmethod
+    def put(self, name: str, stream: BinaryIO, content_type: str | None = None) -> None: ...
+
+    @abstractmethod
+    def get(self, name: str) -> bytes | None: ...
+
+    @abstractmethod
+    def delete(self, name: str) -> None: ...
+
+    @abstractmethod
+    def url(self, name: str) -> str: ...
+
+    @abstractmethod
+    def iter_objects(self) -> Iterator[StoredObject]: ...
+
+    @abstractmethod
+    def quarantine(self, name: str) -> None: ...
+
+
+class LocalAvatarStorage(AvatarStorage):
+    def __init__(self, directory: Path, url_subdir: str):
+        self.directory = Path(directory)
+        self.url_subdir = url_subdir.strip("/")
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, name: str) -> Path:
+        path = self.directory / name
+        if path.parent != self.directory:
+            raise ValueError("Invalid avatar object name.")
+        return path
+
+    def put(self, name: str, stream: BinaryIO, content_type: str | None = None) -> None:
+        with self._path(name).open("wb") as handle:
+            shutil.copyfileobj(stream, handle)
+
+    def get(self, name: str) -> bytes | None:
+        path = self._path(name)
+        if not path.is_file():
+            return None
+        return path.read_bytes()
+
+    def delete(self, name: str) -> None:
+        path = self._path(name)
+        if path.exists() and path.is_file():
+            path.unlink()
+
+    def url(self, name: str) -> str:
+        return url_for("static", filename=f"{self.url_subdir}/{name}")
+
+    def iter_objects(self) -> Iterator[StoredObject]:
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or entry.name.startswith("."):
+                    continue
+                stat = entry.stat()
+                modified_at = datetime.fromtimestamp(stat.st_mtime, UTC).replace(tzinfo=None)
+                yield StoredObject(entry.name, stat.st_size, modified_at)
+
+    def quarantine(self, name: str) -> None:
+        quarantine_dir = self.directory / ".quarantine"
+        quarantine_dir.mkdir(exist_ok=True)
+        self._path(name).replace(quarantine_dir / name)
+
+
+class S3AvatarStorage(AvatarStorage):
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client=None,
+        endpoint_url: str | None = None,
+        region_name: str | None = None,
+        public_base_url: str | None = None,
+        presign: bool = False,
+        url_expires: int = 3600,
+    ):
+        if not bucket:
+            raise ValueError("AVATAR_S3_BUCKET is required for the s3 avatar backend.")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.endpoint_url = endpoint_url
+        self.region_name = region_name
+        self.public_base_url = (public_base_url or "").rstrip("/")
+        self.presign = presign
+        self.url_expires = url_expires
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client(
+                "s3",
+                endpoint_url=self.endpoint_url,
+                region_name=self.region_name,
+            )
+        return self._client
+
+    def _key(self, name: str) -> str:
+        if "/" in name or name in {"", ".", ".."}:
+            raise ValueError("Invalid avatar object name.")
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def put(self, name: str, stream: BinaryIO, content_type: str | None = None) -> None:
+        extra_args = {"ContentType": content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=self._key(name), Body=stream.read(), **extra_args)
+
+    def get(self, name: str) -> bytes | None:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def delete(self, name: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def iter_objects(self) -> Iterator[StoredObject]:
+        list_prefix = f"{self.prefix}/" if self.prefix else ""
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=list_prefix, Delimiter="/"):
+            for item in page.get("Contents", []):
+                name = item["Key"][len(list_prefix):]
+                if not name:
+                    continue
+                modified_at = item["LastModified"]
+                if modified_at.tzinfo is not None:
+                    modified_at = modified_at.astimezone(UTC).replace(tzinfo=None)
+                yield StoredObject(name, item["Size"], modified_at)
+
+    def quarantine(self, name: str) -> None:
+        key = self._key(name)
+        quarantine_key = f"{self.prefix}/.quarantine/{name}" if self.prefix else f".quarantine/{name}"
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=quarantine_key,
+            CopySource={"Bucket": self.bucket, "Key": key},
+        )
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def url(self, name: str) -> str:
+        key = self._key(name)
+        if self.presign:
+            return self.client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": self.bucket, "Key": key},
+                ExpiresIn=self.url_expires,
+            )
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        base = (self.endpoint_url or f"https://{self.bucket}.s3.amazonaws.com").rstrip("/")
+        if self.endpoint_url:
+            return f"{base}/{self.bucket}/{key}"
+        return f"{base}/{key}"
+
+
+def build_avatar_storage(app: Flask) -> AvatarStorage:
+    backend = app.config.get("AVATAR_STORAGE_BACKEND", "local").strip().lower()
+    subdir = app.config.get("AVATAR_UPLOAD_SUBDIR", "uploads/avatars").strip("/")
+
+    if backend == "local":
+        return LocalAvatarStorage(Path(app.static_folder) / subdir, subdir)
+
+    if backend == "s3":
+        return S3AvatarStorage(
+            bucket=app.config.get("AVATAR_S3_BUCKET", ""),
+            prefix=app.config.get("AVATAR_S3_PREFIX", subdir),
+            endpoint_url=app.config.get("AVATAR_S3_ENDPOINT_URL") or None,
+            region_name=app.config.get("AVATAR_S3_REGION") or None,
+            public_base_url=app.config.get("AVATAR_S3_PUBLIC_BASE_URL") or None,
+            presign=app.config.get("AVATAR_S3_PRESIGNED_URLS", False),
+            url_expires=app.config.get("AVATAR_S3_URL_EXPIRES", 3600),
+        )
+
+    raise ValueError(f"Unknown AVATAR_STORAGE_BACKEND: {backend!r}")
+
+
+def init_avatar_storage(app: Flask) -> None:
+    app.extensions["avatar_storage"] = build_avatar_storage(app)
+
+
+def get_avatar_storage() -> AvatarStorage:
+    return current_app.extensions["avatar_storage"]
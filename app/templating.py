@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from flask import Flask, url_for
+from jinja2 import FileSystemBytecodeCache
+
+
+def template_cache_dir(app: Flask) -> Path:
+    configured = app.config.get("TEMPLATE_BYTECODE_CACHE_DIR")
+    return Path(configured) if configured else Path(app.instance_path) / "jinja_cache"
+
+
+def init_template_cache(app: Flask) -> None:
+    if not app.config.get("TEMPLATE_BYTECODE_CACHE_ENABLED", True):
+        return
+
+    # Entries are keyed by a checksum of the template source and written atomically, so
+    # every worker (and every deploy) can share one directory.
+    directory = template_cache_dir(app)
+    directory.mkdir(parents=True, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(str(directory))
+
+
+def warm_templates(app: Flask) -> int:
+    names = app.jinja_env.list_templates(extensions=("html",))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def prime_url_routing(app: Flask) -> int:
+    built = 0
+    with app.test_request_context("/"):
+        for rule in app.url_map.iter_rules():
+            if rule.arguments - set(rule.defaults or ()):
+                continue
+            url_for(rule.endpoint)
+            built += 1
+    return built
@@ -3,7 +3,8 @@ from flask_wtf.file import FileAllowed, FileField, FileRequired
 from wtforms import PasswordField, StringField, TextAreaField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, Regexp, ValidationError
 
-from app.auth.forms import USERNAME_PATTERN, password_strength_errors
+from app.auth.forms import BREACHED_PASSWORD_MESSAGE, USERNAME_PATTERN, password_strength_errors
+from app.security.breached import is_breached_password
 
 
 class ProfileDetailsForm(FlaskForm):
@@ -36,6 +37,8 @@ class PasswordChangeForm(FlaskForm):
         if failures:
             requirement_text = ", ".join(failures)
             raise ValidationError(f"Password must include {requirement_text}.")
+        if is_breached_password(field.data):
+            raise ValidationError(BREACHED_PASSWORD_MESSAGE)
 
 
 class AvatarUploadForm(FlaskForm):
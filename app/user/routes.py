@@ -1,33 +1,28 @@
-from pathlib import Path
 from uuid import uuid4
 
 from flask import Blueprint, current_app, flash, g, redirect, render_template, url_for
+from markupsafe import Markup
 from sqlalchemy import case, func
 from werkzeug.utils import secure_filename
 
+from app.cache import cached_fragment, render_user_row, users_version
+from app.db_routing import use_read_replica
 from app.extensions import db
+from app.http_cache import conditional_view
 from app.models import User, UserRole, utcnow
 from app.security.audit import record_audit_event
 from app.security.authz import login_required
+from app.storage import get_avatar_storage
 from app.user.forms import AvatarUploadForm, PasswordChangeForm, ProfileDetailsForm
 
 user_bp = Blueprint("user", __name__)
 
 
-def _avatar_dir() -> Path:
-    subdir = current_app.config.get("AVATAR_UPLOAD_SUBDIR", "uploads/avatars").strip("/")
-    directory = Path(current_app.static_folder) / subdir
-    directory.mkdir(parents=True, exist_ok=True)
-    return directory
-
-
 def _remove_avatar_file(filename: str | None) -> None:
     if not filename:
         return
 
-    path = _avatar_dir() / filename
-    if path.exists() and path.is_file():
-        path.unlink()
+    get_avatar_storage().delete(filename)
 
 
 def _profile_forms(user: User):
@@ -67,16 +62,29 @@ def _render_profile(
 
 @user_bp.get("/directory")
 @login_required
+@use_read_replica
+@conditional_view()
 def directory():
-    role_order = case((User.role == UserRole.ADMIN, 0), else_=1)
-    users = User.query.order_by(role_order.asc(), func.lower(User.username).asc()).all()
-    admin_count = sum(1 for user in users if user.role == UserRole.ADMIN)
-    user_count = len(users) - admin_count
-    return render_template("user/directory.html", users=users, admin_count=admin_count, user_count=user_count)
+    def render_table() -> str:
+        role_order = case((User.role == UserRole.ADMIN, 0), else_=1)
+        users = User.query.order_by(role_order.asc(), func.lower(User.username).asc()).all()
+        admin_count = sum(1 for user in users if user.role == UserRole.ADMIN)
+        return render_template(
+            "user/_directory_table.html",
+            rows=[render_user_row("user/_member_row.html", user) for user in users],
+            admin_count=admin_count,
+            user_count=len(users) - admin_count,
+        )
+
+    # On a hit the user list is never queried; any write to a listed column bumps the version.
+    table = cached_fragment(f"user.directory:v{users_version()}", render_table)
+    return render_template("user/directory.html", directory_table=Markup(table))
 
 
 @user_bp.get("/home")
 @login_required
+@use_read_replica
+@conditional_view(include_locks=True)
 def home():
     user = g.current_user
 
@@ -240,8 +248,7 @@ def update_profile_avatar():
         )
 
     saved_name = f"user_{user.id}_{uuid4().hex[:12]}.{extension}"
-    destination = _avatar_dir() / saved_name
-    upload.save(destination)
+    get_avatar_storage().put(saved_name, upload.stream, upload.mimetype)
 
     previous_avatar = user.avatar_filename
     user.avatar_filename = saved_name
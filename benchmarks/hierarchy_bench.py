@@ -0,0 +1,221 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from flask import g
+from sqlalchemy import insert, text
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+from app.models import Group, Permission, Role, User, UserRole, group_members, utcnow
+from app.security.hierarchy import add_member, create_group, create_role, move
+from app.security.permissions import (
+    compile_permission_table,
+    get_permission_registry,
+    materialize_user_permissions,
+    sync_permissions,
+    user_permission_mask,
+)
+from benchmarks._common import git_commit
+from benchmarks.micro_bench import Benchmark
+
+INSERT_CHUNK = 5000
+
+# What a per-request check costs without the closure tables: walk both hierarchies upwards.
+RECURSIVE_CHECK = text(
+    """
+    WITH RECURSIVE user_groups(id) AS (
+        SELECT group_id FROM group_members WHERE user_id = :user_id
+        UNION
+        SELECT groups.parent_id FROM groups JOIN user_groups ON groups.id = user_groups.id
+        WHERE groups.parent_id IS NOT NULL
+    ),
+    held_roles(id) AS (
+        SELECT role_id FROM group_roles WHERE group_id IN (SELECT id FROM user_groups)
+        UNION
+        SELECT id FROM roles WHERE name = :role
+        UNION
+        SELECT roles.id FROM roles JOIN held_roles ON roles.parent_id = held_roles.id
+    )
+    SELECT permissions.bit FROM role_permissions
+    JOIN permissions ON permissions.id = role_permissions.permission_id
+    WHERE role_permissions.role_id IN (SELECT id FROM held_roles)
+    """
+)
+
+
+def timed(results: dict, name: str, func):
+    started = time.perf_counter()
+    value = func()
+    results[name] = round((time.perf_counter() - started) * 1000, 2)
+    print(f"{name:40} {results[name]:12.2f} ms")
+    return value
+
+
+def build_hierarchies(depth: int) -> tuple[list[Role], list[Group]]:
+    # Worst case for recursive evaluation: one long chain of roles and one of groups. The only
+    # grant sits at the bottom of the role chain and the role is given to the top group.
+    roles = []
+    parent = Role.query.filter_by(name=UserRole.ADMIN.value).one()
+    for level in range(depth):
+        parent = create_role(f"bench_role_{level}", parent=parent)
+        roles.append(parent)
+    roles[-1].permissions.append(Permission.query.filter_by(name="users.unlock").one())
+
+    groups = []
+    parent = None
+    for level in range(depth):
+        parent = create_group(f"bench_group_{level}", parent=parent)
+        groups.append(parent)
+    groups[0].roles.append(roles[0])
+    db.session.commit()
+    return roles, groups
+
+
+def seed_users(count: int, groups: list[Group], member_every: int) -> None:
+    password_hash = User(username="x", email="x@example.com")
+    password_hash.set_password("BenchPass1!")
+    rng = random.Random(44)
+    next_id = (db.session.scalar(db.select(db.func.max(User.id))) or 0) + 1
+    for start in range(0, count, INSERT_CHUNK):
+        ids = range(next_id + start, next_id + min(count, start + INSERT_CHUNK))
+        db.session.execute(
+            insert(User),
+            [
+                {
+                    "id": user_id,
+                    "username": f"h{user_id}",
+                    "email": f"h{user_id}@example.com",
+                    "password_hash": password_hash.password_hash,
+                    "role": UserRole.USER,
+                }
+                for user_id in ids
+            ],
+        )
+        members = [
+            {"group_id": rng.choice(groups).id, "user_id": user_id} for user_id in ids if user_id % member_every == 0
+        ]
+        if members:
+            db.session.execute(insert(group_members), members)
+        db.session.commit()
+
+
+def member_at_level(group: Group) -> User:
+    user_id = db.session.scalar(db.select(group_members.c.user_id).where(group_members.c.group_id == group.id).limit(1))
+    return db.session.get(User, user_id)
+
+
+def bench_checks(benchmark: Benchmark, app, groups: list[Group], rounds: int) -> None:
+    levels = sorted({0, len(groups) // 4, len(groups) // 2, len(groups) - 1})
+    with app.test_request_context("/"):
+        for level in levels:
+            user = member_at_level(groups[level])
+            assert user is not None, level
+
+            benchmark(f"check_materialized[level={level}]", lambda: user_permission_mask(user), rounds=rounds)
+
+            def forget() -> None:
+                g.pop("permission_masks", None)
+
+            # A detached copy, so the fake stale stamp is never flushed by the lookup's autoflush.
+            stale = db.session.get(User, user.id)
+            db.session.expunge(stale)
+            stale.permissions_version = -1
+            benchmark(f"check_stale_lookup[level={level}]", lambda: user_permission_mask(stale), rounds=rounds, setup=forget)
+
+            params = {"user_id": user.id, "role": user.role.value}
+            benchmark(
+                f"check_recursive_cte[level={level}]",
+                lambda: db.session.execute(RECURSIVE_CHECK, params).all(),
+                rounds=max(1, rounds // 10),
+            )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Role/group hierarchy and permission materialization benchmark.")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--depth", type=int, default=64, help="Levels in the role chain and in the group chain.")
+    parser.add_argument("--member-every", type=int, default=10, help="Every Nth user joins a random group.")
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file.")
+    parser.add_argument("--output", default="bench/hierarchy.json")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.TemporaryDirectory()
+    database_url = args.database_url or f"sqlite:///{Path(workdir.name) / 'hierarchy.db'}"
+    app = create_app(
+        TestingConfig,
+        config_overrides={"SQL_PROFILER_ENABLED": False, "SQLALCHEMY_DATABASE_URI": database_url},
+    )
+    benchmark = Benchmark()
+    timings: dict[str, float] = {}
+
+    with app.app_context():
+        db.create_all()
+        sync_permissions()
+        roles, groups = timed(timings, f"build_hierarchies[depth={args.depth}]", lambda: build_hierarchies(args.depth))
+        timed(timings, f"seed_users[{args.users}]", lambda: seed_users(args.users, groups, args.member_every))
+
+        timed(timings, "compile_permission_table", compile_permission_table)
+        timed(timings, "materialize_all[cold]", materialize_user_permissions)
+        timed(timings, "materialize_all[unchanged]", materialize_user_permissions)
+
+        bench_checks(benchmark, app, groups, args.rounds)
+
+        def attach_leaf():
+            create_group("bench_leaf", parent=groups[-1])
+            db.session.commit()
+
+        def move_half():
+            move(groups[len(groups) // 2], None)
+            db.session.commit()
+
+        def join_deepest():
+            add_member(groups[-1], db.session.get(User, 1))
+            db.session.commit()
+
+        timed(timings, "create_group[under deepest]", attach_leaf)
+        timed(timings, "move_subtree[half the chain to root]", move_half)
+        timed(timings, "add_member[deepest group]", join_deepest)
+        timed(timings, "materialize_all[after move]", materialize_user_permissions)
+
+        stale = db.session.scalar(
+            db.select(db.func.count(User.id)).where(
+                User.permissions_version != get_permission_registry().table().version
+            )
+        )
+        assert stale == 0, stale
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "users": args.users,
+            "depth": args.depth,
+            "member_every": args.member_every,
+            "database": database_url.split(":", 1)[0],
+        },
+        "timings_ms": timings,
+        "cases": benchmark.results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nWrote {output}")
+    workdir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,404 @@
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import requests
+from passlib.hash import argon2
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app
+from benchmarks._common import git_commit, percentile
+from app.extensions import db
+from app.models import User, UserRole, utcnow
+from app.security.permissions import materialize_user_permissions, sync_permissions
+from app.storage import LocalAvatarStorage
+
+BENCH_PASSWORD = "BenchPass1!"
+CSRF_PATTERN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+CAPTCHA_QUESTION_PATTERN = re.compile(r"What is (\d+) ([+-]) (\d+)\?")
+CAPTCHA_TOKEN_PATTERN = re.compile(r'name="captcha_token" value="([^"]+)"')
+SERVER_TIMING_PATTERN = re.compile(r"([\w.-]+)(?:;[^,]*?)?;dur=([\d.]+)")
+FAKE_PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 2048
+SCENARIOS = (
+    "login_success",
+    "login_fail",
+    "login_locked",
+    "user_home",
+    "user_directory",
+    "admin_dashboard",
+    "avatar_upload",
+)
+
+
+def _bench_username(index: int) -> str:
+    return f"bench_{index}"
+
+
+def _bench_email(index: int) -> str:
+    return f"bench_{index}@bench.example.com"
+
+
+def seed_users(app, count: int, locked: int, reduced_kdf: bool, chunk_size: int = 5000) -> None:
+    hasher = argon2.using(rounds=1, memory_cost=1024, parallelism=1) if reduced_kdf else argon2
+    # Every seeded account shares one password, so hash it once instead of N times.
+    password_hash = hasher.hash(BENCH_PASSWORD)
+    locked_until = utcnow() + timedelta(days=1)
+
+    with app.app_context():
+        db.create_all()
+        sync_permissions()
+        if not User.query.filter_by(username="bench_admin").first():
+            db.session.execute(
+                db.insert(User),
+                [
+                    {
+                        "username": "bench_admin",
+                        "email": "bench_admin@bench.example.com",
+                        "password_hash": password_hash,
+                        "role": UserRole.ADMIN,
+                    }
+                ],
+            )
+            db.session.commit()
+
+        existing = User.query.filter(
+            User.email.like("bench\\_%@bench.example.com", escape="\\"),
+            User.username != "bench_admin",
+        ).count()
+        if existing >= count:
+            print(f"[seed] reusing {existing} existing benchmark users")
+            return
+
+        started = time.perf_counter()
+        for offset in range(existing, count, chunk_size):
+            rows = [
+                {
+                    "username": _bench_username(index),
+                    "email": _bench_email(index),
+                    "password_hash": password_hash,
+                    "role": UserRole.USER,
+                    "locked_until": locked_until if index < locked else None,
+                }
+                for index in range(offset, min(offset + chunk_size, count))
+            ]
+            db.session.execute(db.insert(User), rows)
+            db.session.commit()
+        # Core inserts skip the ORM stamp, so store masks up front like a deploy would.
+        materialize_user_permissions()
+        print(f"[seed] inserted {count - existing} users in {time.perf_counter() - started:.1f}s")
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs) -> None:
+        pass
+
+
+class BenchClient:
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def _csrf(self, path: str) -> str:
+        response = self.session.get(f"{self.base_url}{path}")
+        match = CSRF_PATTERN.search(response.text)
+        return match.group(1) if match else ""
+
+    def _solve_captcha(self, page: str) -> dict:
+        # The math challenge is a signed token in the form, so solve it from the page itself.
+        question = CAPTCHA_QUESTION_PATTERN.search(page)
+        token = CAPTCHA_TOKEN_PATTERN.search(page)
+        if not question or not token:
+            return {}
+        left, operator, right = question.groups()
+        answer = int(left) + int(right) if operator == "+" else int(left) - int(right)
+        return {"captcha_token": token.group(1), "captcha_answer": str(answer)}
+
+    def login(self, email: str, password: str) -> requests.Response:
+        page = self.session.get(f"{self.base_url}/login").text
+        match = CSRF_PATTERN.search(page)
+        return self.session.post(
+            f"{self.base_url}/login",
+            data={
+                "csrf_token": match.group(1) if match else "",
+                "email": email,
+                "password": password,
+                **self._solve_captcha(page),
+            },
+            allow_redirects=False,
+        )
+
+    def login_until_admitted(self, email: str, password: str) -> requests.Response:
+        # Scenario setup must end up logged in even when the server sheds logins.
+        while True:
+            response = self.login(email, password)
+            if response.status_code != 503:
+                return response
+            time.sleep(float(response.headers.get("Retry-After", 1)))
+
+    def logout(self) -> None:
+        self.session.cookies.clear()
+
+    def get(self, path: str) -> requests.Response:
+        return self.session.get(f"{self.base_url}{path}", allow_redirects=False)
+
+    def upload_avatar(self) -> requests.Response:
+        csrf_token = self._csrf("/profile")
+        return self.session.post(
+            f"{self.base_url}/profile/avatar",
+            data={"csrf_token": csrf_token},
+            files={"avatar": ("avatar.png", io.BytesIO(FAKE_PNG), "image/png")},
+            allow_redirects=False,
+        )
+
+
+def parse_server_timing(header: str) -> dict[str, float]:
+    return {name: float(duration) for name, duration in SERVER_TIMING_PATTERN.findall(header or "")}
+
+
+def summarize_phases(phases: dict[str, list[float]]) -> dict:
+    summary = {}
+    for name, durations in sorted(phases.items()):
+        ordered = sorted(durations)
+        summary[name] = {
+            "count": len(ordered),
+            "mean_ms": round(statistics.fmean(ordered), 2),
+            "p50_ms": round(percentile(ordered, 0.50), 2),
+            "p95_ms": round(percentile(ordered, 0.95), 2),
+        }
+    return summary
+
+
+def summarize(
+    latencies: list[float],
+    statuses: dict[int, int],
+    errors: int,
+    elapsed: float,
+    phases: dict[str, list[float]] | None = None,
+) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "shed": statuses.get(503, 0),
+        # Server-side phase durations from the Server-Timing header (SERVER_TIMING_ENABLED).
+        "server_timing": summarize_phases(phases or {}),
+    }
+
+
+def run_scenario(name: str, args) -> dict:
+    expected = {
+        "login_success": {302},
+        "login_fail": {401},
+        "login_locked": {423},
+        "user_home": {200},
+        "user_directory": {200},
+        "admin_dashboard": {200},
+        "avatar_upload": {302},
+    }[name]
+    unlocked_start = args.locked
+    pool_size = max(args.users - unlocked_start, 1)
+
+    def prepare(worker: int) -> BenchClient:
+        client = BenchClient(args.base_url)
+        if name == "admin_dashboard":
+            client.login_until_admitted("bench_admin@bench.example.com", BENCH_PASSWORD)
+        elif name in {"user_home", "user_directory", "avatar_upload"}:
+            client.login_until_admitted(_bench_email(unlocked_start + worker % pool_size), BENCH_PASSWORD)
+        return client
+
+    def one_request(client: BenchClient, sequence: int) -> requests.Response:
+        if name == "login_success":
+            response = client.login(_bench_email(unlocked_start + sequence % pool_size), BENCH_PASSWORD)
+            client.logout()
+            return response
+        if name == "login_fail":
+            # Spread failures across accounts so the lockout threshold is not reached.
+            index = unlocked_start + (sequence * 7919) % pool_size
+            return client.login(_bench_email(index), "WrongPass1!")
+        if name == "login_locked":
+            return client.login(_bench_email(sequence % max(args.locked, 1)), BENCH_PASSWORD)
+        if name == "user_home":
+            return client.get("/home")
+        if name == "user_directory":
+            return client.get("/directory")
+        if name == "admin_dashboard":
+            return client.get("/admin/dashboard")
+        return client.upload_avatar()
+
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    phases: dict[str, list[float]] = {}
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def worker(worker_id: int) -> None:
+        nonlocal errors
+        client = prepare(worker_id)
+        local_latencies = []
+        local_statuses: dict[int, int] = {}
+        local_phases: dict[str, list[float]] = {}
+        local_errors = 0
+        while True:
+            with lock:
+                sequence = next(counter, None)
+            if sequence is None:
+                break
+            started = time.perf_counter()
+            try:
+                response = one_request(client, sequence)
+                status = response.status_code
+                for phase, duration in parse_server_timing(response.headers.get("Server-Timing")).items():
+                    local_phases.setdefault(phase, []).append(duration)
+            except requests.RequestException:
+                status = 0
+            local_latencies.append(time.perf_counter() - started)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            if status not in expected and status != 503:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+            errors += local_errors
+            for phase, durations in local_phases.items():
+                phases.setdefault(phase, []).extend(durations)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(args.concurrency)))
+    return summarize(latencies, statuses, errors, time.perf_counter() - started, phases)
+
+
+def compare(results: dict, baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nComparison against {baseline_path} ({baseline['meta'].get('commit')}):")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+            before, after = previous[key], current[key]
+            change = ((after - before) / before * 100) if before else 0.0
+            print(f"  {name:16} {key:7} {before:10.2f} -> {after:10.2f} ({change:+.1f}%)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for auth, user and admin flows.")
+    parser.add_argument("--users", type=int, default=1000, help="Number of users to seed (e.g. 1000, 100000, 1000000).")
+    parser.add_argument("--locked", type=int, default=50, help="How many seeded users start locked out.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file.")
+    parser.add_argument("--url", default=None, help="Target an already running server instead of the built-in one.")
+    parser.add_argument("--reduced-kdf", action="store_true", help="Seed with cheap Argon2 parameters.")
+    parser.add_argument(
+        "--load-shed",
+        action="store_true",
+        help="Keep load shedding on in the built-in server; shed requests (503) are reported, not counted as errors.",
+    )
+    parser.add_argument("--output", default="bench/results.json")
+    parser.add_argument("--compare", default=None, help="Baseline JSON file to diff against.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    database_url = args.database_url or os.getenv("BENCH_DATABASE_URL")
+    if not database_url:
+        database_url = f"sqlite:///{Path(tempfile.gettempdir()) / 'secure_login_bench.sqlite3'}"
+
+    app = create_app(
+        config_overrides={
+            "SQLALCHEMY_DATABASE_URI": database_url,
+            "TURNSTILE_ENABLED": False,
+            "METRICS_ENABLED": True,
+            "SERVER_TIMING_ENABLED": True,
+            # The built-in server is one process; per-worker limits would cap it at a few logins.
+            "LOAD_SHED_ENABLED": args.load_shed,
+        }
+    )
+    seed_users(app, args.users, args.locked, args.reduced_kdf)
+    # Keep benchmark uploads out of the real static folder.
+    app.extensions["avatar_storage"] = LocalAvatarStorage(
+        Path(tempfile.mkdtemp(prefix="bench_avatars_")), app.config["AVATAR_UPLOAD_SUBDIR"]
+    )
+
+    server = None
+    if args.url:
+        args.base_url = args.url
+        server_kind = "external"
+    else:
+        server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=_QuietRequestHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        args.base_url = f"http://127.0.0.1:{server.server_port}"
+        server_kind = "werkzeug-threaded"
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": utcnow().isoformat() + "Z",
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "server": server_kind,
+            "base_url": args.base_url,
+            "python": platform.python_version(),
+            "database": database_url.split("://", 1)[0],
+        },
+        "scenarios": {},
+    }
+
+    try:
+        for name in [item.strip() for item in args.scenarios.split(",") if item.strip()]:
+            if name not in SCENARIOS:
+                print(f"Unknown scenario: {name}", file=sys.stderr)
+                return 2
+            summary = run_scenario(name, args)
+            results["scenarios"][name] = summary
+            print(
+                f"{name:16} {summary['rps']:8.1f} req/s  p50 {summary['p50_ms']:8.2f} ms  "
+                f"p95 {summary['p95_ms']:8.2f} ms  p99 {summary['p99_ms']:8.2f} ms  errors {summary['errors']}  shed {summary['shed']}"
+            )
+            for phase, timing in summary["server_timing"].items():
+                print(f"{'':16}   {phase:20} p50 {timing['p50_ms']:8.2f} ms  p95 {timing['p95_ms']:8.2f} ms")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        compare(results, Path(args.compare))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
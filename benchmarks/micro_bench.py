@@ -0,0 +1,209 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from flask import g
+from flask_jwt_extended import create_access_token, decode_token
+from passlib.hash import argon2
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+from app.models import User, UserRole, utcnow
+from app.security.audit import record_audit_event
+from app.security.authz import attach_current_user
+from app.security.captcha import generate_math_challenge, verify_math_challenge
+from app.security.lockout import is_account_locked, record_failed_attempt
+from benchmarks._common import git_commit, percentile
+
+PASSWORD = "BenchPass1!"
+
+
+class Benchmark:
+    def __init__(self, rounds_scale: float = 1.0):
+        self.rounds_scale = rounds_scale
+        self.results: dict[str, dict] = {}
+
+    def __call__(
+        self,
+        name: str,
+        func: Callable[[], object],
+        rounds: int = 1000,
+        warmup: int = 10,
+        setup: Callable[[], None] | None = None,
+    ) -> dict:
+        rounds = max(1, int(rounds * self.rounds_scale))
+        for _ in range(warmup):
+            if setup:
+                setup()
+            func()
+
+        timings = []
+        for _ in range(rounds):
+            if setup:
+                setup()
+            started = time.perf_counter_ns()
+            func()
+            timings.append(time.perf_counter_ns() - started)
+
+        # Allocation pass runs separately so tracing overhead does not skew wall time.
+        alloc_rounds = min(rounds, 200)
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        for _ in range(alloc_rounds):
+            if setup:
+                setup()
+            func()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        diff = after.compare_to(before, "filename")
+        allocated = sum(stat.size_diff for stat in diff if stat.size_diff > 0)
+        blocks = sum(stat.count_diff for stat in diff if stat.count_diff > 0)
+
+        ordered = sorted(timings)
+        result = {
+            "rounds": rounds,
+            "min_us": round(ordered[0] / 1000, 3),
+            "mean_us": round(statistics.fmean(ordered) / 1000, 3),
+            "median_us": round(percentile(ordered, 0.5) / 1000, 3),
+            "p95_us": round(percentile(ordered, 0.95) / 1000, 3),
+            "stddev_us": round(statistics.pstdev(ordered) / 1000, 3),
+            "ops_per_s": round(1e9 / statistics.fmean(ordered), 1),
+            "retained_bytes_per_call": round(allocated / alloc_rounds, 1),
+            "retained_blocks_per_call": round(blocks / alloc_rounds, 2),
+            "peak_traced_bytes": peak,
+        }
+        self.results[name] = result
+        print(
+            f"{name:32} mean {result['mean_us']:12.2f} us  p95 {result['p95_us']:12.2f} us  "
+            f"{result['retained_bytes_per_call']:10.1f} B/call  peak {peak:9d} B"
+        )
+        return result
+
+
+def bench_passwords(benchmark: Benchmark) -> None:
+    cases = {"configured": argon2, "reduced": argon2.using(rounds=1, memory_cost=1024, parallelism=1)}
+    for label, hasher in cases.items():
+        password_hash = hasher.hash(PASSWORD)
+        user = User(username="bench", email="bench@example.com", password_hash=password_hash)
+        benchmark(f"argon2_hash[{label}]", lambda: hasher.hash(PASSWORD), rounds=20, warmup=2)
+        benchmark(f"argon2_verify[{label}]", lambda: hasher.verify(PASSWORD, user.password_hash), rounds=20, warmup=2)
+
+    user = User(username="bench", email="bench@example.com")
+    benchmark("User.set_password", lambda: user.set_password(PASSWORD), rounds=20, warmup=2)
+    benchmark("User.verify_password", lambda: user.verify_password(PASSWORD), rounds=20, warmup=2)
+
+
+def bench_lockout(benchmark: Benchmark, config: dict) -> None:
+    user = User(username="bench", email="bench@example.com", failed_attempts=0)
+
+    def reset() -> None:
+        user.clear_lockout()
+
+    benchmark("record_failed_attempt", lambda: record_failed_attempt(user, config), rounds=20000, setup=reset)
+    benchmark("is_account_locked[unlocked]", lambda: is_account_locked(user), rounds=20000, setup=reset)
+
+    def lock() -> None:
+        user.locked_until = utcnow() + timedelta(minutes=30)
+
+    benchmark("is_account_locked[locked]", lambda: is_account_locked(user), rounds=20000, setup=lock)
+
+
+def bench_captcha(benchmark: Benchmark, app) -> None:
+    with app.test_request_context("/login"):
+        benchmark("generate_math_challenge", lambda: generate_math_challenge("login"), rounds=5000)
+
+        challenges = []
+
+        def prepare() -> None:
+            challenges.append(generate_math_challenge("login"))
+
+        benchmark(
+            "verify_math_challenge",
+            lambda: verify_math_challenge("login", challenges[-1].token, "0"),
+            rounds=5000,
+            setup=prepare,
+        )
+
+
+def bench_jwt_and_audit(benchmark: Benchmark, app) -> None:
+    user = User(username="bench_jwt", email="bench_jwt@example.com", role=UserRole.USER)
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+
+    with app.test_request_context("/login"):
+        claims = {"role": user.role.value}
+        benchmark("jwt_create", lambda: create_access_token(identity=str(user.id), additional_claims=claims), rounds=5000)
+        token = create_access_token(identity=str(user.id), additional_claims=claims)
+        benchmark("jwt_decode", lambda: decode_token(token), rounds=5000)
+
+    cookie_name = app.config.get("JWT_ACCESS_COOKIE_NAME", "access_token_cookie")
+    with app.test_request_context("/home", headers={"Cookie": f"{cookie_name}={token}"}):
+        def attach() -> None:
+            attach_current_user()
+            assert g.current_user is not None
+
+        benchmark("attach_current_user", attach, rounds=2000)
+
+        def discard_pending() -> None:
+            db.session.expunge_all()
+
+        benchmark("record_audit_event", lambda: record_audit_event("bench", "success", user), rounds=5000, setup=discard_pending)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for app/security primitives.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the number of rounds per case.")
+    parser.add_argument("--output", default="bench/micro.json")
+    parser.add_argument("--compare", default=None, help="Baseline JSON file to diff against.")
+    args = parser.parse_args(argv)
+
+    app = create_app(TestingConfig, config_overrides={"SQL_PROFILER_ENABLED": False})
+    benchmark = Benchmark(args.scale)
+    with app.app_context():
+        db.create_all()
+        bench_passwords(benchmark)
+        bench_lockout(benchmark, app.config)
+        bench_captcha(benchmark, app)
+        bench_jwt_and_audit(benchmark, app)
+
+    results = {
+        "meta": {"commit": git_commit(), "timestamp": utcnow().isoformat() + "Z", "python": platform.python_version()},
+        "cases": benchmark.results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        print(f"\nComparison against {args.compare} ({baseline['meta'].get('commit')}):")
+        for name, current in results["cases"].items():
+            previous = baseline.get("cases", {}).get(name)
+            if not previous:
+                continue
+            for key in ("mean_us", "retained_bytes_per_call"):
+                before, after = previous[key], current[key]
+                change = ((after - before) / before * 100) if before else 0.0
+                print(f"  {name:32} {key:24} {before:12.2f} -> {after:12.2f} ({change:+.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
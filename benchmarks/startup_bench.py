@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks._common import git_commit, percentile
+
+MODES = {
+    "cold": {"TEMPLATE_BYTECODE_CACHE_ENABLED": False, "TEMPLATE_WARMUP_ON_STARTUP": False},
+    "bytecode_cache": {"TEMPLATE_BYTECODE_CACHE_ENABLED": True, "TEMPLATE_WARMUP_ON_STARTUP": False},
+    "bytecode_cache+warmup": {"TEMPLATE_BYTECODE_CACHE_ENABLED": True, "TEMPLATE_WARMUP_ON_STARTUP": True},
+}
+FIRST_PAGES = ("/login", "/register")
+
+
+def child(mode: str, cache_dir: str) -> None:
+    # Runs in a fresh interpreter so every sample pays the real cold-start cost.
+    started = time.perf_counter()
+    from app import create_app
+    from app.config import TestingConfig
+
+    imported = time.perf_counter()
+    app = create_app(
+        TestingConfig,
+        config_overrides={
+            "SQL_PROFILER_ENABLED": False,
+            "TEMPLATE_BYTECODE_CACHE_DIR": cache_dir,
+            **MODES[mode],
+        },
+    )
+    created = time.perf_counter()
+
+    client = app.test_client()
+    first_requests = {}
+    for path in FIRST_PAGES:
+        request_started = time.perf_counter()
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+        first_requests[path] = (time.perf_counter() - request_started) * 1000
+
+    print(
+        json.dumps(
+            {
+                "import_ms": (imported - started) * 1000,
+                "create_app_ms": (created - imported) * 1000,
+                "first_requests_ms": first_requests,
+                "ready_to_first_response_ms": (time.perf_counter() - started) * 1000,
+            }
+        )
+    )
+
+
+def _run_child(mode: str, cache_dir: str) -> dict:
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.startup_bench", "--child", mode, "--cache-dir", cache_dir],
+        cwd=ROOT_DIR,
+        env={**os.environ, "FLASK_ENV": "testing"},
+        text=True,
+    )
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(ordered), 2),
+        "median_ms": round(percentile(ordered, 0.5), 2),
+        "p95_ms": round(percentile(ordered, 0.95), 2),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start latency with and without template caching.")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh processes per mode.")
+    parser.add_argument("--output", default="bench/startup.json")
+    parser.add_argument("--child", choices=sorted(MODES), help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.cache_dir)
+        return 0
+
+    cache_dir = tempfile.mkdtemp(prefix="jinja-bench-")
+    results = {}
+    try:
+        # Populate the shared cache once, like `flask templates compile` in a deploy step.
+        _run_child("bytecode_cache+warmup", cache_dir)
+        for mode in MODES:
+            samples = [_run_child(mode, cache_dir) for _ in range(args.runs)]
+            results[mode] = {
+                "create_app": _summarize([sample["create_app_ms"] for sample in samples]),
+                "first_request": {
+                    path: _summarize([sample["first_requests_ms"][path] for sample in samples]) for path in FIRST_PAGES
+                },
+                "ready_to_first_response": _summarize([sample["ready_to_first_response_ms"] for sample in samples]),
+            }
+            first = " ".join(
+                f"{path} {results[mode]['first_request'][path]['median_ms']:7.2f} ms" for path in FIRST_PAGES
+            )
+            print(
+                f"{mode:24} create_app {results[mode]['create_app']['median_ms']:8.2f} ms  first {first}  "
+                f"total {results[mode]['ready_to_first_response']['median_ms']:8.2f} ms"
+            )
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    report = {
+        "meta": {"commit": git_commit(), "runs": args.runs, "python": platform.python_version()},
+        "modes": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nWrote {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
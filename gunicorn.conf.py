@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+
+
+def _int_env(name: str, default: int) -> int:
+    value = os.getenv(name, "").strip()
+    return int(value) if value else default
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+# Argon2 verification is CPU-bound, so one process per core keeps every core busy
+# without oversubscribing; a few threads per worker cover the I/O-bound page views.
+cores = _cpu_count()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = _int_env("WEB_CONCURRENCY", max(2, cores))
+threads = _int_env("GUNICORN_THREADS", 4)
+worker_class = "gthread" if threads > 1 else "sync"
+
+preload_app = True
+timeout = _int_env("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _int_env("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _int_env("GUNICORN_KEEPALIVE", 5)
+max_requests = _int_env("GUNICORN_MAX_REQUESTS", 5000)
+max_requests_jitter = _int_env("GUNICORN_MAX_REQUESTS_JITTER", 500)
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = os.getenv("GUNICORN_ERROR_LOG", "-")
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+proc_name = "secure-login-rbac"
+
+
+def when_ready(server):
+    # app.models loads the Argon2 backend lazily; load it once in the master so every
+    # forked worker shares it instead of importing it on its first login.
+    from app.models import password_hasher
+
+    password_hasher().get_backend()
+
+
+def post_fork(server, worker):
+    # The app is imported once in the master (preload_app) and shared copy-on-write;
+    # pooled DB connections must not be shared across processes, so drop them here.
+    from app.database import warm_db_pool
+    from app.extensions import db
+    from run import app
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    if "db_replica_engine" in app.extensions:
+        app.extensions["db_replica_engine"].dispose(close=False)
+
+    if app.config.get("DB_POOL_WARM_ON_STARTUP"):
+        warm_db_pool(app)
@@ -33,13 +33,53 @@ echo "[INFO] DATABASE_URL=$DATABASE_URL"
 
 source .venv/bin/activate
 python3 - <<'PY'
+import os
+import re
+import urllib.request
+
 from app import create_app
+from app.database import pool_status, warm_db_pool
 from app.extensions import db
 
 app = create_app()
 with app.app_context():
     db.session.execute(db.text("SELECT 1"))
-print("[OK] SQLAlchemy connection successful")
+    print("[OK] SQLAlchemy connection successful")
+
+    options = app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    print(
+        "[INFO] Pool config: size={} overflow={} timeout={}s recycle={}s pre_ping={}".format(
+            options.get("pool_size"),
+            options.get("max_overflow"),
+            options.get("pool_timeout"),
+            options.get("pool_recycle"),
+            options.get("pool_pre_ping"),
+        )
+    )
+
+    wait_timeout = db.session.execute(db.text("SELECT @@wait_timeout")).scalar()
+    db.session.remove()
+    recycle = options.get("pool_recycle") or -1
+    if recycle < 0 or recycle >= int(wait_timeout):
+        print(f"[WARN] DB_POOL_RECYCLE ({recycle}) should be below MySQL wait_timeout ({wait_timeout})")
+    else:
+        print(f"[OK] Pool recycle below MySQL wait_timeout ({wait_timeout}s)")
+
+warmed = warm_db_pool(app)
+with app.app_context():
+    print(f"[OK] Warmed {warmed} pooled connections: {pool_status()}")
+
+# Live saturation from a running server, e.g. METRICS_URL=http://127.0.0.1:8000/metrics
+metrics_url = os.getenv("METRICS_URL")
+if metrics_url:
+    request = urllib.request.Request(metrics_url)
+    if os.getenv("METRICS_TOKEN"):
+        request.add_header("Authorization", f"Bearer {os.environ['METRICS_TOKEN']}")
+    body = urllib.request.urlopen(request, timeout=5).read().decode()
+    states = dict(re.findall(r'^db_pool_connections\{state="(\w+)"\} (\S+)$', body, re.MULTILINE))
+    saturation = float(states.get("saturation", 0))
+    label = "[WARN]" if saturation >= 0.8 else "[OK]"
+    print(f"{label} Live pool (one worker): checked_out={states.get('checked_out')} overflow={states.get('overflow')} saturation={saturation:.0%}")
 PY
 
 echo "Run next: source .venv/bin/activate && export FLASK_APP=run.py && flask db upgrade"
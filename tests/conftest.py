@@ -1,4 +1,6 @@
+import re
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 
 import pytest
@@ -11,6 +13,8 @@ from app import create_app
 from app.config import TestingConfig
 from app.extensions import db
 from app.models import User, UserRole
+from app.observability.profiler import profile_queries
+from app.security.permissions import compile_on_startup, sync_permissions
 
 
 @pytest.fixture()
@@ -19,6 +23,8 @@ def app():
 
     with flask_app.app_context():
         db.create_all()
+        sync_permissions()
+        compile_on_startup(flask_app)
         yield flask_app
         db.session.remove()
         db.drop_all()
@@ -53,24 +59,26 @@ def make_user(app):
 
 
 @pytest.fixture()
-def get_captcha_answer(client):
-    def _get(scope: str) -> str:
-        with client.session_transaction() as session:
-            return session[f"captcha_{scope}_answer"]
+def solve_captcha():
+    def _solve(client, scope: str) -> dict:
+        page = client.get(f"/{scope}").get_data(as_text=True)
+        left, operator, right = re.search(r"What is (\d+) ([+-]) (\d+)\?", page).groups()
+        answer = int(left) + int(right) if operator == "+" else int(left) - int(right)
+        token = re.search(r'name="captcha_token" value="([^"]+)"', page).group(1)
+        return {"captcha_token": token, "captcha_answer": str(answer)}
 
-    return _get
+    return _solve
 
 
 @pytest.fixture()
-def register_account(client, get_captcha_answer):
+def register_account(client, solve_captcha):
     def _register(
         username: str,
         email: str,
         password: str,
         role: str = "user",
     ):
-        client.get("/register")
-        answer = get_captcha_answer("register")
+        captcha = solve_captcha(client, "register")
         return client.post(
             "/register",
             data={
@@ -78,7 +86,7 @@ def register_account(client, get_captcha_answer):
                 "email": email,
                 "password": password,
                 "role": role,
-                "captcha_answer": answer,
+                **captcha,
             },
             follow_redirects=False,
         )
@@ -87,18 +95,28 @@ def register_account(client, get_captcha_answer):
 
 
 @pytest.fixture()
-def login_account(client, get_captcha_answer):
+def login_account(client, solve_captcha):
     def _login(email: str, password: str):
-        client.get("/login")
-        answer = get_captcha_answer("login")
+        captcha = solve_captcha(client, "login")
         return client.post(
             "/login",
             data={
                 "email": email,
                 "password": password,
-                "captcha_answer": answer,
+                **captcha,
             },
             follow_redirects=False,
         )
 
     return _login
+
+
+@pytest.fixture()
+def query_budget():
+    @contextmanager
+    def _budget(max_queries: int, n_plus_one_threshold: int | None = 3):
+        with profile_queries() as profile:
+            yield profile
+        profile.assert_within(max_queries, n_plus_one_threshold)
+
+    return _budget
@@ -0,0 +1,116 @@
+from sqlalchemy import delete, event, update
+
+from app import bulk_admin
+from app.bulk_admin import apply_bulk_action
+from app.extensions import db
+from app.models import AuditCheckpoint, AuditLog, UserRole
+from app.security.audit import record_audit_events
+from app.security.audit_chain import verify_chain
+
+
+def _seed_events(app, count: int) -> None:
+    with app.test_request_context("/"):
+        record_audit_events((f"event_{index}", "success", None) for index in range(count))
+        db.session.commit()
+
+
+def _verify(app):
+    with app.app_context():
+        return app.test_cli_runner().invoke(args=["audit", "verify", "--workers", "1", "--chunk-rows", "8"])
+
+
+def test_chain_and_checkpoints_verify(app, make_user):
+    app.config["AUDIT_CHECKPOINT_INTERVAL"] = 4
+    make_user(username="chained", email="chained@example.com", password="StrongPass1!")
+    _seed_events(app, 21)
+
+    seqs = db.session.scalars(db.select(AuditLog.seq).order_by(AuditLog.seq)).all()
+    assert seqs == list(range(1, len(seqs) + 1))
+    assert db.session.scalar(db.select(db.func.count(AuditCheckpoint.id))) == 5
+
+    report = verify_chain(chunk_size=8)
+    assert report.ok, report.errors
+    assert report.rows == 21 and report.checkpoints == 5 and report.chunks == 3
+
+    result = _verify(app)
+    assert result.exit_code == 0, result.output
+    assert "Checked 21 rows and 5 checkpoints in 3 chunks" in result.output
+
+
+def test_edits_deletes_and_detached_rows_are_reported(app, make_user):
+    app.config["AUDIT_CHECKPOINT_INTERVAL"] = 4
+    user = make_user(username="tampered", email="tampered@example.com", password="StrongPass1!")
+    _seed_events(app, 10)
+    with app.test_request_context("/"):
+        record_audit_events([("login", "failure", user.id)])
+        db.session.commit()
+
+    db.session.execute(update(AuditLog).where(AuditLog.seq == 3).values(status="failure"))
+    db.session.execute(delete(AuditLog).where(AuditLog.seq == 6))
+    db.session.execute(update(AuditLog).where(AuditLog.user_id == user.id).values(user_id=None))
+    db.session.commit()
+
+    result = _verify(app)
+    assert result.exit_code != 0
+    assert "seq 3: hash mismatch" in result.output
+    assert "seq 6-6: rows missing" in result.output
+    assert "checkpoint 8: Merkle root mismatch" in result.output
+    assert f"user {user.id}: audit rows detached without a compensating event" in result.output
+
+
+def test_deleting_users_keeps_the_chain_valid(app, make_user, login_account, client):
+    make_user(username="chain_admin", email="chain_admin@example.com", password="StrongPass1!", role=UserRole.ADMIN)
+    first = make_user(username="leaving_one", email="leaving_one@example.com", password="StrongPass1!")
+    second = make_user(username="leaving_two", email="leaving_two@example.com", password="StrongPass1!")
+    with app.test_request_context("/"):
+        record_audit_events([("login", "success", first.id), ("login", "success", second.id)])
+        db.session.commit()
+
+    login_account("chain_admin@example.com", "StrongPass1!")
+    assert client.post(f"/admin/users/{first.id}/delete").status_code == 302
+    bulk = client.post("/admin/users/bulk", data={"action": "delete", "user_ids": [str(second.id)]})
+    assert bulk.status_code == 302
+
+    detached = db.session.scalars(db.select(AuditLog.user_ref).where(AuditLog.user_id.is_(None))).all()
+    assert {first.id, second.id} <= set(detached)
+    result = _verify(app)
+    assert result.exit_code == 0, result.output
+
+
+def test_bulk_delete_takes_the_chain_lock_once_just_before_commit(app, make_user, monkeypatch):
+    # SQLite serializes every writer, so instead of racing a login this checks that nothing touches
+    # the chain head while the chunks run: the lock every audited write waits on is taken last.
+    users = [
+        make_user(username=f"bulk_gone_{index}", email=f"bulk_gone_{index}@example.com", password="x")
+        for index in range(5)
+    ]
+    with app.test_request_context("/"):
+        record_audit_events([("login", "success", user.id) for user in users])
+        db.session.commit()
+    monkeypatch.setattr(bulk_admin, "ID_CHUNK_SIZE", 2)
+
+    statements = []
+    null_rows = bulk_admin.null_user_audit_rows
+
+    def null_chunk(user_ids):
+        assert not any("audit_chain_head" in statement for statement in statements)
+        null_rows(user_ids)
+
+    monkeypatch.setattr(bulk_admin, "null_user_audit_rows", null_chunk)
+
+    def capture(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        with app.test_request_context("/"):
+            result = apply_bulk_action("delete", user_ids=[user.id for user in users])
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert result.changed == 5
+    head = [index for index, statement in enumerate(statements) if statement.startswith("UPDATE audit_chain_head")]
+    deletes = [index for index, statement in enumerate(statements) if statement.startswith("DELETE FROM users")]
+    assert len(deletes) == 3
+    assert head and head[0] > deletes[-1]
+    assert _verify(app).exit_code == 0
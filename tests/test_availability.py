@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from app.availability import get_availability_index
+from app.extensions import db
+from app.models import User, UserRole
+from app.observability.metrics import AVAILABILITY_CHECKS, AVAILABILITY_FILTER_REBUILDS
+
+
+def _check(client, **params):
+    return client.get("/register/availability", query_string=params)
+
+
+def test_misses_are_answered_from_the_filter(app, client, make_user, query_budget):
+    make_user(username="TakenName", email="taken@example.com", password="StrongPass1!")
+
+    assert _check(client, username="takenname").get_json() == {"field": "username", "valid": True, "available": False}
+    assert _check(client, email="TAKEN@example.com").get_json()["available"] is False
+
+    misses = AVAILABILITY_CHECKS.value("username", "filter_miss")
+    with query_budget(max_queries=0):
+        response = _check(client, username="fresh_name")
+    assert response.get_json()["available"] is True
+    assert response.headers["Cache-Control"] == "no-store"
+    assert AVAILABILITY_CHECKS.value("username", "filter_miss") == misses + 1
+
+    assert _check(client, username="a b").status_code == 400
+    assert _check(client).status_code == 400
+
+
+def test_filter_follows_registrations_renames_and_inserts(app, client, register_account, login_account):
+    index = get_availability_index(app)
+    index.sync_seconds = 0
+    assert _check(client, username="newcomer").get_json()["available"] is True
+    bloom = index.filter
+    rebuilds = AVAILABILITY_FILTER_REBUILDS.value()
+
+    assert register_account(username="newcomer", email="newcomer@example.com", password="StrongPass1!").status_code == 302
+    assert _check(client, username="Newcomer").get_json()["available"] is False
+
+    login_account("newcomer@example.com", "StrongPass1!")
+    renamed = client.post(
+        "/profile/details",
+        data={"username": "renamed", "email": "newcomer@example.com", "full_name": "", "bio": ""},
+    )
+    assert renamed.status_code == 302
+    client.post("/logout")
+    assert _check(client, username="renamed").get_json()["available"] is False
+    # The freed name stays in the filter and is answered by the database.
+    assert _check(client, username="newcomer").get_json()["available"] is True
+
+    # Rows written outside this session (another worker, bulk import) are picked up by updated_at.
+    db.session.execute(
+        db.insert(User).values(username="ghost", email="ghost@example.com", password_hash="x", role=UserRole.USER)
+    )
+    db.session.execute(db.update(User).where(User.username == "renamed").values(username="moved"))
+    db.session.commit()
+    assert _check(client, username="ghost").get_json()["available"] is False
+    assert _check(client, username="moved").get_json()["available"] is False
+    assert index.filter is bloom
+    assert AVAILABILITY_FILTER_REBUILDS.value() == rebuilds
+
+    # A transaction that stamped updated_at before rows already seen, then committed late.
+    db.session.execute(
+        db.insert(User).values(
+            username="straggler",
+            email="straggler@example.com",
+            password_hash="x",
+            role=UserRole.USER,
+            updated_at=index.updated_since - timedelta(seconds=30),
+        )
+    )
+    db.session.commit()
+    assert _check(client, username="straggler").get_json()["available"] is False
+
+    index.rebuild_seconds = 0
+    assert _check(client, username="newcomer").get_json()["available"] is True
+    assert index.filter is not bloom
+    assert "username:newcomer" not in index.filter
+
+
+def test_availability_is_rate_limited(app, client):
+    app.config["AVAILABILITY_RATE_LIMIT_PER_MINUTE"] = 3
+    for index in range(3):
+        assert _check(client, username=f"probe_{index}").status_code == 200
+
+    limited = _check(client, username="probe_3")
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "60"
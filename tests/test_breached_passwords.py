@@ -0,0 +1,90 @@
+import hashlib
+
+import pytest
+
+from app.security.breached import BreachedPasswordCorpus, CorpusFormatError, build_corpus
+
+BREACHED = ["Password123!", "Summer2024!!", "Welcome#2025x"]
+
+
+def _dump_lines(passwords: list[str], extra_digests: int = 0) -> list[str]:
+    digests = {hashlib.sha1(password.encode()).hexdigest().upper(): 5 for password in passwords}
+    for index in range(extra_digests):
+        digests[hashlib.sha1(f"filler-{index}".encode()).hexdigest().upper()] = 1 + index % 3
+    return [f"{digest}:{count}\r\n" for digest, count in sorted(digests.items())]
+
+
+@pytest.fixture()
+def corpus_file(tmp_path):
+    path = tmp_path / "breached.bin"
+    build_corpus(_dump_lines(BREACHED, extra_digests=500), str(path), index_bits=8)
+    return path
+
+
+@pytest.mark.parametrize("index_bits", [0, 4, 16])
+def test_build_and_lookup(tmp_path, index_bits):
+    path = tmp_path / f"corpus-{index_bits}.bin"
+    lines = _dump_lines(BREACHED, extra_digests=300)
+    lines.insert(10, lines[10])
+    lines.insert(0, "not a hash\n")
+
+    report = build_corpus(lines, str(path), index_bits=index_bits, min_count=2)
+    corpus = BreachedPasswordCorpus(str(path))
+
+    assert report.duplicates == 1 and report.invalid == 1 and report.below_min_count == 100
+    assert len(corpus) == report.records == 203
+    assert all(corpus.contains(password) for password in BREACHED)
+    assert corpus.contains("filler-1") and not corpus.contains("filler-0")
+    assert corpus.contains("NotInTheDump9$") is False
+
+    with pytest.raises(CorpusFormatError, match="Line 2 is out of order"):
+        build_corpus(list(reversed(lines[1:3])), str(path))
+    assert corpus.contains("Password123!")
+
+
+@pytest.mark.parametrize("content", [b"", b"BRPW", b"NOPE" + bytes(12), "truncated"])
+def test_corrupt_corpus_fails_open(app, client, corpus_file, register_account, content):
+    if content == "truncated":
+        content = corpus_file.read_bytes()[:-7]
+    corpus_file.write_bytes(content)
+    app.config["BREACHED_PASSWORDS_FILE"] = str(corpus_file)
+
+    response = register_account(username="corrupt_corpus", email="corrupt_corpus@example.com", password="Password123!")
+    assert response.status_code == 302
+    assert BreachedPasswordCorpus(str(corpus_file)).contains("Password123!") is None
+
+
+def test_forms_reject_breached_passwords(app, client, corpus_file, register_account, make_user, login_account):
+    app.config["BREACHED_PASSWORDS_FILE"] = str(corpus_file)
+
+    rejected = register_account(username="breached", email="breached@example.com", password="Password123!")
+    assert rejected.status_code == 200
+    assert b"known data breach" in rejected.data
+    accepted = register_account(username="unbreached", email="unbreached@example.com", password="StrongPass1!")
+    assert accepted.status_code == 302
+
+    make_user(username="changer", email="changer@example.com", password="StrongPass1!")
+    login_account("changer@example.com", "StrongPass1!")
+    response = client.post(
+        "/profile/password",
+        data={"current_password": "StrongPass1!", "new_password": "Summer2024!!", "confirm_password": "Summer2024!!"},
+        follow_redirects=True,
+    )
+    assert b"known data breach" in response.data
+
+
+def test_cli_builds_and_checks_corpus(app, tmp_path):
+    source = tmp_path / "dump.txt"
+    source.write_text("".join(_dump_lines(BREACHED)), encoding="utf-8")
+    output = tmp_path / "corpus.bin"
+    app.config["BREACHED_PASSWORDS_FILE"] = str(output)
+    runner = app.test_cli_runner()
+
+    built = runner.invoke(args=["passwords", "build", str(source), "--index-bits", "12"])
+    assert built.exit_code == 0, built.output
+    assert f"Wrote 3 hashes to {output}" in built.output
+
+    found = runner.invoke(args=["passwords", "check", "--password", "Welcome#2025x"])
+    assert "Password is in the corpus of 3 hashes" in found.output
+    missing = runner.invoke(args=["passwords", "check", "--password", "StrongPass1!"])
+    assert "Password is not in the corpus" in missing.output
@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+from app.extensions import db
+from app.models import AuditLog, User, UserRole, utcnow
+from app.security.audit import record_audit_event
+
+
+def test_admin_can_unlock_every_locked_user_and_change_roles_in_bulk(make_user, login_account, client, app):
+    admin = make_user(username="bulk_admin", email="bulk_admin@example.com", password="StrongPass1!", role=UserRole.ADMIN)
+    users = [
+        make_user(username=f"member_{index}", email=f"member_{index}@example.com", password="StrongPass1!")
+        for index in range(4)
+    ]
+    with app.app_context():
+        for user in users[:3]:
+            locked = db.session.get(User, user.id)
+            locked.failed_attempts = 5
+            locked.locked_until = utcnow() + timedelta(minutes=10)
+        db.session.commit()
+
+    login_account("bulk_admin@example.com", "StrongPass1!")
+    dashboard = client.get("/admin/dashboard").get_data(as_text=True)
+    assert 'form="bulkActionForm"' in dashboard
+
+    response = client.post("/admin/users/bulk", data={"action": "unlock", "filter": "locked"}, follow_redirects=True)
+    assert "3 of 3 selected users unlocked." in response.get_data(as_text=True)
+
+    response = client.post(
+        "/admin/users/bulk",
+        data={"action": "role", "value": "admin", "user_ids": [str(users[0].id), str(users[3].id), str(admin.id)]},
+        follow_redirects=True,
+    )
+    assert "2 of 3 selected users updated." in response.get_data(as_text=True)
+
+    with app.app_context():
+        assert User.query.filter(User.locked_until.is_not(None)).count() == 0
+        assert db.session.get(User, users[0].id).failed_attempts == 0
+        assert {user.id for user in User.query.filter_by(role=UserRole.ADMIN)} == {admin.id, users[0].id, users[3].id}
+
+        audits = AuditLog.query.filter(AuditLog.user_id == admin.id, AuditLog.action.like("%_target_%")).all()
+        actions = sorted(log.action for log in audits)
+        assert actions == sorted(
+            [f"unlock_target_{user.id}" for user in users[:3]]
+            + [f"role_change_target_{users[0].id}", f"role_change_target_{users[3].id}"]
+        )
+
+
+def test_bulk_actions_skip_the_actor_and_keep_an_admin(make_user, login_account, client, app):
+    admin = make_user(username="solo_admin", email="solo_admin@example.com", password="StrongPass1!", role=UserRole.ADMIN)
+    member = make_user(username="plain", email="plain@example.com", password="StrongPass1!")
+    login_account("solo_admin@example.com", "StrongPass1!")
+
+    response = client.post("/admin/users/bulk", data={"action": "status", "value": "inactive", "filter": "active"}, follow_redirects=True)
+    page = response.get_data(as_text=True)
+    assert "Your own account was skipped." in page
+    assert "1 of 2 selected users updated." in page
+
+    with app.app_context():
+        assert db.session.get(User, admin.id).is_active is True
+        assert db.session.get(User, member.id).is_active is False
+
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=["users", "bulk", "role", "--value", "user", "--filter", "admins"])
+    assert result.exit_code != 0
+    assert "Cannot demote the last remaining admin." in result.output
+
+    response = client.post("/admin/users/bulk", data={"action": "delete"}, follow_redirects=True)
+    assert "Select at least one user or a filter." in response.get_data(as_text=True)
+
+    with app.app_context():
+        assert db.session.get(User, admin.id).role == UserRole.ADMIN
+
+
+def test_bulk_delete_cli_keeps_audit_history(make_user, app):
+    admin = make_user(username="cli_admin", email="cli_admin@example.com", password="StrongPass1!", role=UserRole.ADMIN)
+    doomed = [
+        make_user(username=f"doomed_{index}", email=f"doomed_{index}@example.com", password="StrongPass1!")
+        for index in range(3)
+    ]
+    with app.app_context():
+        for user in doomed:
+            record_audit_event("login", "success", db.session.get(User, user.id))
+        db.session.commit()
+
+    ids = ",".join(str(user.id) for user in doomed[:2])
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=["users", "bulk", "delete", "--ids", ids, "--actor", "cli_admin@example.com"])
+    assert result.exit_code == 0, result.output
+    assert "delete: 2 matched, 2 changed." in result.output
+
+    with app.app_context():
+        assert {user.username for user in User.query.all()} == {"cli_admin", "doomed_2"}
+        assert AuditLog.query.filter_by(action="login", user_id=None).count() == 2
+        assert AuditLog.query.filter_by(action="login", user_id=doomed[2].id).count() == 1
+        deletes = AuditLog.query.filter(AuditLog.action.like("delete_target_%")).all()
+        assert {log.user_id for log in deletes} == {admin.id}
+        assert len(deletes) == 2
+
+
+def test_bulk_role_changes_cannot_escalate_the_actor(make_user, login_account, client, app):
+    clerk = make_user(username="bulk_clerk", email="bulk_clerk@example.com", password="StrongPass1!")
+    peer = make_user(username="bulk_peer", email="bulk_peer@example.com", password="StrongPass1!")
+    admin = make_user(username="bulk_boss", email="bulk_boss@example.com", password="StrongPass1!", role=UserRole.ADMIN)
+    with app.app_context():
+        runner = app.test_cli_runner()
+        runner.invoke(args=["permissions", "grant", "user", "admin.dashboard"])
+        runner.invoke(args=["permissions", "grant", "user", "users.role"])
+    login_account("bulk_clerk@example.com", "StrongPass1!")
+
+    for data in (
+        {"action": "role", "value": "admin", "user_ids": [str(clerk.id)]},
+        {"action": "role", "value": "admin", "filter": "users"},
+        {"action": "role", "value": "user", "user_ids": [str(admin.id)]},
+    ):
+        response = client.post("/admin/users/bulk", data=data, follow_redirects=True)
+        assert response.status_code == 200
+
+    with app.app_context():
+        assert {user.id: user.role for user in User.query.all()} == {
+            clerk.id: UserRole.USER,
+            peer.id: UserRole.USER,
+            admin.id: UserRole.ADMIN,
+        }
+        result = runner.invoke(
+            args=["users", "bulk", "role", "--value", "admin", "--filter", "users", "--actor", "bulk_clerk@example.com"]
+        )
+    assert result.exit_code != 0
+    assert "only assign roles whose permissions you hold" in result.output
+
+    # An admin still changes other accounts' roles, but never its own.
+    client.post("/logout")
+    login_account("bulk_boss@example.com", "StrongPass1!")
+    response = client.post(
+        "/admin/users/bulk",
+        data={"action": "role", "value": "admin", "user_ids": [str(peer.id), str(admin.id)]},
+        follow_redirects=True,
+    )
+    assert "1 of 2 selected users updated." in response.get_data(as_text=True)
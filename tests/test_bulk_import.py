@@ -0,0 +1,135 @@
+import io
+import json
+
+from sqlalchemy.exc import OperationalError
+
+import app.bulk_import as bulk_import
+from app.extensions import db
+from app.models import AuditLog, User, UserRole
+
+
+def test_admin_can_import_users_from_csv(make_user, login_account, client, app):
+    admin = make_user(
+        username="import_admin",
+        email="import_admin@example.com",
+        password="StrongPass1!",
+        role=UserRole.ADMIN,
+    )
+    make_user(username="existing", email="existing@example.com", password="StrongPass1!")
+    login_account("import_admin@example.com", "StrongPass1!")
+
+    source = "\n".join(
+        [
+            "full_name,username,email,password,role",
+            "Ana Lima,ana_l,Ana@Example.com,StrongPass1!,user",
+            ",ops_admin,ops@example.com,StrongPass1!,admin",
+            ",weak_pw,weak@example.com,short,user",
+            ",ana_l,other@example.com,StrongPass1!,user",
+            ",EXISTING,new_existing@example.com,StrongPass1!,user",
+        ]
+    )
+    response = client.post(
+        "/admin/users/import",
+        data={"source": (io.BytesIO(source.encode()), "people.csv")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert "5 rows processed: 2 created, 3 rejected." in page
+    assert "Password must include" in page
+    assert "Duplicate username in file." in page
+    assert "Username already exists." in page
+
+    with app.app_context():
+        ana = User.query.filter_by(username="ana_l").one()
+        assert ana.email == "ana@example.com"
+        assert ana.full_name == "Ana Lima"
+        assert ana.verify_password("StrongPass1!")
+        assert User.query.filter_by(username="ops_admin").one().role == UserRole.ADMIN
+        audits = AuditLog.query.filter(AuditLog.action.like("admin_create_user_target_%")).all()
+        assert {log.user_id for log in audits} == {admin.id}
+        assert len(audits) == 2
+
+
+def test_web_import_is_capped_and_hashes_in_process(make_user, login_account, client, app, monkeypatch):
+    make_user(username="cap_admin", email="cap_admin@example.com", password="StrongPass1!", role=UserRole.ADMIN)
+    login_account("cap_admin@example.com", "StrongPass1!")
+    app.config["BULK_IMPORT_WEB_MAX_ROWS"] = 2
+    pools = []
+    monkeypatch.setattr(bulk_import, "ProcessPoolExecutor", lambda *args, **kwargs: pools.append(args))
+
+    source = "username,email,password\n" + "".join(
+        f"capped_{index},capped_{index}@example.com,StrongPass1!\n" for index in range(3)
+    )
+    response = client.post(
+        "/admin/users/import",
+        data={"source": (io.BytesIO(source.encode()), "people.csv")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 200
+    assert "Stopped after 2 rows." in response.get_data(as_text=True)
+    assert pools == []
+    with app.app_context():
+        assert User.query.filter(User.username.like("capped_%")).count() == 2
+
+
+def test_import_cli_resumes_from_checkpoint_after_failure(app, tmp_path, monkeypatch):
+    source = tmp_path / "people.ndjson"
+    rows = [
+        {"username": f"bulk_{index}", "email": f"bulk_{index}@example.com", "password": "StrongPass1!"}
+        for index in range(5)
+    ]
+    lines = [json.dumps(row) for row in rows]
+    lines.insert(2, "not json")
+    source.write_text("\n".join(lines) + "\n")
+
+    insert_chunk = bulk_import._insert_chunk
+    calls = []
+
+    def failing_insert(pending, hasher, actor_id):
+        calls.append(len(pending))
+        if len(calls) == 2:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        insert_chunk(pending, hasher, actor_id)
+
+    monkeypatch.setattr(bulk_import, "_insert_chunk", failing_insert)
+    runner = app.test_cli_runner()
+    args = ["users", "import", str(source), "--chunk-size", "2", "--workers", "0"]
+
+    first = runner.invoke(args=args)
+    assert first.exit_code != 0
+    assert "Rerun with --resume" in first.output
+    checkpoint = json.loads((tmp_path / "people.ndjson.checkpoint.json").read_text())
+    assert checkpoint["line"] == 2
+    assert checkpoint["inserted"] == 2
+    with app.app_context():
+        assert User.query.filter(User.username.like("bulk_%")).count() == 2
+
+    second = runner.invoke(args=[*args, "--resume"])
+    assert second.exit_code == 0, second.output
+    assert "Resuming after line 2." in second.output
+
+    with app.app_context():
+        assert User.query.filter(User.username.like("bulk_%")).count() == 5
+    checkpoint = json.loads((tmp_path / "people.ndjson.checkpoint.json").read_text())
+    assert checkpoint == {**checkpoint, "line": 6, "inserted": 5, "failed": 1}
+    errors = (tmp_path / "people.ndjson.errors.csv").read_text().splitlines()
+    assert errors[0] == "line,field,message,username,email"
+    assert errors[1].startswith("3,row,Invalid JSON")
+    assert len(errors) == 2
+
+
+def test_import_hashes_passwords_in_worker_processes(app):
+    stream = io.StringIO(
+        "username,email,password\n"
+        "pool_a,pool_a@example.com,StrongPass1!\n"
+        "pool_b,pool_b@example.com,StrongPass2!\n"
+    )
+
+    report = bulk_import.import_users(stream, "csv", hash_workers=2)
+
+    assert report.inserted == 2
+    assert not report.errors
+    assert db.session.execute(db.select(User).filter_by(username="pool_b")).scalar_one().verify_password("StrongPass2!")
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+import pytest
+from flask import g
+
+from app.extensions import db
+from app.models import Group, Role, User, group_closure, utcnow
+from app.security.hierarchy import HierarchyError, create_group, delete_node, move
+from app.security.permissions import PERMISSION_BITS, get_permission_registry, user_permission_mask
+
+
+def _closure_rows() -> set[tuple[str, str, int]]:
+    names = dict(db.session.execute(db.select(Group.id, Group.name)).all())
+    rows = db.session.execute(db.select(group_closure.c.ancestor_id, group_closure.c.descendant_id, group_closure.c.depth))
+    return {(names[ancestor], names[descendant], depth) for ancestor, descendant, depth in rows}
+
+
+def _walked_closure() -> set[tuple[str, str, int]]:
+    groups = {group.id: group for group in Group.query.all()}
+    rows = set()
+    for group in groups.values():
+        node, depth = group, 0
+        while node is not None:
+            rows.add((node.name, group.name, depth))
+            node, depth = groups.get(node.parent_id), depth + 1
+    return rows
+
+
+def test_closure_rows_follow_inserts_moves_and_deletes(app):
+    with app.app_context():
+        org = create_group("org")
+        eng = create_group("eng", parent=org)
+        backend = create_group("backend", parent=eng)
+        create_group("storage", parent=backend)
+        create_group("sales", parent=org)
+        db.session.commit()
+        assert ("org", "storage", 3) in _closure_rows()
+        assert _closure_rows() == _walked_closure()
+
+        with pytest.raises(HierarchyError):
+            move(eng, Group.query.filter_by(name="storage").one())
+
+        move(backend, Group.query.filter_by(name="sales").one())
+        db.session.commit()
+        assert ("sales", "storage", 2) in _closure_rows()
+        assert ("eng", "storage", 2) not in _closure_rows()
+        assert _closure_rows() == _walked_closure()
+
+        delete_node(Group.query.filter_by(name="sales").one())
+        db.session.commit()
+        assert Group.query.filter_by(name="backend").one().parent_id == org.id
+        assert _closure_rows() == _walked_closure()
+
+
+def test_nested_group_and_role_grants_reach_members(make_user, login_account, client, app):
+    member = make_user(username="support_member", email="support_member@example.com", password="StrongPass1!")
+    target = make_user(username="locked_member", email="locked_member@example.com", password="StrongPass1!")
+    with app.app_context():
+        locked = db.session.get(User, target.id)
+        locked.locked_until = utcnow() + timedelta(minutes=10)
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    commands = [
+        ["roles", "create", "support", "--parent", "admin"],
+        ["roles", "create", "auditor", "--parent", "support"],
+        ["permissions", "grant", "auditor", "users.unlock"],
+        ["groups", "create", "engineering"],
+        ["groups", "create", "backend", "--parent", "engineering"],
+        ["groups", "grant", "engineering", "support"],
+        ["groups", "add-member", "backend", "support_member@example.com"],
+    ]
+    for args in commands:
+        with app.app_context():
+            result = runner.invoke(args=args)
+        assert result.exit_code == 0, (args, result.output)
+
+    with app.app_context():
+        stored = db.session.get(User, member.id)
+        assert stored.permissions_version == get_permission_registry().table().version
+        assert stored.permission_mask == PERMISSION_BITS["users.unlock"]
+        assert "admin.dashboard" in runner.invoke(args=["permissions", "show"]).output
+
+    login_account("support_member@example.com", "StrongPass1!")
+    assert client.post(f"/admin/users/{target.id}/unlock").status_code == 302
+    assert client.post(f"/admin/users/{target.id}/delete").status_code == 403
+
+    with app.app_context():
+        runner.invoke(args=["groups", "remove-member", "backend", "support_member@example.com"])
+    # Requests here share the fixture's session, which still holds the member loaded above.
+    db.session.expire_all()
+    assert client.post(f"/admin/users/{target.id}/unlock").status_code == 403
+
+
+def test_stale_masks_are_resolved_per_request_until_materialized(make_user, app):
+    member = make_user(username="stale_member", email="stale_member@example.com", password="StrongPass1!")
+    with app.app_context():
+        runner = app.test_cli_runner()
+        runner.invoke(args=["groups", "create", "helpdesk"])
+        runner.invoke(args=["groups", "add-member", "helpdesk", "stale_member@example.com"])
+
+        # A grant written without the CLI leaves every stored mask one version behind.
+        group = Group.query.filter_by(name="helpdesk").one()
+        group.roles.append(Role.query.filter_by(name="admin").one())
+        db.session.commit()
+
+        user = db.session.get(User, member.id)
+        assert user.permissions_version != get_permission_registry().table().version
+        with app.test_request_context("/"):
+            assert user_permission_mask(user) == sum(PERMISSION_BITS.values())
+            assert g.permission_masks
+
+        result = runner.invoke(args=["permissions", "materialize"])
+        assert "Updated 1 users." in result.output
+        db.session.expire_all()
+        user = db.session.get(User, member.id)
+        assert user.permissions_version == get_permission_registry().table().version
+        assert user.permission_mask == sum(PERMISSION_BITS.values())
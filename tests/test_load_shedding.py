@@ -0,0 +1,96 @@
+import threading
+import time
+
+from app.load_shedding import get_load_shedder, parse_request_start, track_kdf
+from app.observability.metrics import LOAD_SHED_DECISIONS, render_metrics
+
+
+def _shed_count(name: str, reason: str) -> float:
+    return LOAD_SHED_DECISIONS.value(name, reason)
+
+
+def test_auth_limit_sheds_logins_but_not_page_views(app, client, make_user, login_account):
+    make_user(username="busy_user", email="busy_user@example.com", password="StrongPass1!")
+    login_account("busy_user@example.com", "StrongPass1!")
+    shedder = get_load_shedder(app)
+    shedder.limits["auth"] = 1
+    shedder.queue_timeout = 0.01
+    before = _shed_count("auth", "limit")
+
+    # Another thread of this worker holds the only login slot.
+    assert shedder.admit("auth") is None
+    try:
+        response = client.post("/login", data={"email": "busy_user@example.com", "password": "StrongPass1!"})
+        assert response.status_code == 503
+        assert 2 <= int(response.headers["Retry-After"]) <= 4
+        assert client.get("/login").status_code in {200, 302}
+        assert client.get("/home").status_code == 200
+    finally:
+        shedder.release("auth")
+
+    assert _shed_count("auth", "limit") == before + 1
+    assert shedder.in_flight == {"auth": 0, "kdf": 0, "page": 0}
+    assert 'load_shed_decisions_total{class="auth",decision="limit"}' in render_metrics()
+
+
+def test_default_queue_timeout_outlasts_one_argon2_verify(app):
+    shedder = get_load_shedder(app)
+    for _ in range(shedder.limits["auth"]):
+        assert shedder.admit("auth") is None
+
+    # A slot frees up when a verify at the slow end of the Argon2 range finishes.
+    releaser = threading.Timer(0.3, shedder.release, ("auth",))
+    releaser.start()
+    try:
+        assert shedder.admit("auth") is None
+    finally:
+        releaser.join()
+        for _ in range(shedder.limits["auth"]):
+            shedder.release("auth")
+    assert shedder.in_flight["auth"] == 0
+
+
+def test_sustained_queueing_raises_and_lowers_the_shed_level(app, client, make_user, login_account):
+    make_user(username="queued_user", email="queued_user@example.com", password="StrongPass1!")
+    login_account("queued_user@example.com", "StrongPass1!")
+    shedder = get_load_shedder(app)
+    # Start one interval later, so the logins above are in a finished interval.
+    now = [time.monotonic() + shedder.interval]
+    shedder.clock = lambda: now[0]
+
+    def interval(delay: float) -> None:
+        # Closes the current interval and records one request of the next.
+        now[0] += shedder.interval
+        shedder.observe_delay(delay)
+
+    # Even the fastest request of each interval waited longer than the target.
+    for _ in range(2):
+        interval(shedder.target_delay * 4)
+    assert shedder.level == 1
+    assert client.post("/register", data={}).status_code == 503
+    assert client.get("/home").status_code == 200
+
+    for _ in range(3):
+        interval(shedder.target_delay * 4)
+    assert shedder.level == 2
+    assert client.post("/profile/password", data={}).status_code == 503
+    assert client.get("/home").status_code == 200
+
+    for _ in range(2):
+        interval(0.0)
+    assert shedder.level == 0
+    assert client.post("/register", data={}).status_code == 302
+
+
+def test_kdf_work_in_flight_sheds_new_sessions(app, client):
+    shedder = get_load_shedder(app)
+    shedder.max_kdf_in_flight = 1
+    before = _shed_count("auth", "kdf")
+    with track_kdf():
+        assert client.post("/login", data={}).status_code == 503
+    assert _shed_count("auth", "kdf") == before + 1
+    assert client.post("/login", data={}).status_code == 200
+
+    assert abs(parse_request_start("t=1700000000.250", 1700000000.300) - 0.05) < 1e-6
+    assert abs(parse_request_start("t=1700000000250000", 1700000000.300) - 0.05) < 1e-6
+    assert parse_request_start("garbage", 1700000000.3) is None
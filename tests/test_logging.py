@@ -0,0 +1,92 @@
+import json
+import logging
+
+import pytest
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+from app.observability.logs import EventRateLimiter, NonBlockingQueueHandler, get_log_handler
+from app.observability.metrics import LOG_RECORDS_DROPPED, render_metrics
+from app.security.permissions import compile_on_startup, sync_permissions
+
+
+@pytest.fixture()
+def logged_app(tmp_path):
+    flask_app = create_app(
+        TestingConfig,
+        config_overrides={"SERVER_NAME": "localhost.localdomain", "LOG_FILE": str(tmp_path / "app.log")},
+    )
+    with flask_app.app_context():
+        db.create_all()
+        sync_permissions()
+        compile_on_startup(flask_app)
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+def _records(app, tmp_path) -> list[dict]:
+    get_log_handler(app).flush()
+    return [json.loads(line) for line in (tmp_path / "app.log").read_text().splitlines()]
+
+
+def test_security_events_are_json_with_request_and_user_ids(logged_app, tmp_path, solve_captcha):
+    client = logged_app.test_client()
+    captcha = solve_captcha(client, "register")
+    client.post(
+        "/register",
+        data={"username": "logged", "email": "logged@example.com", "password": "StrongPass1!", "role": "user", **captcha},
+    )
+    captcha = solve_captcha(client, "login")
+    response = client.post("/login", data={"email": "logged@example.com", "password": "StrongPass1!", **captcha})
+    assert response.status_code == 302
+    client.get("/home")
+    logout = client.post("/logout")
+
+    records = {record["event"]: record for record in _records(logged_app, tmp_path) if record.get("event")}
+    login = records["login_success"]
+    assert login["logger"] == "app.security" and login["level"] == "INFO"
+    assert login["request_id"] == response.headers["X-Request-ID"]
+    assert login["subject_id"] == records["register"]["subject_id"]
+    assert login["user_id"] is None
+    assert records["logout"]["user_id"] == login["subject_id"]
+    assert records["logout"]["request_id"] == logout.headers["X-Request-ID"]
+    assert 'audit_queue_depth{queue="log"} 0' in render_metrics()
+
+
+def test_repeated_login_failures_are_rate_limited_and_sampled(logged_app, tmp_path):
+    handler = get_log_handler(logged_app)
+    handler.filters = [item for item in handler.filters if not isinstance(item, EventRateLimiter)]
+    handler.addFilter(EventRateLimiter({"login_fail": (5, 60, 10)}))
+    logger = logging.getLogger("app.security")
+    for attempt in range(40):
+        logger.warning("login_fail", extra={"event": "login_fail", "attempt": attempt})
+    logger.info("login_success", extra={"event": "login_success"})
+
+    failures = [record for record in _records(logged_app, tmp_path) if record.get("event") == "login_fail"]
+    assert [record["attempt"] for record in failures] == [0, 1, 2, 3, 4, 14, 24, 34]
+    assert failures[5]["sampled"] == 10 and failures[5]["suppressed"] == 9
+    assert 'log_records_suppressed_total{event="login_fail"} ' in render_metrics()
+
+
+def test_full_queue_drops_records_and_reports_the_overflow(tmp_path, monkeypatch):
+    sink = logging.FileHandler(tmp_path / "overflow.log")
+    handler = NonBlockingQueueHandler([sink], maxsize=3)
+    # No listener yet, as if the writer thread were stuck behind a slow disk.
+    monkeypatch.setattr(handler, "_ensure_listener", lambda: None)
+    logger = logging.Logger("overflow-test")
+    logger.addHandler(handler)
+    before = LOG_RECORDS_DROPPED.value("INFO")
+
+    for index in range(5):
+        logger.info("event %d", index)
+    assert handler.dropped == 2
+    assert LOG_RECORDS_DROPPED.value("INFO") == before + 2
+
+    handler.queue.get_nowait()
+    handler.queue.get_nowait()
+    logger.info("after drain")
+    queued = [handler.queue.get_nowait() for _ in range(handler.queue.qsize())]
+    assert [record.msg for record in queued] == ["event 2", "after drain", "log queue overflow"]
+    assert queued[-1].dropped == 2 and handler.dropped == 0
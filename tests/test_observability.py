@@ -0,0 +1,155 @@
+import threading
+
+import pytest
+
+from app.models import UserRole
+from app.observability.metrics import Counter, Histogram, REGISTRY
+
+
+def test_metrics_endpoint_reports_auth_and_sql_metrics(make_user, login_account, client, app):
+    make_user(
+        username="metrics_user",
+        email="metrics_user@example.com",
+        password="StrongPass1!",
+        role=UserRole.USER,
+    )
+
+    login_account("metrics_user@example.com", "WrongPassword1!")
+    login_account("metrics_user@example.com", "StrongPass1!")
+    client.get("/home")
+    app.config["METRICS_ALLOWED_IPS"] = "127.0.0.1"
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="user.home",method="GET",status="200"}' in body
+    assert 'db_queries_per_request_count{endpoint="user.home"}' in body
+    assert "argon2_verify_duration_seconds_count" in body
+    assert 'auth_lockout_events_total{outcome="failed_attempt"}' in body
+    assert 'captcha_verify_total{provider="math",result="success"}' in body
+
+
+def test_metrics_endpoint_is_restricted_to_internal_addresses(client, app):
+    # Loopback is not trusted by default: a same-host proxy would make every request local.
+    assert client.get("/metrics").status_code == 404
+
+    app.config["METRICS_ALLOWED_IPS"] = "10.0.0.5"
+    assert client.get("/metrics", environ_base={"REMOTE_ADDR": "10.0.0.5"}).status_code == 200
+    assert client.get("/metrics", environ_base={"REMOTE_ADDR": "203.0.113.9"}).status_code == 404
+    proxied = client.get("/metrics", environ_base={"REMOTE_ADDR": "10.0.0.5"}, headers={"X-Forwarded-For": "10.0.0.5"})
+    assert proxied.status_code == 404
+
+    app.config["METRICS_TOKEN"] = "scrape-token"
+    denied = client.get("/metrics", headers={"Authorization": "Bearer wrong"})
+    assert denied.status_code == 404
+
+    allowed = client.get(
+        "/metrics",
+        headers={"Authorization": "Bearer scrape-token"},
+        environ_base={"REMOTE_ADDR": "203.0.113.9"},
+    )
+    assert allowed.status_code == 200
+
+
+def test_per_thread_metric_shards_are_merged():
+    counter = Counter("test_threads_total", "Test counter.", ("kind",))
+    histogram = Histogram("test_threads_seconds", "Test histogram.", buckets=(0.5, 1.0))
+    try:
+        def work():
+            for _ in range(1000):
+                counter.inc("a")
+                histogram.observe(0.75)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.value("a") == 4000
+        assert histogram.count() == 4000
+        rendered = "\n".join(histogram.render())
+        assert 'test_threads_seconds_bucket{le="0.5"} 0' in rendered
+        assert 'test_threads_seconds_bucket{le="1"} 4000' in rendered
+    finally:
+        REGISTRY.remove(counter)
+        REGISTRY.remove(histogram)
+
+
+def test_shards_of_finished_threads_are_folded_into_a_total():
+    counter = Counter("test_short_threads_total", "Test counter.")
+    histogram = Histogram("test_short_threads_seconds", "Test histogram.", buckets=(1.0,))
+    try:
+        def work():
+            counter.inc()
+            histogram.observe(0.5)
+
+        for _ in range(200):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        assert len(counter._shards) <= 64
+        assert counter.value() == 200
+        assert histogram.count() == 200
+        assert not counter._shards and not histogram._shards
+        assert 'test_short_threads_seconds_bucket{le="1"} 200' in "\n".join(histogram.render())
+    finally:
+        REGISTRY.remove(counter)
+        REGISTRY.remove(histogram)
+
+
+def test_query_profiler_reports_query_count_per_request(make_user, login_account, client, app):
+    make_user(
+        username="profiled_user",
+        email="profiled_user@example.com",
+        password="StrongPass1!",
+        role=UserRole.USER,
+    )
+    login_account("profiled_user@example.com", "StrongPass1!")
+
+    response = client.get("/home")
+
+    assert response.status_code == 200
+    assert 0 < int(response.headers["X-Query-Count"]) <= app.config["SQL_QUERY_BUDGETS"]["user.home"]
+
+
+def test_query_budget_fixture_flags_n_plus_one(make_user, app, query_budget):
+    from app.extensions import db
+    from app.models import AuditLog, User
+    from app.observability.profiler import QueryBudgetExceeded
+
+    for index in range(4):
+        user = make_user(
+            username=f"nplus_{index}",
+            email=f"nplus_{index}@example.com",
+            password="StrongPass1!",
+        )
+        db.session.add(AuditLog(user_id=user.id, action="seed", status="success"))
+    db.session.commit()
+    db.session.expire_all()
+
+    with pytest.raises(QueryBudgetExceeded, match="possible N\\+1"):
+        with query_budget(max_queries=20):
+            for user in User.query.all():
+                _ = user.audit_logs
+
+    with query_budget(max_queries=2):
+        User.query.all()
+
+
+def test_strict_profiler_fails_requests_over_budget(make_user, login_account, client, app):
+    from app.observability.profiler import QueryBudgetExceeded
+
+    make_user(
+        username="budget_user",
+        email="budget_user@example.com",
+        password="StrongPass1!",
+    )
+    login_account("budget_user@example.com", "StrongPass1!")
+    app.config["SQL_QUERY_BUDGETS"] = {"user.home": 1}
+
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/home")
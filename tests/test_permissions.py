@@ -0,0 +1,116 @@
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import decode_token
+from sqlalchemy import delete, select
+
+from app.cache import bump_cache_version
+from app.extensions import db
+from app.models import Permission, Role, User, UserRole, role_permissions, utcnow
+from app.security.permissions import (
+    PERMISSION_BITS,
+    PERMISSIONS_VERSION,
+    get_permission_registry,
+    permission_mask,
+    permission_required,
+)
+
+
+def test_revoking_a_permission_takes_effect_without_restart(make_user, login_account, client, app):
+    make_user(username="perm_admin", email="perm_admin@example.com", password="StrongPass1!", role=UserRole.ADMIN)
+    target = make_user(username="perm_target", email="perm_target@example.com", password="StrongPass1!")
+    login_account("perm_admin@example.com", "StrongPass1!")
+
+    runner = app.test_cli_runner()
+    with app.app_context():
+        result = runner.invoke(args=["permissions", "revoke", "admin", "users.delete"])
+    assert result.exit_code == 0, result.output
+
+    assert client.post(f"/admin/users/{target.id}/delete").status_code == 403
+    bulk = client.post("/admin/users/bulk", data={"action": "delete", "user_ids": [str(target.id)]})
+    assert bulk.status_code == 403
+    assert client.post(f"/admin/users/{target.id}/unlock").status_code == 302
+    assert client.get("/admin/dashboard").status_code == 200
+
+    with app.app_context():
+        result = runner.invoke(args=["permissions", "show"])
+    assert "users.unlock, users.delete" not in result.output
+
+    with app.app_context():
+        runner.invoke(args=["permissions", "grant", "admin", "users.delete"])
+    assert client.post(f"/admin/users/{target.id}/delete").status_code == 302
+
+
+def test_custom_grant_lets_a_regular_role_unlock_but_not_delete(make_user, login_account, client, app):
+    app.config["PERMISSIONS_IN_JWT"] = True
+    make_user(username="helpdesk", email="helpdesk@example.com", password="StrongPass1!")
+    target = make_user(username="locked_out", email="locked_out@example.com", password="StrongPass1!")
+    with app.app_context():
+        locked = db.session.get(User, target.id)
+        locked.locked_until = utcnow() + timedelta(minutes=10)
+        db.session.commit()
+        result = app.test_cli_runner().invoke(args=["permissions", "grant", "user", "users.unlock"])
+    assert "Updated 2 user permission masks." in result.output
+
+    response = login_account("helpdesk@example.com", "StrongPass1!")
+    token = client.get_cookie("access_token_cookie", domain="localhost.localdomain").value
+    with app.app_context():
+        claims = decode_token(token)
+        assert claims["perms"] == PERMISSION_BITS["users.unlock"]
+        assert claims["perms_v"] == get_permission_registry().table().version
+    assert response.status_code == 302
+
+    assert client.post(f"/admin/users/{target.id}/unlock").status_code == 302
+    assert client.post(f"/admin/users/{target.id}/delete").status_code == 403
+    assert client.get("/admin/dashboard").status_code == 403
+    with app.app_context():
+        assert db.session.get(User, target.id).locked_until is None
+
+
+def test_unknown_permission_names_fail_at_decoration_time():
+    assert permission_mask("users.unlock", "users.delete") == PERMISSION_BITS["users.unlock"] | PERMISSION_BITS["users.delete"]
+    with pytest.raises(ValueError):
+        permission_required("users.unlcok")
+
+
+def test_role_permission_cannot_grant_roles_the_actor_does_not_hold(make_user, login_account, client, app):
+    actor = make_user(username="role_clerk", email="role_clerk@example.com", password="StrongPass1!")
+    peer = make_user(username="role_peer", email="role_peer@example.com", password="StrongPass1!")
+    admin = make_user(username="role_boss", email="role_boss@example.com", password="StrongPass1!", role=UserRole.ADMIN)
+    with app.app_context():
+        app.test_cli_runner().invoke(args=["permissions", "grant", "user", "users.role"])
+    login_account("role_clerk@example.com", "StrongPass1!")
+
+    # The dashboard needs admin.dashboard, so the refusals are checked on the rows, not the page.
+    for target in (actor, peer):
+        assert client.post(f"/admin/users/{target.id}/role", data={"role": "admin"}).status_code == 302
+    assert client.post(f"/admin/users/{admin.id}/role", data={"role": "user"}).status_code == 302
+
+    with app.app_context():
+        assert {user.username: user.role for user in User.query.all()} == {
+            "role_clerk": UserRole.USER,
+            "role_peer": UserRole.USER,
+            "role_boss": UserRole.ADMIN,
+        }
+
+
+def test_revoke_from_another_worker_applies_on_the_next_request(make_user, login_account, client, app):
+    make_user(username="remote_admin", email="remote_admin@example.com", password="StrongPass1!", role=UserRole.ADMIN)
+    target = make_user(username="remote_target", email="remote_target@example.com", password="StrongPass1!")
+    login_account("remote_admin@example.com", "StrongPass1!")
+    assert client.get("/admin/dashboard").status_code == 200
+
+    # Another worker's revoke: committed on its own connection, so this worker's
+    # after_commit invalidation never runs and only the version row tells it.
+    with app.app_context(), db.engine.begin() as connection:
+        role_id = connection.execute(select(Role.id).where(Role.name == "admin")).scalar()
+        bit = PERMISSION_BITS["users.delete"].bit_length() - 1
+        permission_id = connection.execute(select(Permission.id).where(Permission.bit == bit)).scalar()
+        connection.execute(
+            delete(role_permissions).where(
+                role_permissions.c.role_id == role_id, role_permissions.c.permission_id == permission_id
+            )
+        )
+        bump_cache_version(connection, PERMISSIONS_VERSION)
+
+    assert client.post(f"/admin/users/{target.id}/delete").status_code == 403
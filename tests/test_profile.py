@@ -1,6 +1,8 @@
 import io
 from pathlib import Path
 
+import pytest
+
 from app.extensions import db
 from app.models import User, UserRole
 
@@ -155,3 +157,143 @@ def test_user_can_remove_uploaded_avatar(make_user, login_account, client, app):
         refreshed = db.session.get(User, user.id)
         assert refreshed.avatar_filename is None
         assert not uploaded_path.exists()
+
+
+class _NoSuchKey(Exception):
+    pass
+
+
+class _InMemoryS3Client:
+    class exceptions:
+        NoSuchKey = _NoSuchKey
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise _NoSuchKey(Key)
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"http://minio.local/{Params['Bucket']}/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+
+def test_avatar_upload_uses_s3_backend_with_presigned_urls(make_user, login_account, client, app):
+    from app.storage import S3AvatarStorage
+
+    s3_client = _InMemoryS3Client()
+    app.extensions["avatar_storage"] = S3AvatarStorage(
+        bucket="avatars-bucket",
+        prefix="avatars",
+        client=s3_client,
+        presign=True,
+        url_expires=60,
+    )
+
+    user = make_user(
+        username="s3_avatar_user",
+        email="s3_avatar_user@example.com",
+        password="StrongPass1!",
+        role=UserRole.USER,
+    )
+    login_account("s3_avatar_user@example.com", "StrongPass1!")
+
+    fake_png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+    response = client.post(
+        "/profile/avatar",
+        data={"avatar": (io.BytesIO(fake_png), "avatar.png")},
+        content_type="multipart/form-data",
+        follow_redirects=False,
+    )
+    assert response.status_code == 302
+
+    with app.app_context():
+        filename = db.session.get(User, user.id).avatar_filename
+        assert s3_client.objects[("avatars-bucket", f"avatars/{filename}")] == fake_png
+
+    profile_page = client.get("/profile")
+    assert f"http://minio.local/avatars-bucket/avatars/{filename}?X-Amz-Expires=60".encode() in profile_page.data
+
+    client.post("/profile/avatar/remove", follow_redirects=False)
+    assert s3_client.objects == {}
+
+
+def test_local_avatar_storage_rejects_path_traversal(tmp_path):
+    from app.storage import LocalAvatarStorage
+
+    storage = LocalAvatarStorage(tmp_path / "avatars", "uploads/avatars")
+    storage.put("ok.png", io.BytesIO(b"data"))
+
+    assert storage.get("ok.png") == b"data"
+    assert storage.get("missing.png") is None
+
+    with pytest.raises(ValueError):
+        storage.put("../escape.png", io.BytesIO(b"data"))
+
+
+def test_avatar_gc_removes_only_unreferenced_files(make_user, app, tmp_path):
+    from app.avatar_gc import collect_orphan_avatars
+    from app.storage import LocalAvatarStorage
+
+    storage = LocalAvatarStorage(tmp_path / "avatars", "uploads/avatars")
+    storage.put("kept.png", io.BytesIO(b"k" * 10))
+    storage.put("orphan_a.png", io.BytesIO(b"a" * 20))
+    storage.put("orphan_b.png", io.BytesIO(b"b" * 30))
+
+    user = make_user(
+        username="gc_user",
+        email="gc_user@example.com",
+        password="StrongPass1!",
+    )
+    user.avatar_filename = "kept.png"
+    db.session.commit()
+
+    dry_report = collect_orphan_avatars(storage, batch_size=2, min_age_minutes=0, dry_run=True)
+    assert dry_report.orphans == 2
+    assert dry_report.removed == 0
+    assert storage.get("orphan_a.png") is not None
+
+    report = collect_orphan_avatars(storage, batch_size=2, min_age_minutes=0, quarantine=True)
+    assert report.scanned == 3
+    assert report.quarantined == 2
+    assert report.bytes_quarantined == 50
+    assert report.removed == 0
+    assert report.bytes_reclaimed == 0
+    assert storage.get("kept.png") == b"k" * 10
+    assert storage.get("orphan_a.png") is None
+    assert (tmp_path / "avatars" / ".quarantine" / "orphan_b.png").exists()
+
+
+def test_avatar_gc_cli_skips_recent_uploads(app, tmp_path):
+    from app.storage import LocalAvatarStorage
+
+    storage = LocalAvatarStorage(tmp_path / "avatars", "uploads/avatars")
+    storage.put("fresh.png", io.BytesIO(b"fresh"))
+    app.extensions["avatar_storage"] = storage
+
+    result = app.test_cli_runner().invoke(args=["avatars", "gc"])
+
+    assert result.exit_code == 0
+    assert "1 too recent" in result.output
+    assert storage.get("fresh.png") == b"fresh"
+
+    quarantined = app.test_cli_runner().invoke(args=["avatars", "gc", "--min-age", "0", "--quarantine"])
+    assert "quarantined 1 (5 bytes, still in storage under .quarantine/)" in quarantined.output
+
+
+def test_avatar_storage_backends_must_implement_every_operation():
+    from app.storage import AvatarStorage
+
+    class ListOnlyStorage(AvatarStorage):
+        def iter_objects(self):
+            return iter(())
+
+    with pytest.raises(TypeError, match="quarantine"):
+        ListOnlyStorage()
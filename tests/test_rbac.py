@@ -1,5 +1,6 @@
 from datetime import UTC, datetime, timedelta
 
+from app.cache import render_user_row
 from app.extensions import db
 from app.models import User, UserRole
 
@@ -103,7 +104,7 @@ def test_admin_cannot_demote_self(make_user, login_account, client, app):
     )
 
     assert response.status_code == 200
-    assert b"cannot remove your own admin role" in response.data.lower()
+    assert b"cannot change your own role" in response.data.lower()
 
     with app.app_context():
         refreshed = db.session.get(User, admin.id)
@@ -298,3 +299,168 @@ def test_user_directory_is_read_only(make_user, login_account, client):
     assert b"Unlock" not in response.data
     assert b"Delete" not in response.data
     assert b"Add User/Admin" not in response.data
+
+
+def test_directory_fragment_is_reused_until_a_user_changes(make_user, login_account, client):
+    make_user(
+        username="cached_reader",
+        email="cached_reader@example.com",
+        password="StrongPass1!",
+        role=UserRole.USER,
+    )
+    login_account("cached_reader@example.com", "StrongPass1!")
+
+    first = client.get("/directory")
+    second = client.get("/directory")
+    assert b"cached_reader" in second.data
+    assert int(second.headers["X-Query-Count"]) < int(first.headers["X-Query-Count"])
+
+    client.post(
+        "/profile/details",
+        data={"username": "renamed_reader", "email": "cached_reader@example.com"},
+    )
+    refreshed = client.get("/directory")
+    assert b"renamed_reader" in refreshed.data
+    assert b"cached_reader" not in refreshed.data
+
+
+def test_user_row_fragment_changes_with_writes_in_the_same_second(make_user, app):
+    member = make_user(username="same_second", email="same_second@example.com", password="StrongPass1!")
+
+    def row() -> str:
+        db.session.expire_all()
+        return str(render_user_row("user/_member_row.html", db.session.get(User, member.id)))
+
+    def write(**values) -> None:
+        # MySQL keeps updated_at to the second, so both writes carry the same value.
+        db.session.execute(db.update(User).where(User.id == member.id).values(updated_at=stamp, **values))
+        db.session.commit()
+
+    with app.test_request_context():
+        stamp = db.session.get(User, member.id).updated_at
+        assert "role-user" in row()
+        write(role=UserRole.ADMIN)
+        assert "role-admin" in row()
+        write(role=UserRole.USER)
+        assert "role-user" in row()
+
+
+def _dashboard_row(page: str, email: str) -> str:
+    return page.split(f" {email} ", 1)[1].split("</tr>", 1)[0]
+
+
+def test_cached_dashboard_is_per_viewer_and_keeps_csrf_working(make_user, login_account, solve_captcha, client, app):
+    make_user(
+        username="cache_admin",
+        email="cache_admin@example.com",
+        password="StrongPass1!",
+        role=UserRole.ADMIN,
+    )
+    make_user(
+        username="cache_admin_two",
+        email="cache_admin_two@example.com",
+        password="StrongPass1!",
+        role=UserRole.ADMIN,
+    )
+    target = make_user(
+        username="cache_target",
+        email="cache_target@example.com",
+        password="StrongPass1!",
+        role=UserRole.USER,
+    )
+
+    other_client = app.test_client()
+    other_client.post(
+        "/login",
+        data={"email": "cache_admin_two@example.com", "password": "StrongPass1!", **solve_captcha(other_client, "login")},
+    )
+    login_account("cache_admin@example.com", "StrongPass1!")
+
+    client.get("/admin/dashboard")
+    page = client.get("/admin/dashboard").get_data(as_text=True)
+    other_page = other_client.get("/admin/dashboard").get_data(as_text=True)
+
+    assert "__fragment_csrf_token__" not in page
+    assert 'tiny-tag">You' in _dashboard_row(page, "cache_admin@example.com")
+    assert 'tiny-tag">You' not in _dashboard_row(page, "cache_admin_two@example.com")
+    assert 'tiny-tag">You' in _dashboard_row(other_page, "cache_admin_two@example.com")
+
+    token = page.split('name="csrf_token" value="', 1)[1].split('"', 1)[0]
+    response = client.post(f"/admin/users/{target.id}/role", data={"role": "admin", "csrf_token": token})
+    assert response.status_code == 302
+
+    with app.app_context():
+        assert db.session.get(User, target.id).role == UserRole.ADMIN
+    refreshed = client.get("/admin/dashboard").get_data(as_text=True)
+    assert "<h3>Admins</h3>\n    <p>3</p>" in refreshed
+
+
+def test_conditional_get_returns_304_until_users_change(make_user, login_account, client):
+    make_user(
+        username="etag_reader",
+        email="etag_reader@example.com",
+        password="StrongPass1!",
+        role=UserRole.USER,
+    )
+    login_account("etag_reader@example.com", "StrongPass1!")
+    client.get("/home")
+
+    response = client.get("/directory")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert "private" in response.headers["Cache-Control"]
+    assert "no-cache" in response.headers["Cache-Control"]
+    assert "Cookie" in response.headers["Vary"]
+
+    not_modified = client.get("/directory", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+    assert int(not_modified.headers["X-Query-Count"]) <= 2
+    assert "Cookie" in not_modified.headers["Vary"]
+
+    client.post(
+        "/profile/details",
+        data={"username": "etag_renamed", "email": "etag_reader@example.com"},
+    )
+    client.get("/profile")
+    changed = client.get("/directory", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert b"etag_renamed" in changed.data
+
+
+def test_conditional_get_etag_is_per_user_and_tracks_lock_expiry(make_user, login_account, solve_captcha, client, app, monkeypatch):
+    make_user(
+        username="etag_admin",
+        email="etag_admin@example.com",
+        password="StrongPass1!",
+        role=UserRole.ADMIN,
+    )
+    target = make_user(
+        username="etag_locked",
+        email="etag_locked@example.com",
+        password="StrongPass1!",
+        role=UserRole.USER,
+    )
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with app.app_context():
+        db.session.get(User, target.id).locked_until = now + timedelta(minutes=5)
+        db.session.commit()
+
+    login_account("etag_admin@example.com", "StrongPass1!")
+    client.get("/home")
+    etag = client.get("/admin/dashboard").headers["ETag"]
+    assert client.get("/admin/dashboard", headers={"If-None-Match": etag}).status_code == 304
+
+    other_client = app.test_client()
+    other_client.post(
+        "/login",
+        data={"email": "etag_locked@example.com", "password": "StrongPass1!", **solve_captcha(other_client, "login")},
+    )
+    assert other_client.get("/home", headers={"If-None-Match": etag}).status_code != 304
+
+    import app.cache as cache_module
+
+    monkeypatch.setattr(cache_module, "utcnow", lambda: now + timedelta(minutes=6))
+    after_unlock = client.get("/admin/dashboard", headers={"If-None-Match": etag})
+    assert after_unlock.status_code == 200
+    assert after_unlock.headers["ETag"] != etag
@@ -1,24 +1,31 @@
+import time
 from datetime import UTC, datetime, timedelta
 
+import pytest
+from flask import Flask
+
+from app import create_app
+from app.config import TestingConfig
 from app.extensions import db
 from app.models import User, UserRole
+from app.security.captcha import RedisReplayGuard, ReplayGuard, init_captcha
+from app.security.permissions import sync_permissions
 
 
-def _fail_login_once(client, get_captcha_answer, email: str):
-    client.get("/login")
-    answer = get_captcha_answer("login")
+def _fail_login_once(client, solve_captcha, email: str):
+    captcha = solve_captcha(client, "login")
     return client.post(
         "/login",
         data={
             "email": email,
             "password": "WrongPassword1!",
-            "captcha_answer": answer,
+            **captcha,
         },
         follow_redirects=False,
     )
 
 
-def test_account_lockout_after_multiple_failures(app, make_user, client, get_captcha_answer):
+def test_account_lockout_after_multiple_failures(app, make_user, client, solve_captcha):
     user = make_user(
         username="locked",
         email="locked@example.com",
@@ -27,7 +34,7 @@ def test_account_lockout_after_multiple_failures(app, make_user, client, get_cap
 
     attempts = app.config["LOCKOUT_MAX_ATTEMPTS"]
     for _ in range(attempts):
-        response = _fail_login_once(client, get_captcha_answer, "locked@example.com")
+        response = _fail_login_once(client, solve_captcha, "locked@example.com")
         assert response.status_code == 401
 
     with app.app_context():
@@ -35,14 +42,13 @@ def test_account_lockout_after_multiple_failures(app, make_user, client, get_cap
         assert refreshed.locked_until is not None
         assert refreshed.locked_until > datetime.now(UTC).replace(tzinfo=None)
 
-    client.get("/login")
-    answer = get_captcha_answer("login")
+    captcha = solve_captcha(client, "login")
     locked_response = client.post(
         "/login",
         data={
             "email": "locked@example.com",
             "password": "StrongPass1!",
-            "captcha_answer": answer,
+            **captcha,
         },
         follow_redirects=False,
     )
@@ -84,9 +90,8 @@ def test_unlock_flow_by_admin(make_user, login_account, client, app):
         assert actor.role == UserRole.ADMIN
 
 
-def test_captcha_failure_handling_on_register(client, get_captcha_answer, app):
-    client.get("/register")
-    _ = get_captcha_answer("register")
+def test_captcha_failure_handling_on_register(client, solve_captcha, app):
+    captcha = solve_captcha(client, "register")
 
     response = client.post(
         "/register",
@@ -95,6 +100,7 @@ def test_captcha_failure_handling_on_register(client, get_captcha_answer, app):
             "email": "captcha@example.com",
             "password": "StrongPass1!",
             "role": "user",
+            "captcha_token": captcha["captcha_token"],
             "captcha_answer": "99999",
         },
         follow_redirects=False,
@@ -155,3 +161,182 @@ def test_captcha_refresh_endpoint_returns_question(client):
     assert isinstance(payload, dict)
     assert "question" in payload
     assert "What is" in payload["question"]
+
+
+def test_math_captcha_token_is_single_use_and_scoped(make_user, solve_captcha, client, app):
+    make_user(username="replay", email="replay@example.com", password="StrongPass1!")
+
+    login_page = client.get("/login")
+    assert "Set-Cookie" not in login_page.headers
+    with client.session_transaction() as session:
+        assert not any(key.startswith("captcha_") for key in session)
+
+    register_captcha = solve_captcha(client, "register")
+    wrong_scope = client.post(
+        "/login",
+        data={"email": "replay@example.com", "password": "StrongPass1!", **register_captcha},
+    )
+    assert wrong_scope.status_code == 400
+
+    captcha = solve_captcha(client, "login")
+    first = client.post("/login", data={"email": "replay@example.com", "password": "WrongPassword1!", **captcha})
+    assert first.status_code == 401
+    replayed = client.post("/login", data={"email": "replay@example.com", "password": "StrongPass1!", **captcha})
+    assert replayed.status_code == 400
+
+    app.config["MATH_CAPTCHA_TTL_SECONDS"] = -1
+    captcha = solve_captcha(client, "login")
+    expired = client.post("/login", data={"email": "replay@example.com", "password": "StrongPass1!", **captcha})
+    assert expired.status_code == 400
+
+
+def test_replay_guard_evicts_expired_nonces():
+    guard = ReplayGuard(max_entries=3)
+    now = int(time.time())
+
+    assert guard.claim("stale", now - 1)
+    assert guard.claim("fresh", now + 60)
+    assert not guard.claim("fresh", now + 60)
+    assert len(guard) == 1
+
+    guard.claim("a", now + 60)
+    guard.claim("b", now + 60)
+    assert len(guard) == 3
+
+
+def test_redis_replay_guard_is_shared_across_workers():
+    class FakeRedis:
+        def __init__(self):
+            self.keys = {}
+
+        def set(self, name, value, nx=False, ex=None):
+            if nx and name in self.keys:
+                return None
+            self.keys[name] = (value, ex)
+            return True
+
+    client = FakeRedis()
+    first_worker, second_worker = RedisReplayGuard(client), RedisReplayGuard(client)
+    expires_at = int(time.time()) + 60
+
+    assert first_worker.claim("nonce", expires_at)
+    assert not second_worker.claim("nonce", expires_at)
+    assert 55 <= client.keys["captcha-nonce:nonce"][1] <= 60
+
+
+def test_replay_backend_does_not_follow_the_fragment_cache_backend():
+    app = Flask(__name__)
+    app.config.update(FRAGMENT_CACHE_BACKEND="redis", FRAGMENT_CACHE_REDIS_URL="redis://cache:6379/0")
+    init_captcha(app)
+    assert isinstance(app.extensions["captcha_replay_guard"], ReplayGuard)
+
+    app.config["MATH_CAPTCHA_REPLAY_BACKEND"] = "memcached"
+    with pytest.raises(ValueError, match="MATH_CAPTCHA_REPLAY_BACKEND"):
+        init_captcha(app)
+
+def _login_from(client, ip: str, email: str, password: str, **extra):
+    return client.post(
+        "/login",
+        data={"email": email, "password": password, **extra},
+        environ_base={"REMOTE_ADDR": ip},
+    )
+
+
+def test_risk_scoring_skips_captcha_until_failures_accumulate(make_user, client, app):
+    app.config["CAPTCHA_RISK_ENABLED"] = True
+    make_user(username="risky", email="risky@example.com", password="StrongPass1!")
+
+    assert "Human verification" not in client.get("/login").get_data(as_text=True)
+    response = client.post("/login", data={"email": "risky@example.com", "password": "StrongPass1!"})
+    assert response.status_code == 302
+    assert client.get_cookie("known_device", domain="localhost.localdomain") is not None
+    client.post("/logout")
+
+    attacker = app.test_client()
+    assert _login_from(attacker, "10.0.0.9", "risky@example.com", "WrongPassword1!").status_code == 401
+    assert _login_from(attacker, "10.0.0.9", "risky@example.com", "WrongPassword1!").status_code == 401
+    blocked = _login_from(attacker, "10.0.0.9", "risky@example.com", "WrongPassword1!")
+    assert blocked.status_code == 400
+    assert "Please complete the human verification" in blocked.get_data(as_text=True)
+    assert "Human verification" in attacker.get("/login", environ_base={"REMOTE_ADDR": "10.0.0.9"}).get_data(as_text=True)
+
+    # Three recent failures on the account challenge a fresh device, but not the one that logged in before.
+    assert _login_from(attacker, "10.0.0.10", "risky@example.com", "WrongPassword1!").status_code == 401
+    stranger = app.test_client()
+    assert _login_from(stranger, "10.0.0.11", "risky@example.com", "StrongPass1!").status_code == 400
+    assert client.post("/login", data={"email": "risky@example.com", "password": "StrongPass1!"}).status_code == 302
+
+
+def test_global_failure_surge_challenges_everyone(client, app):
+    app.config.update(CAPTCHA_RISK_ENABLED=True, CAPTCHA_RISK_GLOBAL_FAILURES_PER_MINUTE=2)
+
+    registration = {"username": "calm_user", "email": "calm@example.com", "password": "StrongPass1!", "role": "user"}
+    assert client.post("/register", data=registration).status_code == 302
+
+    for ip in ("10.0.1.1", "10.0.1.2"):
+        assert _login_from(app.test_client(), ip, "nobody@example.com", "WrongPassword1!").status_code == 401
+
+    page = app.test_client().get("/register", environ_base={"REMOTE_ADDR": "10.0.1.3"}).get_data(as_text=True)
+    assert "Human verification" in page
+
+
+
+def test_login_challenge_does_not_reveal_whether_the_account_exists(make_user, app):
+    app.config["CAPTCHA_RISK_ENABLED"] = True
+    make_user(username="real_one", email="real@example.com", password="StrongPass1!")
+
+    outcomes = {}
+    for email, subnet in (("real@example.com", "10.0.3"), ("ghost@example.com", "10.0.4")):
+        for host in range(3):
+            assert _login_from(app.test_client(), f"{subnet}.{host}", email, "WrongPassword1!").status_code == 401
+        probe = _login_from(app.test_client(), f"{subnet}.9", email, "WrongPassword1!")
+        outcomes[email] = (probe.status_code, "Please complete the human verification" in probe.get_data(as_text=True))
+
+    assert outcomes["real@example.com"] == outcomes["ghost@example.com"] == (400, True)
+
+
+def _register_from(client, ip: str, username: str, email: str):
+    return client.post(
+        "/register",
+        data={"username": username, "email": email, "password": "StrongPass1!", "role": "user"},
+        environ_base={"REMOTE_ADDR": ip},
+    )
+
+
+def test_duplicate_registrations_count_as_failures(make_user, app):
+    app.config["CAPTCHA_RISK_ENABLED"] = True
+    make_user(username="existing", email="existing@example.com", password="StrongPass1!")
+    prober = app.test_client()
+
+    for index in range(3):
+        response = _register_from(prober, "10.0.2.1", f"probe_{index}", "existing@example.com")
+        assert response.status_code == 400
+        assert "already registered" in response.get_data(as_text=True)
+
+    challenged = _register_from(prober, "10.0.2.1", "probe_3", "existing@example.com")
+    assert challenged.status_code == 400
+    assert "already registered" not in challenged.get_data(as_text=True)
+    assert "Please complete the human verification" in challenged.get_data(as_text=True)
+
+
+def test_proxy_fix_keys_risk_counters_by_forwarded_client():
+    proxied = create_app(
+        TestingConfig,
+        config_overrides={"SERVER_NAME": "localhost.localdomain", "CAPTCHA_RISK_ENABLED": True, "PROXY_FIX_X_FOR": 1},
+    )
+    with proxied.app_context():
+        db.create_all()
+        sync_permissions()
+        client = proxied.test_client()
+
+        def from_client(ip: str) -> dict:
+            return {"environ_base": {"REMOTE_ADDR": "127.0.0.1"}, "headers": {"X-Forwarded-For": ip}}
+
+        for index in range(3):
+            form = {"email": f"nobody_{index}@example.com", "password": "WrongPassword1!"}
+            assert client.post("/login", data=form, **from_client("198.51.100.1")).status_code == 401
+
+        assert "Human verification" in client.get("/login", **from_client("198.51.100.1")).get_data(as_text=True)
+        assert "Human verification" not in client.get("/login", **from_client("198.51.100.2")).get_data(as_text=True)
+        db.session.remove()
+        db.drop_all()
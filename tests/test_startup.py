@@ -0,0 +1,47 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from app.observability.startup import parse_importtime
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_app_startup_skips_optional_heavy_imports():
+    probe = (
+        "import json, sys\n"
+        "from app import create_app\n"
+        "app = create_app()\n"
+        "print(json.dumps({name: name in sys.modules for name in "
+        "('requests', 'flask_migrate', 'alembic', 'passlib.handlers.argon2')}))\n"
+        "print(json.dumps(app.extensions['startup_timings']))\n"
+    )
+    output = subprocess.check_output(
+        [sys.executable, "-c", probe],
+        cwd=ROOT_DIR,
+        env={"FLASK_ENV": "testing", "PATH": ""},
+        text=True,
+    )
+    loaded, timings = (json.loads(line) for line in output.strip().splitlines()[-2:])
+
+    assert not any(loaded.values()), loaded
+    assert {"app_package_import", "extensions", "blueprints"} <= set(timings)
+
+
+def test_parse_importtime_builds_a_tree():
+    output = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |     json.decoder",
+            "import time:        50 |         50 |     json.encoder",
+            "import time:       200 |        350 |   json",
+            "import time:        10 |        360 | app",
+        ]
+    )
+
+    (root,) = parse_importtime(output)
+
+    assert root.module == "app"
+    assert [child.module for child in root.children] == ["json"]
+    assert [child.module for child in root.children[0].children] == ["json.decoder", "json.encoder"]
@@ -0,0 +1,44 @@
+from app import create_app
+from app.config import TestingConfig
+
+
+def test_startup_warmup_compiles_templates_into_shared_cache(tmp_path):
+    cache_dir = tmp_path / "jinja_cache"
+    app = create_app(
+        TestingConfig,
+        config_overrides={
+            "TEMPLATE_BYTECODE_CACHE_ENABLED": True,
+            "TEMPLATE_BYTECODE_CACHE_DIR": str(cache_dir),
+            "TEMPLATE_WARMUP_ON_STARTUP": True,
+        },
+    )
+
+    compiled = app.jinja_env.list_templates(extensions=("html",))
+    assert len(list(cache_dir.glob("*.cache"))) == len(compiled)
+    assert len(app.jinja_env.cache) >= len(compiled)
+
+    # A second worker starting against the same directory loads bytecode instead of compiling.
+    second = create_app(
+        TestingConfig,
+        config_overrides={
+            "TEMPLATE_BYTECODE_CACHE_ENABLED": True,
+            "TEMPLATE_BYTECODE_CACHE_DIR": str(cache_dir),
+        },
+    )
+    second.jinja_env.compile = None
+    assert second.test_client().get("/login").status_code == 200
+
+
+def test_templates_compile_cli_populates_cache(tmp_path):
+    cache_dir = tmp_path / "jinja_cache"
+    app = create_app(
+        TestingConfig,
+        config_overrides={"TEMPLATE_BYTECODE_CACHE_ENABLED": True, "TEMPLATE_BYTECODE_CACHE_DIR": str(cache_dir)},
+    )
+
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=["templates", "compile", "--clear"])
+
+    assert result.exit_code == 0
+    assert "Compiled" in result.output
+    assert list(cache_dir.glob("*.cache"))
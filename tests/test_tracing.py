@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import db
+from app.models import User
+from app.observability.metrics import TRACE_SPANS_DROPPED
+from app.observability.tracing import BatchExporter, get_tracer, otlp_payload
+from app.security.permissions import sync_permissions
+
+
+@pytest.fixture()
+def traced_app(tmp_path):
+    flask_app = create_app(
+        TestingConfig,
+        config_overrides={
+            "SERVER_NAME": "localhost.localdomain",
+            "TRACING_ENABLED": True,
+            "TRACING_SAMPLE_RATE": 1.0,
+            "TRACING_FILE_PATH": str(tmp_path / "traces.jsonl"),
+            "TRACING_TRUST_TRACEPARENT": True,
+            "SERVER_TIMING_ENABLED": True,
+        },
+    )
+    with flask_app.app_context():
+        db.create_all()
+        sync_permissions()
+        user = User(username="traced", email="traced@example.com")
+        user.set_password("StrongPass1!")
+        db.session.add(user)
+        db.session.commit()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+def _login(app, solve_captcha, headers=None):
+    client = app.test_client()
+    captcha = solve_captcha(client, "login")
+    return client.post(
+        "/login",
+        data={"email": "traced@example.com", "password": "StrongPass1!", **captcha},
+        headers=headers or {},
+    )
+
+
+def _exported(app, tmp_path) -> list[dict]:
+    get_tracer(app).exporter.flush()
+    path = tmp_path / "traces.jsonl"
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_server_timing_reports_login_phases(app, client, traced_app, solve_captcha):
+    assert "Server-Timing" not in client.get("/login").headers
+
+    response = _login(traced_app, solve_captcha)
+    assert response.status_code == 302
+    phases = {entry.split(";")[0].strip() for entry in response.headers["Server-Timing"].split(",")}
+    assert {"captcha.math", "login.user_lookup", "kdf.verify", "audit.seal", "db.commit", "db", "total"} <= phases
+
+
+def test_sampled_login_exports_one_nested_trace(traced_app, solve_captcha, tmp_path):
+    assert _login(traced_app, solve_captcha).status_code == 302
+
+    spans = [record for record in _exported(traced_app, tmp_path) if record["name"] != "auth.current_user"]
+    by_id = {record["spanId"]: record for record in spans}
+    root = next(record for record in spans if record["name"] == "auth.login" and record["attributes"]["method"] == "POST")
+    assert root["parentSpanId"] is None and root["attributes"]["status"] == 302
+
+    login_spans = [record for record in spans if record["traceId"] == root["traceId"]]
+    names = {record["name"] for record in login_spans}
+    assert {"captcha.math", "login.user_lookup", "kdf.verify", "db.commit", "db.flush", "audit.seal", "db.query"} <= names
+    seal = next(record for record in login_spans if record["name"] == "audit.seal")
+    assert by_id[seal["parentSpanId"]]["name"] == "db.flush"
+    lookup = next(record for record in login_spans if record["name"] == "login.user_lookup")
+    assert any(record["parentSpanId"] == lookup["spanId"] and record["name"] == "db.query" for record in login_spans)
+    assert all(record["endTimeUnixNano"] >= record["startTimeUnixNano"] for record in login_spans)
+
+
+def test_traceparent_sampling_and_export_backpressure(traced_app, solve_captcha, tmp_path, monkeypatch):
+    trace_id = "4bf92f3577b34da6a3ce929d0e0736ff"
+    _login(traced_app, solve_captcha, headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-00"})
+    assert not [record for record in _exported(traced_app, tmp_path) if record["traceId"] == trace_id]
+    _login(traced_app, solve_captcha, headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+    exported = [record for record in _exported(traced_app, tmp_path) if record["traceId"] == trace_id]
+    assert any(record["name"] == "auth.login" for record in exported)
+
+    payload = otlp_payload(exported, "svc")
+    otlp_spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len(otlp_spans) == len(exported)
+    assert payload["resourceSpans"][0]["resource"]["attributes"][0]["value"] == {"stringValue": "svc"}
+
+    before = TRACE_SPANS_DROPPED.value()
+    stalled = BatchExporter(lambda records: None, queue_size=2, batch_size=1, interval=0.01)
+    # Without its consumer thread the queue fills up, as it would behind a stuck collector.
+    monkeypatch.setattr(stalled, "_ensure_started", lambda: None)
+    stalled.submit([{}, {}, {}])
+    assert TRACE_SPANS_DROPPED.value() == before + 1